@@ -1,22 +1,44 @@
-from flask import Flask, render_template, request
+from flask import Flask, request, jsonify
+import csv
+import hashlib
+import io
+import os
 import pickle
+import threading
+import time
 import numpy as np
+from sklearn.pipeline import make_pipeline
+from batching import MicroBatcher, BatcherOverloaded
+from topk import top_k, TopKFormatter
+from compiled import CompiledRecommender
+from neighbors_index import NeighborIndex, INDEX_DIR
+from artifacts import load_artifacts, read_manifest, file_sha256, ARTIFACTS_DIR
+from cache import PredictionCache, SharedPredictionCache
+from static_pages import StaticPage
 
 app = Flask(__name__)
 
-# Load the scaler, label encoder, model, and class names
-scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
-model = pickle.load(open("Models/model.pkl", 'rb'))
+# Class names; the scaler and model are loaded on first use by get_model()
 class_names = ['Lawyer', 'Doctor', 'Government Officer', 'Artist', 'Unknown',
                'Software Engineer', 'Teacher', 'Business Owner', 'Scientist',
                'Banker', 'Writer', 'Accountant', 'Designer',
                'Construction Engineer', 'Game Developer', 'Stock Investor',
                'Real Estate Developer']
 
-def format_probability(prob):
-    return f"{prob:.2%}"
+# Order of the 14 model features, as built by encode_features()
+feature_order = ['gender', 'part_time_job', 'absence_days', 'extracurricular_activities',
+                 'weekly_self_study_hours', 'math_score', 'history_score', 'physics_score',
+                 'chemistry_score', 'biology_score', 'english_score', 'geography_score',
+                 'total_score', 'average_score']
 
-def Recommendations(gender, part_time_job, absence_days, extracurricular_activities,
+# Subject columns of student-scores.csv, summed into total_score as in the notebook
+subject_columns = ['math_score', 'history_score', 'physics_score', 'chemistry_score',
+                   'biology_score', 'english_score', 'geography_score']
+
+# Maps top-k class indices/probabilities to (class name, "12.34%") pairs
+format_top_k = TopKFormatter(class_names)
+
+def encode_features(gender, part_time_job, absence_days, extracurricular_activities,
                     weekly_self_study_hours, math_score, history_score, physics_score,
                     chemistry_score, biology_score, english_score, geography_score,
                     total_score, average_score):
@@ -25,57 +47,312 @@ def Recommendations(gender, part_time_job, absence_days, extracurricular_activit
     part_time_job_encoded = 1 if part_time_job else 0
     extracurricular_activities_encoded = 1 if extracurricular_activities else 0
 
-    # Create feature array
-    feature_array = np.array([[gender_encoded, part_time_job_encoded, absence_days, extracurricular_activities_encoded,
+    return [gender_encoded, part_time_job_encoded, absence_days, extracurricular_activities_encoded,
+            weekly_self_study_hours, math_score, history_score, physics_score,
+            chemistry_score, biology_score, english_score, geography_score, total_score,
+            average_score]
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() == 'true'
+
+def encode_row(row):
+    """Encode one student-scores.csv style row (dict) into a feature list."""
+    scores = [int(row[column]) for column in subject_columns]
+    # Derive total_score/average_score the same way the notebook does when they are missing
+    if row.get('total_score') in (None, ''):
+        total_score = float(sum(scores))
+    else:
+        total_score = float(row['total_score'])
+    if row.get('average_score') in (None, ''):
+        average_score = total_score / 7
+    else:
+        average_score = float(row['average_score'])
+
+    return encode_features(row['gender'], parse_bool(row['part_time_job']), int(row['absence_days']),
+                           parse_bool(row['extracurricular_activities']), int(row['weekly_self_study_hours']),
+                           *scores, total_score, average_score)
+
+def load_pickles():
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    return scaler, model
+
+def load_compiled_model():
+    """Build the fused NumPy model and check it against sklearn on student-scores.csv."""
+    scaler, model = load_pickles()
+    compiled = CompiledRecommender.from_sklearn(scaler, model)
+    with open("student-scores.csv", newline='') as f:
+        feature_matrix = np.array([encode_row(row) for row in csv.DictReader(f)], dtype=float)
+    if not compiled.verify(scaler, model, feature_matrix):
+        raise RuntimeError("Compiled model does not match sklearn predictions on student-scores.csv")
+    return compiled
+
+def load_neighbor_index():
+    """Memory-map the offline KNN index (see neighbors_index.py); no NPROBE means exact search."""
+    nprobe = os.environ.get('RECOMMENDER_INDEX_NPROBE')
+    return NeighborIndex.load(os.environ.get('RECOMMENDER_INDEX_DIR', INDEX_DIR),
+                              nprobe=int(nprobe) if nprobe else None)
+
+def load_model_artifacts():
+    """Memory-map the exported arrays (see artifacts.py) and check they fit this app."""
+    compiled, manifest = load_artifacts(os.environ.get('RECOMMENDER_ARTIFACTS_DIR', ARTIFACTS_DIR))
+    if manifest['class_names'] != class_names or manifest['feature_order'] != feature_order:
+        raise RuntimeError("Model artifacts were exported for different classes or features")
+    return compiled
+
+# RECOMMENDER_INFERENCE picks the backend: "sklearn" (the pickles, default),
+# "compiled" (plain NumPy arrays), "index" (the prebuilt nearest-neighbour
+# index) or "artifacts" (memory-mapped arrays exported by artifacts.py)
+model_loaders = {
+    'sklearn': lambda: make_pipeline(*load_pickles()),
+    'compiled': load_compiled_model,
+    'index': load_neighbor_index,
+    'artifacts': load_model_artifacts,
+}
+_model = None
+_model_hash = None
+_model_stamp = None
+_model_checked = 0.0
+_model_lock = threading.Lock()
+# How often get_model() looks for a changed model on disk
+model_check_seconds = float(os.environ.get('RECOMMENDER_MODEL_CHECK_SECONDS', 5))
+
+def model_files():
+    """Files the current backend is loaded from; a change to any of them reloads the model."""
+    backend = os.environ.get('RECOMMENDER_INFERENCE', 'sklearn')
+    if backend == 'artifacts':
+        return [os.path.join(os.environ.get('RECOMMENDER_ARTIFACTS_DIR', ARTIFACTS_DIR), "manifest.json")]
+    if backend == 'index':
+        index_dir = os.environ.get('RECOMMENDER_INDEX_DIR', INDEX_DIR)
+        return [os.path.join(index_dir, name) for name in ("index.json", "vectors.npy", "labels.npy")]
+    return ["Models/scaler.pkl", "Models/model.pkl"]
+
+def compute_model_hash(paths):
+    if os.environ.get('RECOMMENDER_INFERENCE') == 'artifacts':
+        return read_manifest(os.path.dirname(paths[0]))['hash']
+    return hashlib.sha256(''.join(file_sha256(path) for path in paths).encode()).hexdigest()
+
+def get_model():
+    """Load the inference backend on first use rather than at import time.
+
+    Every model_check_seconds the backend files are stat()ed again and the
+    model is reloaded (and its hash recomputed) when they have changed.
+    """
+    global _model, _model_hash, _model_stamp, _model_checked
+    if _model is None or time.monotonic() - _model_checked > model_check_seconds:
+        with _model_lock:
+            if _model is None or time.monotonic() - _model_checked > model_check_seconds:
+                paths = model_files()
+                stamp = [(os.stat(path).st_mtime_ns, os.stat(path).st_size) for path in paths]
+                if _model is None or stamp != _model_stamp:
+                    _model = model_loaders[os.environ.get('RECOMMENDER_INFERENCE', 'sklearn')]()
+                    _model_hash = compute_model_hash(paths)
+                    _model_stamp = stamp
+                _model_checked = time.monotonic()
+    return _model
+
+def get_model_hash():
+    get_model()
+    return _model_hash
+
+# The compiled model is verified against sklearn before the app serves
+# anything, so a mismatch stops it from starting instead of failing requests
+if os.environ.get('RECOMMENDER_INFERENCE') == 'compiled':
+    get_model()
+
+def predict_proba(feature_matrix):
+    # Scale features and predict using the model
+    return get_model().predict_proba(feature_matrix)
+
+def recommend_matrix(feature_matrix, k=3):
+    """Scale and score a whole feature matrix, returning the top k careers for every row."""
+    probabilities = predict_proba(feature_matrix)
+
+    # Get top k predicted classes along with their probabilities
+    top_classes_idx, top_classes_probs = top_k(probabilities, k)
+    return format_top_k(top_classes_idx, top_classes_probs)
+
+# Opt-in coalescing of concurrent /predict requests into one predict_proba call
+batcher = None
+if os.environ.get('RECOMMENDER_MICRO_BATCHING') == '1':
+    batcher = MicroBatcher(recommend_matrix,
+                           max_batch_size=int(os.environ.get('RECOMMENDER_BATCH_SIZE', 64)),
+                           max_wait_ms=float(os.environ.get('RECOMMENDER_BATCH_WAIT_MS', 2)),
+                           max_queue_size=int(os.environ.get('RECOMMENDER_BATCH_QUEUE', 1024)),
+                           timeout=float(os.environ.get('RECOMMENDER_BATCH_TIMEOUT', 1)))
+
+# LRU cache of Recommendations() keyed on the 14 features and k, cleared when the
+# model hash changes; RECOMMENDER_CACHE_SIZE=0 turns it off. Naming a shared
+# memory block in RECOMMENDER_SHARED_CACHE adds a tier shared by all workers.
+prediction_cache = None
+if int(os.environ.get('RECOMMENDER_CACHE_SIZE', 4096)) > 0:
+    cache_ttl = os.environ.get('RECOMMENDER_CACHE_TTL')
+    prediction_cache = PredictionCache(int(os.environ.get('RECOMMENDER_CACHE_SIZE', 4096)),
+                                       float(cache_ttl) if cache_ttl else None)
+shared_cache = None
+if os.environ.get('RECOMMENDER_SHARED_CACHE'):
+    shared_cache = SharedPredictionCache(os.environ['RECOMMENDER_SHARED_CACHE'], class_names,
+                                         n_features=len(feature_order),
+                                         slots=int(os.environ.get('RECOMMENDER_SHARED_CACHE_SLOTS', 65536)))
+
+def cache_lookup(key):
+    if prediction_cache is None and shared_cache is None:
+        return None
+    model_hash = get_model_hash()
+    if prediction_cache is not None:
+        prediction_cache.check_model(model_hash)
+        cached = prediction_cache.get(key)
+        if cached is not None:
+            return cached
+    if shared_cache is not None:
+        shared_cache.check_model(model_hash)
+        cached = shared_cache.get(*key)
+        if cached is not None and prediction_cache is not None:
+            prediction_cache.put(key, cached)
+        return cached
+    return None
+
+def cache_store(key, recommendations):
+    if prediction_cache is not None:
+        prediction_cache.put(key, recommendations)
+    if shared_cache is not None:
+        shared_cache.put(*key, recommendations)
+
+def Recommendations(gender, part_time_job, absence_days, extracurricular_activities,
+                    weekly_self_study_hours, math_score, history_score, physics_score,
+                    chemistry_score, biology_score, english_score, geography_score,
+                    total_score, average_score, k=3):
+    features = encode_features(gender, part_time_job, absence_days, extracurricular_activities,
                                weekly_self_study_hours, math_score, history_score, physics_score,
-                               chemistry_score, biology_score, english_score, geography_score, total_score,
-                               average_score]])
+                               chemistry_score, biology_score, english_score, geography_score,
+                               total_score, average_score)
+    key = (tuple(float(feature) for feature in features), k)
+    cached = cache_lookup(key)
+    if cached is not None:
+        return cached
+
+    if batcher is not None:
+        recommendations = batcher.submit(features, k)
+    else:
+        # Create feature array
+        recommendations = recommend_matrix(np.array([features]), k)[0]
+    cache_store(key, recommendations)
+    return recommendations
 
-    # Scale features
-    scaled_features = scaler.transform(feature_array)
+def parse_k(value):
+    """The number of careers asked for: an integer of at least 1, capped at the number of careers like top_k."""
+    try:
+        k = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"k must be an integer, got {value!r}") from None
+    if k < 1:
+        raise ValueError(f"k must be at least 1, got {k}")
+    return min(k, len(class_names))
 
-    # Predict using the model
-    probabilities = model.predict_proba(scaled_features)
+def read_predict_form(form):
+    """Arguments for Recommendations() from the /predict form fields."""
+    gender = form['gender']
+    part_time_job = form['part_time_job'] == 'true'
+    absence_days = int(form['absence_days'])
+    extracurricular_activities = form['extracurricular_activities'] == 'true'
+    weekly_self_study_hours = int(form['weekly_self_study_hours'])
+    math_score = int(form['math_score'])
+    history_score = int(form['history_score'])
+    physics_score = int(form['physics_score'])
+    chemistry_score = int(form['chemistry_score'])
+    biology_score = int(form['biology_score'])
+    english_score = int(form['english_score'])
+    geography_score = int(form['geography_score'])
+    total_score = float(form['total_score'])
+    average_score = float(form['average_score'])
+    k = parse_k(form.get('k', 3))
+    return (gender, part_time_job, absence_days, extracurricular_activities,
+            weekly_self_study_hours, math_score, history_score, physics_score,
+            chemistry_score, biology_score, english_score, geography_score,
+            total_score, average_score, k)
 
-    # Get top five predicted classes along with their probabilities
-    top_classes_idx = np.argsort(-probabilities[0])[:3]
-    top_classes_names_probs = [(class_names[idx], format_probability(probabilities[0][idx])) for idx in top_classes_idx]
+def read_batch_rows():
+    """Read batch rows from a JSON body, a CSV body or an uploaded CSV file."""
+    if request.is_json:
+        return batch_rows_from_json(request.get_json())
+    if 'file' in request.files:
+        text = request.files['file'].read().decode('utf-8')
+    else:
+        text = request.get_data(as_text=True)
+    return list(csv.DictReader(io.StringIO(text)))
 
-    return top_classes_names_probs
+def batch_rows_from_json(payload):
+    if isinstance(payload, dict):
+        payload = payload.get('rows')
+    if not isinstance(payload, list):
+        raise ValueError("JSON body must be a list of rows or an object with a 'rows' list")
+    return payload
+
+def encode_batch(rows):
+    """Feature matrix of rows in the student-scores.csv layout; bad rows raise KeyError or ValueError."""
+    return np.array([encode_row(row) for row in rows], dtype=float)
+
+def score_batch(rows, feature_matrix, k):
+    """The /predict/batch results for rows and their encode_batch() matrix."""
+    if not rows:
+        return []
+    return [{'id': row.get('id'), 'recommendations': row_recommendations}
+            for row, row_recommendations in zip(rows, recommend_matrix(feature_matrix, k))]
+
+def stats_payload():
+    """What /stats reports, in every serving mode."""
+    return {'batching': batcher.stats() if batcher is not None else None,
+            'cache': prediction_cache.stats() if prediction_cache is not None else None,
+            'shared_cache': shared_cache.stats() if shared_cache is not None else None}
+
+# home.html and recommend.html have no per-request data: render them once
+static_pages = {name: StaticPage.from_template(app.jinja_env, name) for name in ('home.html', 'recommend.html')}
+
+# Compiled once; rendering it directly skips render_template's lookup and context processors
+results_template = app.jinja_env.get_template('results.html')
+
+def static_response(name):
+    status, headers, body = static_pages[name].response(request.headers)
+    return app.response_class(body, status=status, headers=headers)
 
 @app.route('/')
 def home():
-    return render_template('home.html')
+    return static_response('home.html')
 
 @app.route('/recommend')
 def recommend():
-    return render_template('recommend.html')
+    return static_response('recommend.html')
 
 @app.route('/predict', methods=['POST'])
 def predict():
     if request.method == 'POST':
-        gender = request.form['gender']
-        part_time_job = request.form['part_time_job'] == 'true'
-        absence_days = int(request.form['absence_days'])
-        extracurricular_activities = request.form['extracurricular_activities'] == 'true'
-        weekly_self_study_hours = int(request.form['weekly_self_study_hours'])
-        math_score = int(request.form['math_score'])
-        history_score = int(request.form['history_score'])
-        physics_score = int(request.form['physics_score'])
-        chemistry_score = int(request.form['chemistry_score'])
-        biology_score = int(request.form['biology_score'])
-        english_score = int(request.form['english_score'])
-        geography_score = int(request.form['geography_score'])
-        total_score = float(request.form['total_score'])
-        average_score = float(request.form['average_score'])
-
-        recommendations = Recommendations(gender, part_time_job, absence_days, extracurricular_activities,
-                                          weekly_self_study_hours, math_score, history_score, physics_score,
-                                          chemistry_score, biology_score, english_score, geography_score,
-                                          total_score, average_score)
-
-        return render_template('results.html', recommendations=recommendations)
-    return render_template('home.html')
+        try:
+            args = read_predict_form(request.form)
+        except (KeyError, ValueError) as e:
+            return f"Invalid form data: {e}", 400
+        try:
+            recommendations = Recommendations(*args)
+        except BatcherOverloaded as e:
+            return str(e), 503
+
+        return results_template.render(recommendations=recommendations)
+    return static_response('home.html')
+
+@app.route('/predict/batch', methods=['POST'])
+def predict_batch():
+    try:
+        rows = read_batch_rows()
+        k = parse_k(request.args.get('k', 3))
+        feature_matrix = encode_batch(rows)
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': f"Invalid batch input: {e}"}), 400
+    return jsonify({'results': score_batch(rows, feature_matrix, k)})
+
+@app.route('/stats')
+def stats():
+    return jsonify(stats_payload())
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""Model artifacts as raw .npy arrays plus a JSON manifest.
+
+Unlike the pickles, the arrays can be memory-mapped read-only, so loading is
+a few mmap calls and every worker process on the host shares the same page
+cache pages instead of holding its own unpickled copy of the training data.
+
+    python artifacts.py export [--out Models/artifacts]
+"""
+import argparse
+import hashlib
+import json
+import os
+import pickle
+
+import numpy as np
+
+from compiled import CompiledRecommender
+
+ARTIFACTS_DIR = "Models/artifacts"
+FORMAT_VERSION = 1
+ARRAY_NAMES = ('mean', 'scale', 'fit_X', 'fit_y', 'fit_sq_norms')
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_artifacts(compiled, class_names, feature_order, out_dir=ARTIFACTS_DIR):
+    """Write the arrays of a CompiledRecommender and its manifest to out_dir."""
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {}
+    for name in ARRAY_NAMES:
+        array = np.ascontiguousarray(getattr(compiled, name))
+        path = os.path.join(out_dir, f"{name}.npy")
+        np.save(path, array)
+        arrays[name] = {'shape': list(array.shape), 'dtype': array.dtype.str, 'sha256': file_sha256(path)}
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'model': 'StandardScaler+KNeighborsClassifier',
+        'n_neighbors': compiled.n_neighbors,
+        'class_names': list(class_names),
+        'feature_order': list(feature_order),
+        'arrays': arrays,
+        # One hash for the whole model, derived from the hashes of its arrays
+        'hash': hashlib.sha256(''.join(arrays[name]['sha256'] for name in ARRAY_NAMES).encode()).hexdigest(),
+    }
+    with open(os.path.join(out_dir, "manifest.json"), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(path=ARTIFACTS_DIR):
+    with open(os.path.join(path, "manifest.json")) as f:
+        manifest = json.load(f)
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ValueError(f"Unsupported artifact format version {manifest.get('format_version')}")
+    return manifest
+
+
+def load_artifacts(path=ARTIFACTS_DIR, mmap_mode='r', verify=False):
+    """Return (CompiledRecommender, manifest) backed by memory-mapped arrays.
+
+    With verify=True every array file is re-hashed against the manifest,
+    which reads all pages once.
+    """
+    manifest = read_manifest(path)
+    arrays = {}
+    for name in ARRAY_NAMES:
+        array_path = os.path.join(path, f"{name}.npy")
+        if verify and file_sha256(array_path) != manifest['arrays'][name]['sha256']:
+            raise ValueError(f"{array_path} does not match the manifest hash")
+        arrays[name] = np.load(array_path, mmap_mode=mmap_mode)
+    compiled = CompiledRecommender(arrays['mean'], arrays['scale'], arrays['fit_X'], arrays['fit_y'],
+                                   len(manifest['class_names']), manifest['n_neighbors'],
+                                   fit_sq_norms=arrays['fit_sq_norms'])
+    return compiled, manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Models/scaler.pkl and Models/model.pkl as mmap-able arrays")
+    parser.add_argument('command', choices=['export'])
+    parser.add_argument('--out', default=ARTIFACTS_DIR)
+    args = parser.parse_args()
+
+    from app import class_names, feature_order
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    manifest = export_artifacts(CompiledRecommender.from_sklearn(scaler, model), class_names, feature_order, args.out)
+    print(f"Artifacts written to {args.out} (hash {manifest['hash']})")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,241 @@
+"""ASGI serving mode for the recommender with the same routes as app.py.
+
+Requests are handled on the event loop and model inference runs in a bounded
+thread or process pool. When `max_pending` predictions are already queued or
+running, /predict answers 503 with Retry-After right away instead of letting
+the queue grow.
+
+    python asgi.py [--host 0.0.0.0] [--port 8000] [--workers 4]
+
+or with any ASGI server: `uvicorn asgi:application --workers 4`.
+
+Configuration comes from the environment:
+    RECOMMENDER_POOL          "thread" (default) or "process"
+    RECOMMENDER_POOL_WORKERS  inference workers per server process (default: CPU count)
+    RECOMMENDER_MAX_PENDING   queued + running predictions before 503 (default: 32 x pool workers)
+"""
+import argparse
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import os
+import socket
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import app as recommender
+from batching import BatcherOverloaded
+from cache import unlink_shared_cache
+
+MAX_BODY_BYTES = 64 * 1024
+# /predict/batch bodies carry many rows
+MAX_BATCH_BODY_BYTES = 16 * 1024 * 1024
+
+
+class RecommenderASGI:
+    def __init__(self, pool='thread', workers=None, max_pending=None):
+        self.pool_kind = pool
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending or 32 * self.workers
+        self.pending = 0
+        self.rejected = 0
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            if self.pool_kind == 'process':
+                self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+            else:
+                self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix="inference")
+        return self._executor
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.handle(scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, scope, receive, send):
+        method, path = scope['method'], scope['path']
+        if path == '/' and method in ('GET', 'HEAD'):
+            await self.send_static(scope, send, 'home.html')
+        elif path == '/recommend' and method in ('GET', 'HEAD'):
+            await self.send_static(scope, send, 'recommend.html')
+        elif path == '/predict' and method == 'POST':
+            await self.predict(receive, send)
+        elif path == '/predict/batch' and method == 'POST':
+            await self.predict_batch(scope, receive, send)
+        elif path == '/stats' and method == 'GET':
+            await self.send_json(send, 200, self.stats())
+        elif path in ('/', '/recommend', '/predict', '/predict/batch', '/stats'):
+            await self.send(send, 405, b"Method Not Allowed", 'text/plain')
+        else:
+            await self.send(send, 404, b"Not Found", 'text/plain')
+
+    async def predict(self, receive, send):
+        body = await self.read_body(receive)
+        if body is None:
+            await self.send(send, 413, b"Request body too large", 'text/plain')
+            return
+        try:
+            args = recommender.read_predict_form(dict(parse_qsl(body.decode('utf-8'))))
+        except (KeyError, ValueError) as e:
+            await self.send(send, 400, f"Invalid form data: {e}".encode(), 'text/plain')
+            return
+
+        # Back-pressure: refuse new work instead of queueing without bound
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            await self.send(send, 503, b"Inference pool is saturated", 'text/plain', [(b'retry-after', b'1')])
+            return
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            recommendations = await loop.run_in_executor(self.executor, recommender.Recommendations, *args)
+        except BatcherOverloaded as e:
+            await self.send(send, 503, str(e).encode(), 'text/plain', [(b'retry-after', b'1')])
+            return
+        finally:
+            self.pending -= 1
+        body = recommender.results_template.render(recommendations=recommendations).encode('utf-8')
+        await self.send_html(send, 200, body)
+
+    async def predict_batch(self, scope, receive, send):
+        """Rows as JSON (a list, or an object with a 'rows' list) or as a CSV body, like app.py's route."""
+        body = await self.read_body(receive, MAX_BATCH_BODY_BYTES)
+        if body is None:
+            await self.send(send, 413, b"Request body too large", 'text/plain')
+            return
+        content_type = dict(scope['headers']).get(b'content-type', b'').decode('latin-1')
+        try:
+            text = body.decode('utf-8')
+            if content_type.split(';')[0].strip() == 'application/json':
+                rows = recommender.batch_rows_from_json(json.loads(text))
+            else:
+                rows = list(csv.DictReader(io.StringIO(text)))
+            k = recommender.parse_k(dict(parse_qsl(scope.get('query_string', b'').decode('latin-1'))).get('k', 3))
+            feature_matrix = recommender.encode_batch(rows)
+        except (KeyError, TypeError, ValueError, AttributeError) as e:
+            await self.send_json(send, 400, {'error': f"Invalid batch input: {e}"})
+            return
+
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            await self.send(send, 503, b"Inference pool is saturated", 'text/plain', [(b'retry-after', b'1')])
+            return
+        self.pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            results = await loop.run_in_executor(self.executor, recommender.score_batch, rows, feature_matrix, k)
+        finally:
+            self.pending -= 1
+        await self.send_json(send, 200, {'results': results})
+
+    async def read_body(self, receive, limit=MAX_BODY_BYTES):
+        chunks = []
+        size = 0
+        while True:
+            message = await receive()
+            chunk = message.get('body', b'')
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+            if not message.get('more_body'):
+                return b''.join(chunks)
+
+    async def send_static(self, scope, send, name):
+        request_headers = {key.decode('latin-1').title(): value.decode('latin-1') for key, value in scope['headers']}
+        status, headers, body = recommender.static_pages[name].response(request_headers)
+        if scope['method'] == 'HEAD':
+            headers = headers + [('Content-Length', str(len(body)))]
+            body = b''
+        await self.send(send, status, body, None,
+                        [(key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers])
+
+    async def send_html(self, send, status, body):
+        await self.send(send, status, body, 'text/html; charset=utf-8')
+
+    async def send_json(self, send, status, payload):
+        await self.send(send, status, json.dumps(payload).encode(), 'application/json')
+
+    async def send(self, send, status, body, content_type, headers=()):
+        response_headers = list(headers)
+        if content_type is not None:
+            response_headers.append((b'content-type', content_type.encode()))
+        if not any(key == b'content-length' for key, _ in response_headers):
+            response_headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': response_headers})
+        await send({'type': 'http.response.body', 'body': body})
+
+    def stats(self):
+        """app.py's /stats payload plus the inference pool."""
+        return {
+            **recommender.stats_payload(),
+            'pool': {
+                'kind': self.pool_kind,
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'pending': self.pending,
+                'rejected': self.rejected,
+            },
+        }
+
+
+application = RecommenderASGI(
+    pool=os.environ.get('RECOMMENDER_POOL', 'thread'),
+    workers=int(os.environ.get('RECOMMENDER_POOL_WORKERS', 0)) or None,
+    max_pending=int(os.environ.get('RECOMMENDER_MAX_PENDING', 0)) or None,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the recommender over ASGI with uvicorn")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help="server processes")
+    args = parser.parse_args()
+    try:
+        import uvicorn
+        from uvicorn.supervisors import Multiprocess
+    except ImportError:
+        raise SystemExit("The ASGI serving mode needs uvicorn: pip install -r requirements-asgi.txt")
+
+    config = uvicorn.Config("asgi:application", host=args.host, port=args.port, workers=args.workers,
+                            log_level='warning')
+    sock = config.bind_socket()
+    # Accepted connections inherit TCP_NODELAY from the listening socket; without it
+    # the separate header and body writes of a keep-alive response wait ~40ms on
+    # the client's delayed ACK.
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        if args.workers > 1:
+            Multiprocess(config, sockets=[sock]).run()
+        else:
+            uvicorn.Server(config).run(sockets=[sock])
+    finally:
+        # The workers are gone; none of them removes the shared cache itself
+        if recommender.shared_cache is not None:
+            unlink_shared_cache(os.environ['RECOMMENDER_SHARED_CACHE'])
+
+
+if __name__ == '__main__':
+    main()
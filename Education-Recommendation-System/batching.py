@@ -0,0 +1,125 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+import numpy as np
+
+
+class BatcherOverloaded(Exception):
+    """Raised when the batcher queue is full or a request waited too long."""
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-row predictions into one vectorized call.
+
+    Rows submitted from request threads are queued; a background thread takes
+    the first waiting row, keeps collecting until `max_batch_size` rows are
+    queued or `max_wait_ms` has passed, then runs `predict_fn(matrix, k)` once
+    on the stacked matrix (once per distinct k asked for) and hands every
+    caller its own result row.
+    """
+
+    def __init__(self, predict_fn, max_batch_size=64, max_wait_ms=2.0,
+                 max_queue_size=1024, timeout=1.0):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.timeout = timeout
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._queue_wait = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, features, k=3):
+        """Queue one feature row and block until its top-k prediction is ready."""
+        if self._closed:
+            raise BatcherOverloaded("Batcher is closed")
+        future = Future()
+        try:
+            self._queue.put_nowait((features, k, future, time.perf_counter()))
+        except queue.Full:
+            with self._lock:
+                self._rejected += 1
+            raise BatcherOverloaded("Prediction queue is full")
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeout:
+            # A cancelled request is skipped by the worker if it was not picked up yet
+            future.cancel()
+            with self._lock:
+                self._timed_out += 1
+            raise BatcherOverloaded("Prediction timed out waiting for a batch")
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            stopping = any(item is None for item in batch)
+            started = time.perf_counter()
+            live = [item for item in batch
+                    if item is not None and item[2].set_running_or_notify_cancel()]
+            if live:
+                self._predict(live, started)
+            if stopping:
+                return
+
+    def _predict(self, live, started):
+        with self._lock:
+            self._requests += len(live)
+            self._batch_sizes[len(live)] += 1
+            self._queue_wait += sum(started - enqueued for _, _, _, enqueued in live)
+        by_k = {}
+        for item in live:
+            by_k.setdefault(item[1], []).append(item)
+        for k, group in by_k.items():
+            try:
+                results = self.predict_fn(np.array([features for features, _, _, _ in group]), k)
+            except Exception as e:
+                for _, _, future, _ in group:
+                    future.set_exception(e)
+                continue
+            for (_, _, future, _), result in zip(group, results):
+                future.set_result(result)
+
+    def stats(self):
+        """Counters and the batch-size distribution as a JSON-friendly dict."""
+        with self._lock:
+            batches = sum(self._batch_sizes.values())
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000.0,
+                'queue_depth': self._queue.qsize(),
+                'requests': self._requests,
+                'batches': batches,
+                'rejected': self._rejected,
+                'timed_out': self._timed_out,
+                'mean_batch_size': self._requests / batches if batches else 0.0,
+                'mean_queue_wait_ms': self._queue_wait * 1000.0 / self._requests if self._requests else 0.0,
+                'batch_size_distribution': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+            }
+
+    def close(self):
+        """Stop the worker thread once the rows already queued are served."""
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
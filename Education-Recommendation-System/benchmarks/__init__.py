@@ -0,0 +1,2 @@
+"""Micro-benchmarks for the recommender. Run from the app directory, e.g.
+`python -m benchmarks.bench_topk`."""
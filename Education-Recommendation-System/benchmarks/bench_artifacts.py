@@ -0,0 +1,93 @@
+"""Per-worker startup time and memory: pickled model vs memory-mapped artifacts.
+
+Starts --workers processes per format. Each one loads the model and scores
+one row, then waits while its memory is read from /proc. PSS splits shared
+pages between the processes that map them, so it shows what the workers
+really cost together. Linux only.
+
+    python -m benchmarks.bench_artifacts [--workers 4] [--rows 200000]
+"""
+import argparse
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import textwrap
+import warnings
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+from app import class_names, feature_order
+from artifacts import export_artifacts
+from benchmarks.bench_neighbors import grow_training_set
+from compiled import CompiledRecommender
+
+WORKER = textwrap.dedent("""
+    import pickle, sys, time, warnings
+    import numpy as np
+    from sklearn.pipeline import make_pipeline
+    from artifacts import load_artifacts
+    warnings.filterwarnings('ignore')
+    mode, path = sys.argv[1], sys.argv[2]
+    start = time.perf_counter()
+    if mode == 'pickle':
+        model = make_pipeline(pickle.load(open(path + '/scaler.pkl', 'rb')), pickle.load(open(path + '/model.pkl', 'rb')))
+    else:
+        model, _ = load_artifacts(path)
+    model.predict_proba(np.zeros((1, 14)))
+    print((time.perf_counter() - start) * 1000.0, flush=True)
+    sys.stdin.read()
+""")
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if parts[0] in ('Rss:', 'Pss:', 'Anonymous:'):
+                values[parts[0][:-1]] = int(parts[1])
+    return values
+
+
+def run_workers(mode, path, n_workers):
+    workers = [subprocess.Popen([sys.executable, '-c', WORKER, mode, path], stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE, text=True) for _ in range(n_workers)]
+    load_ms = [float(worker.stdout.readline()) for worker in workers]
+    memory = [memory_kb(worker.pid) for worker in workers]
+    for worker in workers:
+        worker.communicate('')
+    return load_ms, memory
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--rows', type=int, default=None, help="grow the training set to this many rows")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    with tempfile.TemporaryDirectory() as pickle_dir, tempfile.TemporaryDirectory() as artifacts_dir:
+        if args.rows:
+            fit_X, fit_y = grow_training_set(model._fit_X, model._y, args.rows, np.random.default_rng(0))
+            model = KNeighborsClassifier(n_neighbors=model.n_neighbors).fit(fit_X, fit_y)
+        pickle.dump(scaler, open(os.path.join(pickle_dir, 'scaler.pkl'), 'wb'))
+        pickle.dump(model, open(os.path.join(pickle_dir, 'model.pkl'), 'wb'))
+        export_artifacts(CompiledRecommender.from_sklearn(scaler, model), class_names, feature_order, artifacts_dir)
+
+        print(f"training rows: {len(model._fit_X)}, workers: {args.workers}")
+        print(f"{'format':>10} {'load ms':>8} {'RSS MB':>7} {'anon MB':>8} {'PSS MB':>7} {'total PSS MB':>13}")
+        for mode, path in (('pickle', pickle_dir), ('artifacts', artifacts_dir)):
+            load_ms, memory = run_workers(mode, path, args.workers)
+            mean = {key: np.mean([m[key] for m in memory]) / 1024 for key in ('Rss', 'Anonymous', 'Pss')}
+            total_pss = sum(m['Pss'] for m in memory) / 1024
+            print(f"{mode:>10} {np.median(load_ms):>8.1f} {mean['Rss']:>7.1f} {mean['Anonymous']:>8.1f} "
+                  f"{mean['Pss']:>7.1f} {total_pss:>13.1f}")
+
+
+if __name__ == '__main__':
+    main()
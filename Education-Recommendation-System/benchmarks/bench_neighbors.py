@@ -0,0 +1,101 @@
+"""Query latency of the KNN backends against training-set size.
+
+The training set is grown synthetically by jittering the rows of
+Models/model.pkl; queries are rows of student-scores.csv, --queries of
+them sent one at a time and --batch of them as a single predict_proba call.
+The index searches a batch as a whole once it has at least as many queries
+as balls (about sqrt(rows)), which the default 2000 has at every default
+size. It scans training sets of up to neighbors_index.BRUTE_FORCE_ROWS rows
+whole, so on those every mode is exact.
+
+    python -m benchmarks.bench_neighbors [--sizes 4284 50000 100000 200000] [--nprobe 2 8] [--batch 2000]
+"""
+import argparse
+import csv
+import pickle
+import tempfile
+import time
+import warnings
+
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+
+from app import encode_row
+from compiled import CompiledRecommender
+from neighbors_index import NeighborIndex, build_index
+
+
+def grow_training_set(fit_X, fit_y, size, rng, jitter=0.05):
+    picks = rng.integers(0, len(fit_X), size)
+    return fit_X[picks] + rng.normal(0.0, jitter, (size, fit_X.shape[1])), fit_y[picks]
+
+
+def mean_latency_ms(predict, queries):
+    start = time.perf_counter()
+    for query in queries:
+        predict(query[None, :])
+    return (time.perf_counter() - start) * 1000.0 / len(queries)
+
+
+def batch_latency_ms(predict, queries):
+    """Milliseconds per row of one call on all the queries."""
+    start = time.perf_counter()
+    predict(queries)
+    return (time.perf_counter() - start) * 1000.0 / len(queries)
+
+
+def latencies(predict, queries, batch):
+    return mean_latency_ms(predict, queries), batch_latency_ms(predict, batch)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4284, 50000, 100000, 200000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[2, 8])
+    parser.add_argument('--queries', type=int, default=200, help="queries sent one at a time")
+    parser.add_argument('--batch', type=int, default=2000, help="queries sent as one batch")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    rng = np.random.default_rng(0)
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    base = CompiledRecommender.from_sklearn(scaler, model)
+    with open("student-scores.csv", newline='') as f:
+        rows = np.array([encode_row(row) for row in csv.DictReader(f)], dtype=float)
+    queries, batch = rows[:args.queries], rows[:args.batch]
+
+    print(f"{'rows':>8} {'balls':>6} {'backend':>12} {'ms/query':>9} {'batch ms/row':>13} {'recall':>7}")
+    for size in args.sizes:
+        if size == len(base.fit_X):
+            fit_X, fit_y = base.fit_X, base.fit_y
+        else:
+            fit_X, fit_y = grow_training_set(base.fit_X, base.fit_y, size, rng)
+        brute = CompiledRecommender(base.mean, base.scale, fit_X, fit_y, base.n_classes, base.n_neighbors)
+        kd_tree = KNeighborsClassifier(n_neighbors=base.n_neighbors, algorithm='kd_tree').fit(fit_X, fit_y)
+        scaled_queries = (queries - base.mean) / base.scale
+        exact = brute.kneighbors(queries)
+        kth = np.sqrt(((fit_X[exact] - scaled_queries[:, None, :]) ** 2).sum(axis=2)).max(axis=1, keepdims=True)
+
+        def recall(neighbors, data):
+            found = np.sqrt(((data[neighbors] - scaled_queries[:, None, :]) ** 2).sum(axis=2))
+            return (found <= kth * (1 + 1e-9)).mean()
+
+        results = [('sklearn kd', *latencies(lambda q: kd_tree.predict_proba((q - base.mean) / base.scale), queries,
+                                             batch), 1.0),
+                   ('brute force', *latencies(brute.predict_proba, queries, batch), 1.0)]
+        with tempfile.TemporaryDirectory() as index_dir:
+            build_index(base.mean, base.scale, fit_X, fit_y, base.n_classes, base.n_neighbors, index_dir)
+            for nprobe in [None] + args.nprobe:
+                index = NeighborIndex.load(index_dir, nprobe=nprobe)
+                name = "index exact" if nprobe is None else f"nprobe={nprobe}"
+                results.append((name, *latencies(index.predict_proba, queries, batch),
+                                recall(index.kneighbors(queries), index.fit_X)))
+                balls = len(index.centroids)
+                del index
+        for name, latency, batch_latency, hit_rate in results:
+            print(f"{size:>8} {balls:>6} {name:>12} {latency:>9.3f} {batch_latency:>13.4f} {hit_rate:>7.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+"""Recommender throughput, latency, memory and top-3 accuracy, saved as JSON.
+
+    python -m benchmarks.bench_recommender [--students 2000] [--concurrency 1 4 16] [--requests 2000]
+                                           [--inference sklearn] [--cache-size 0] [--output results.json]
+
+Synthetic students (benchmarks/synthetic.py) are scored by --concurrency
+threads at each level, twice: through Recommendations() directly and as
+/predict forms through Flask's test client, one client per thread, so
+the form parsing and template rendering are included but no sockets are.
+Each run reports requests per second, p50/p95/p99 latency and errors. The
+process RSS is reported before the model loads, after, and at its peak.
+Importing app is timed apart from loading the model, since the compiled
+backend is loaded and verified at import.
+
+Top-1 and top-3 accuracy are measured on the held-out rows of
+student-scores.csv: those that are not among the training rows of
+Models/model.pkl, as the notebook's train/test split left them.
+
+--inference and --cache-size set RECOMMENDER_INFERENCE and
+RECOMMENDER_CACHE_SIZE for the run. The cache is off by default, so every
+request reaches the model. Other RECOMMENDER_* settings, micro-batching
+for one, are taken from the environment. Results go to --output, by
+default benchmarks/results/recommender-<time>.json.
+"""
+import argparse
+import csv
+import json
+import os
+import pickle
+import platform
+import resource
+import sys
+import threading
+import time
+import warnings
+
+import numpy as np
+
+from benchmarks.synthetic import StudentDistribution
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+SUBJECTS = ['math_score', 'history_score', 'physics_score', 'chemistry_score', 'biology_score',
+            'english_score', 'geography_score']
+
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def recommendation_args(row):
+    """Arguments for Recommendations() from a student-scores.csv row."""
+    scores = [int(row[column]) for column in SUBJECTS]
+    return (row['gender'], row['part_time_job'] == 'True', int(row['absence_days']),
+            row['extracurricular_activities'] == 'True', int(row['weekly_self_study_hours']),
+            *scores, float(sum(scores)), sum(scores) / 7)
+
+
+def predict_form(row):
+    """The /predict form fields for a student-scores.csv row."""
+    form = {column: row[column] for column in ['gender', 'absence_days', 'weekly_self_study_hours', *SUBJECTS]}
+    form['part_time_job'] = row['part_time_job'].lower()
+    form['extracurricular_activities'] = row['extracurricular_activities'].lower()
+    scores = [int(row[column]) for column in SUBJECTS]
+    form['total_score'] = str(sum(scores))
+    form['average_score'] = f"{sum(scores) / 7:.6f}"
+    return form
+
+
+def run(make_call, items, concurrency, n_requests):
+    """Send n_requests items from `concurrency` threads; make_call() gives each thread its call.
+
+    A call returns whether it succeeded.
+    """
+    latencies, errors = [], 0
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def client():
+        nonlocal errors
+        call = make_call()
+        own_latencies, own_errors = [], 0
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                ok = call(items[i % len(items)])
+            except Exception:
+                ok = False
+            own_latencies.append(time.perf_counter() - start)
+            own_errors += not ok
+        with lock:
+            latencies.extend(own_latencies)
+            errors += own_errors
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'errors': errors,
+    }
+
+
+def held_out_rows(rows, encode_row):
+    """The rows of student-scores.csv that Models/model.pkl was not fitted on, and whether they could be told apart.
+
+    The model's training rows are scaled, so the rows are scaled the same way
+    and looked up among them. A model that does not keep its training rows
+    gets every row back.
+    """
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    fit_X = getattr(model, '_fit_X', None)
+    if fit_X is None:
+        return rows, False
+    scaled = scaler.transform(np.array([encode_row(row) for row in rows], dtype=float))
+    training = {tuple(row) for row in np.round(fit_X, 9)}
+    return [row for row, features in zip(rows, np.round(scaled, 9)) if tuple(features) not in training], True
+
+
+def accuracy(app, rows):
+    """Top-1 and top-3 accuracy of the served model on rows labelled with their career aspiration."""
+    feature_matrix = np.array([app.encode_row(row) for row in rows], dtype=float)
+    recommendations = app.recommend_matrix(feature_matrix, 3)
+    top1 = top3 = 0
+    for row, row_recommendations in zip(rows, recommendations):
+        careers = [career for career, _ in row_recommendations]
+        top1 += careers[0] == row['career_aspiration']
+        top3 += row['career_aspiration'] in careers
+    return {'rows': len(rows), 'top1': top1 / len(rows), 'top3': top3 / len(rows)}
+
+
+def print_runs(title, runs):
+    print(f"\n{title}")
+    print(f"{'concurrency':>11} {'rps':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for result in runs:
+        print(f"{result['concurrency']:>11} {result['rps']:>9.1f} {result['p50_ms']:>8.2f} "
+              f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>7}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--students', type=int, default=2000, help="synthetic students to score")
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 16])
+    parser.add_argument('--requests', type=int, default=2000, help="requests per concurrency level")
+    parser.add_argument('--inference', default=os.environ.get('RECOMMENDER_INFERENCE', 'sklearn'),
+                        choices=['sklearn', 'compiled', 'index', 'artifacts'])
+    parser.add_argument('--cache-size', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help="JSON file for the results")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    # app reads these when it is imported
+    os.environ['RECOMMENDER_INFERENCE'] = args.inference
+    os.environ['RECOMMENDER_CACHE_SIZE'] = str(args.cache_size)
+    rss_before_import = rss_mb()
+    start = time.perf_counter()
+    # The compiled backend is loaded and verified here, not by get_model()
+    import app
+    import_seconds = time.perf_counter() - start
+
+    students = list(StudentDistribution.from_csv().sample(args.students, np.random.default_rng(args.seed)))
+    rss_before_load = rss_mb()
+    start = time.perf_counter()
+    app.get_model()
+    load_seconds = time.perf_counter() - start
+    rss_after_load = rss_mb()
+    print(f"app imported in {import_seconds * 1000:.0f}ms, {args.inference} model loaded in "
+          f"{load_seconds * 1000:.0f}ms (+{rss_after_load - rss_before_load:.1f}MB RSS)")
+
+    direct_items = [recommendation_args(row) for row in students]
+    form_items = [predict_form(row) for row in students]
+
+    def direct_call():
+        return lambda item: len(app.Recommendations(*item)) == 3
+
+    def predict_call():
+        client = app.app.test_client()
+        return lambda form: client.post('/predict', data=form).status_code == 200
+
+    direct = [run(direct_call, direct_items, concurrency, args.requests) for concurrency in args.concurrency]
+    print_runs("Recommendations()", direct)
+    predict = [run(predict_call, form_items, concurrency, args.requests) for concurrency in args.concurrency]
+    print_runs("POST /predict (test client)", predict)
+
+    with open("student-scores.csv", newline='') as f:
+        rows = list(csv.DictReader(f))
+    held_out, separated = held_out_rows(rows, app.encode_row)
+    scores = accuracy(app, held_out)
+    scores['held_out'] = separated
+    print(f"\nTop-1 {scores['top1']:.1%}, top-3 {scores['top3']:.1%} on {scores['rows']} "
+          f"{'held-out' if separated else 'dataset (training rows could not be told apart)'} rows")
+
+    memory = {
+        'rss_before_import_mb': rss_before_import,
+        'rss_before_load_mb': rss_before_load,
+        'rss_after_load_mb': rss_after_load,
+        'rss_end_mb': rss_mb(),
+        'peak_rss_mb': peak_rss_mb(),
+    }
+    print(f"RSS {memory['rss_end_mb']:.1f}MB at the end, {memory['peak_rss_mb']:.1f}MB at peak")
+
+    results = {
+        'meta': {
+            'inference': args.inference, 'cache_size': args.cache_size, 'students': args.students,
+            'requests': args.requests, 'seed': args.seed, 'model_hash': app.get_model_hash(),
+            'micro_batching': app.batcher is not None, 'python': platform.python_version(),
+            'platform': platform.platform(), 'time': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        'import_seconds': import_seconds,
+        'model_load_seconds': load_seconds,
+        'direct': direct,
+        'predict': predict,
+        'accuracy': scores,
+        'memory': memory,
+    }
+    output = args.output or os.path.join(RESULTS, f"recommender-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved to {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""Requests per second of the page routes: render_template per request vs static_pages.py.
+
+Requests go through the WSGI stack with Flask's test client, so the numbers
+include routing and response building but no sockets.
+
+    python -m benchmarks.bench_static [--requests 5000]
+"""
+import argparse
+import time
+
+from flask import Flask, render_template
+
+import app as recommender
+
+RESULTS = [('Software Engineer', '60.00%'), ('Game Developer', '20.00%'), ('Scientist', '20.00%')]
+
+
+def baseline_app():
+    """The routes as they were, rendering the template on every request."""
+    baseline = Flask(__name__, template_folder=recommender.app.template_folder,
+                     root_path=recommender.app.root_path)
+    baseline.add_url_rule('/', 'home', lambda: render_template('home.html'))
+    baseline.add_url_rule('/recommend', 'recommend', lambda: render_template('recommend.html'))
+    baseline.add_url_rule('/results', 'results', lambda: render_template('results.html', recommendations=RESULTS))
+    return baseline
+
+
+def fast_app():
+    fast = Flask(__name__)
+    fast.add_url_rule('/results', 'results', lambda: recommender.results_template.render(recommendations=RESULTS))
+    return fast
+
+
+def requests_per_second(client, path, n_requests, headers=None, repeat=5):
+    """Best of `repeat` runs, and the response size in bytes."""
+    size = len(client.get(path, headers=headers).data)
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            client.get(path, headers=headers)
+        best = min(best, time.perf_counter() - start)
+    return n_requests / best, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    before = baseline_app().test_client()
+    after = recommender.app.test_client()
+    gzip = {'Accept-Encoding': 'gzip, deflate, br'}
+    print(f"{'route':<16} {'before rps':>11} {'bytes':>6} {'after rps':>10} {'bytes':>6} {'speedup':>8}")
+    for path in ('/', '/recommend'):
+        old, old_size = requests_per_second(before, path, args.requests)
+        etag = after.get(path, headers=gzip).headers['ETag']
+        cases = [('', None), (' gzip', gzip), (' 304', {**gzip, 'If-None-Match': etag})]
+        for label, headers in cases:
+            new, size = requests_per_second(after, path, args.requests, headers)
+            print(f"{path + label:<16} {old:>11.0f} {old_size:>6} {new:>10.0f} {size:>6} {new / old:>7.2f}x")
+    old, old_size = requests_per_second(before, '/results', args.requests)
+    new, size = requests_per_second(fast_app().test_client(), '/results', args.requests)
+    print(f"{'results.html':<16} {old:>11.0f} {old_size:>6} {new:>10.0f} {size:>6} {new / old:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""Top-k selection and formatting: argsort + per-item formatting vs topk.py.
+
+    python -m benchmarks.bench_topk [--k 3] [--rows 1 1024]
+
+"same" tells whether top_k picked the classes argsort did, in its order.
+"""
+import argparse
+import timeit
+
+import numpy as np
+
+from topk import top_k, TopKFormatter
+
+
+def format_probability(prob):
+    return f"{prob:.2%}"
+
+
+def argsort_top_k(probabilities, class_names, k):
+    """The previous implementation, one row at a time."""
+    results = []
+    for row in probabilities:
+        top_classes_idx = np.argsort(-row)[:k]
+        results.append([(class_names[idx], format_probability(row[idx])) for idx in top_classes_idx])
+    return results
+
+
+def synthetic_probabilities(n_rows, n_classes, rng):
+    # KNN style probabilities: votes of 5 neighbours, so plenty of ties
+    votes = rng.integers(0, n_classes, size=(n_rows, 5))
+    probabilities = np.zeros((n_rows, n_classes))
+    np.add.at(probabilities, (np.arange(n_rows)[:, None], votes), 0.2)
+    return probabilities
+
+
+def best_of(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--k', type=int, default=3)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1, 1024])
+    parser.add_argument('--classes', type=int, nargs='+', default=[17, 1000])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'classes':>8} {'rows':>6} {'argsort us':>12} {'top_k us':>10} {'speedup':>8} {'same':>5}")
+    for n_classes in args.classes:
+        class_names = [f"class_{i}" for i in range(n_classes)]
+        formatter = TopKFormatter(class_names)
+        for n_rows in args.rows:
+            probabilities = synthetic_probabilities(n_rows, n_classes, rng)
+            old = best_of(lambda: argsort_top_k(probabilities, class_names, args.k))
+            new = best_of(lambda: formatter(*top_k(probabilities, args.k)))
+            same = argsort_top_k(probabilities, class_names, args.k) == formatter(*top_k(probabilities, args.k))
+            print(f"{n_classes:>8} {n_rows:>6} {old * 1e6:>12.1f} {new * 1e6:>10.1f} {old / new:>7.2f}x "
+                  f"{'yes' if same else 'no':>5}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+"""Load test for a running recommender server.
+
+Posts /predict forms built from student-scores.csv rows from --concurrency
+client threads, each with its own keep-alive connection, and reports
+requests per second and p50/p99 latency. Run it once against each server,
+e.g. `python app.py` (port 5000) and `python asgi.py` (port 8000):
+
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --concurrency 16 --requests 4000
+"""
+import argparse
+import csv
+import http.client
+import socket
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+
+
+def predict_forms(path="student-scores.csv"):
+    forms = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            scores = [int(row[column]) for column in ('math_score', 'history_score', 'physics_score',
+                                                      'chemistry_score', 'biology_score',
+                                                      'english_score', 'geography_score')]
+            form = {column: row[column] for column in ('gender', 'absence_days', 'weekly_self_study_hours',
+                                                       'math_score', 'history_score', 'physics_score',
+                                                       'chemistry_score', 'biology_score',
+                                                       'english_score', 'geography_score')}
+            form['part_time_job'] = row['part_time_job'].lower()
+            form['extracurricular_activities'] = row['extracurricular_activities'].lower()
+            form['total_score'] = sum(scores)
+            form['average_score'] = f"{sum(scores) / 7:.6f}"
+            forms.append(urlencode(form).encode())
+    return forms
+
+
+def connect(target):
+    connection = http.client.HTTPConnection(target.hostname, target.port or 80, timeout=30)
+    connection.connect()
+    # Headers and body go out as separate writes; without TCP_NODELAY Nagle holds
+    # the body back for a delayed ACK and every request picks up ~40ms.
+    connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    return connection
+
+
+def run(url, concurrency, n_requests, forms):
+    target = urlsplit(url)
+    latencies = []
+    statuses = {}
+    lock = threading.Lock()
+    counter = iter(range(n_requests))
+
+    def client():
+        connection = connect(target)
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        own_latencies, own_statuses = [], {}
+        for i in counter:
+            start = time.perf_counter()
+            try:
+                connection.request('POST', '/predict', forms[i % len(forms)], headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = connect(target)
+                status = 'error'
+            own_latencies.append(time.perf_counter() - start)
+            own_statuses[status] = own_statuses.get(status, 0) + 1
+        with lock:
+            latencies.extend(own_latencies)
+            for status, count in own_statuses.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    if not latencies:
+        raise SystemExit(f"No requests completed against {url}")
+    latencies_ms = np.array(latencies) * 1000.0
+    return {
+        'url': url,
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'rps': len(latencies) / elapsed,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+        'statuses': statuses,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    forms = predict_forms()
+    print(f"{'concurrency':>11} {'rps':>8} {'p50 ms':>8} {'p99 ms':>8}  statuses")
+    for concurrency in args.concurrency:
+        result = run(args.url, concurrency, args.requests, forms)
+        print(f"{concurrency:>11} {result['rps']:>8.1f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f}  {result['statuses']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Synthetic students with the distributions of student-scores.csv.
+
+Each career aspiration is sampled as often as in the dataset, and the rest
+of a student is drawn from the students with that aspiration: gender, part
+time job and extracurriculars with their frequencies, absence days from
+their empirical distribution, and study hours and the seven subject scores
+from a multivariate normal with their means and covariance, rounded and
+clipped to the observed range. Correlations between subjects, and between
+scores and aspiration, carry over, so the model sees realistic inputs.
+
+    python -m benchmarks.synthetic --rows 100000 students.csv [--seed 0]
+"""
+import argparse
+import csv
+
+import numpy as np
+
+# Columns drawn from the multivariate normal, in this order
+NUMERIC_COLUMNS = ['weekly_self_study_hours', 'math_score', 'history_score', 'physics_score',
+                   'chemistry_score', 'biology_score', 'english_score', 'geography_score']
+FLAG_COLUMNS = ['part_time_job', 'extracurricular_activities']
+FIELDNAMES = ['id', 'first_name', 'last_name', 'email', 'gender', 'part_time_job', 'absence_days',
+              'extracurricular_activities', 'weekly_self_study_hours', 'career_aspiration',
+              'math_score', 'history_score', 'physics_score', 'chemistry_score', 'biology_score',
+              'english_score', 'geography_score']
+
+
+class StudentDistribution:
+    """Per-aspiration distributions fitted to rows in the student-scores.csv layout."""
+
+    def __init__(self, rows):
+        self.careers = sorted({row['career_aspiration'] for row in rows})
+        counts = np.array([sum(row['career_aspiration'] == career for row in rows) for career in self.careers])
+        self.career_weights = counts / counts.sum()
+        self.groups = {}
+        for career in self.careers:
+            group = [row for row in rows if row['career_aspiration'] == career]
+            numeric = np.array([[float(row[column]) for column in NUMERIC_COLUMNS] for row in group])
+            self.groups[career] = {
+                'female': np.mean([row['gender'] == 'female' for row in group]),
+                'flags': {column: np.mean([row[column] == 'True' for row in group]) for column in FLAG_COLUMNS},
+                'absence_days': np.array([int(row['absence_days']) for row in group]),
+                'mean': numeric.mean(axis=0),
+                # A single-student group has no spread; fall back to none rather than NaN
+                'cov': np.cov(numeric, rowvar=False) if len(group) > 1 else np.zeros((len(NUMERIC_COLUMNS),) * 2),
+            }
+        numeric = np.array([[float(row[column]) for column in NUMERIC_COLUMNS] for row in rows])
+        self.low, self.high = numeric.min(axis=0), numeric.max(axis=0)
+
+    @classmethod
+    def from_csv(cls, path="student-scores.csv"):
+        with open(path, newline='') as f:
+            return cls(list(csv.DictReader(f)))
+
+    def sample(self, n_rows, rng):
+        """Yield n_rows rows in the student-scores.csv layout, as dicts of strings."""
+        careers = rng.choice(len(self.careers), size=n_rows, p=self.career_weights)
+        for i, career_index in enumerate(careers, start=1):
+            career = self.careers[career_index]
+            group = self.groups[career]
+            numeric = rng.multivariate_normal(group['mean'], group['cov'], check_valid='ignore')
+            numeric = np.clip(np.rint(numeric), self.low, self.high).astype(int)
+            gender = 'female' if rng.random() < group['female'] else 'male'
+            row = {
+                'id': str(i), 'first_name': f"Student{i}", 'last_name': "Synthetic",
+                'email': f"student{i}@example.com", 'gender': gender,
+                'absence_days': str(rng.choice(group['absence_days'])), 'career_aspiration': career,
+            }
+            for column in FLAG_COLUMNS:
+                row[column] = str(bool(rng.random() < group['flags'][column]))
+            row.update(zip(NUMERIC_COLUMNS, map(str, numeric)))
+            yield row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output')
+    parser.add_argument('--rows', type=int, default=10000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--source', default="student-scores.csv", help="dataset whose distributions are copied")
+    args = parser.parse_args()
+
+    distribution = StudentDistribution.from_csv(args.source)
+    with open(args.output, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        writer.writerows(distribution.sample(args.rows, np.random.default_rng(args.seed)))
+
+
+if __name__ == '__main__':
+    main()
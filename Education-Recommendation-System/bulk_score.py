@@ -0,0 +1,201 @@
+"""Score large student-scores.csv style exports offline.
+
+The input is read in chunks of --chunk-size rows. Each chunk is encoded and
+scored as one matrix by a pool of worker processes, and the top-k careers
+and probabilities are written in input order to CSV or Parquet. At most
+2 x --workers chunks are in flight, so memory stays flat however long the
+input is.
+
+    python bulk_score.py nightly.csv scores.csv [--k 3] [--workers 4] [--chunk-size 10000]
+    python bulk_score.py nightly.csv scores.parquet      # needs pyarrow
+
+The model is chosen with RECOMMENDER_INFERENCE, like the web app.
+"""
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import app as recommender
+from topk import top_k
+
+
+def read_chunks(path, chunk_size):
+    """Yield (header, list of rows) chunks of a CSV file."""
+    with open(path, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            # An empty file has no rows to score
+            return
+        while True:
+            rows = list(itertools.islice(reader, chunk_size))
+            if not rows:
+                return
+            yield header, rows
+
+
+def encode_chunk(header, rows):
+    """Feature matrix of a chunk, column by column; matches app.encode_row."""
+    columns = {name: i for i, name in enumerate(header)}
+
+    def column(name):
+        return np.array([row[columns[name]] for row in rows])
+
+    def is_true(name):
+        return np.char.lower(np.char.strip(column(name))) == 'true'
+
+    def given_or(name, derived):
+        if name not in columns:
+            return derived
+        given = column(name)
+        missing = given == ''
+        return np.where(missing, derived, np.where(missing, '0', given).astype(float))
+
+    scores = np.column_stack([column(name).astype(np.int64) for name in recommender.subject_columns])
+    # Derive total_score/average_score the same way the notebook does when they are missing
+    total_score = given_or('total_score', scores.sum(axis=1).astype(float))
+    average_score = given_or('average_score', total_score / 7)
+
+    return np.column_stack([
+        np.char.lower(column('gender')) == 'female',
+        is_true('part_time_job'),
+        column('absence_days').astype(np.int64),
+        is_true('extracurricular_activities'),
+        column('weekly_self_study_hours').astype(np.int64),
+        scores,
+        total_score,
+        average_score,
+    ]).astype(float)
+
+
+def score_chunk(header, rows, k):
+    """Rows of (id, career_1, probability_1, ..., career_k, probability_k) for a chunk."""
+    probabilities = recommender.predict_proba(encode_chunk(header, rows))
+    classes, values = top_k(probabilities, k)
+    names = np.array(recommender.class_names, dtype=object)[classes]
+    id_index = header.index('id') if 'id' in header else None
+    ids = [row[id_index] if id_index is not None else None for row in rows]
+    return [[row_id, *itertools.chain.from_iterable(zip(row_names, row_values))]
+            for row_id, row_names, row_values in zip(ids, names.tolist(), values.tolist())]
+
+
+def load_worker_model():
+    recommender.get_model()
+
+
+class CSVOutput:
+    def __init__(self, path, columns):
+        self._file = open(path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetOutput:
+    def __init__(self, path, columns):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise SystemExit("Parquet output needs pyarrow: pip install pyarrow")
+        self._pyarrow = pyarrow
+        fields = [pyarrow.field('id', pyarrow.string())]
+        for name in columns[1:]:
+            fields.append(pyarrow.field(name, pyarrow.string() if name.startswith('career') else pyarrow.float64()))
+        self._schema = pyarrow.schema(fields)
+        self._writer = pyarrow.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        arrays = [list(values) for values in zip(*rows)]
+        self._writer.write_table(self._pyarrow.Table.from_arrays(arrays, schema=self._schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def output_columns(k):
+    columns = ['id']
+    for rank in range(1, k + 1):
+        columns += [f"career_{rank}", f"probability_{rank}"]
+    return columns
+
+
+def score_file(input_path, output_path, k=3, workers=None, chunk_size=10000, progress=None):
+    """Score input_path into output_path; returns (rows scored, seconds).
+
+    k is capped at the number of careers, as top_k would cap it anyway.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    k = max(0, min(k, len(recommender.class_names)))
+    columns = output_columns(k)
+    output_class = ParquetOutput if output_path.endswith('.parquet') else CSVOutput
+    output = output_class(output_path, columns)
+    n_rows = 0
+    start = time.perf_counter()
+
+    def write(chunk_rows, scored):
+        nonlocal n_rows
+        output.write(scored)
+        n_rows += chunk_rows
+        if progress:
+            progress(n_rows, time.perf_counter() - start)
+
+    try:
+        if workers == 0:
+            for header, rows in read_chunks(input_path, chunk_size):
+                write(len(rows), score_chunk(header, rows, k))
+        else:
+            with ProcessPoolExecutor(workers, initializer=load_worker_model) as pool:
+                pending = deque()
+                for header, rows in read_chunks(input_path, chunk_size):
+                    pending.append((len(rows), pool.submit(score_chunk, header, rows, k)))
+                    # Write finished chunks in input order, keeping at most 2 per worker queued
+                    while len(pending) >= 2 * workers or (pending and pending[0][1].done()):
+                        chunk_rows, future = pending.popleft()
+                        write(chunk_rows, future.result())
+                while pending:
+                    chunk_rows, future = pending.popleft()
+                    write(chunk_rows, future.result())
+    finally:
+        output.close()
+    return n_rows, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score a student-scores.csv style file offline")
+    parser.add_argument('input')
+    parser.add_argument('output', help="output path; .parquet writes Parquet, anything else CSV")
+    parser.add_argument('--k', type=int, default=3, help="careers per student, capped at the number of careers")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="scoring processes (default: CPU count, 0 scores in this process)")
+    parser.add_argument('--chunk-size', type=int, default=10000)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    last_report = [0.0]
+
+    def progress(n_rows, elapsed):
+        if not args.quiet and elapsed - last_report[0] >= 1.0:
+            last_report[0] = elapsed
+            print(f"\r{n_rows} rows, {n_rows / elapsed:,.0f} rows/s", end='', file=sys.stderr, flush=True)
+
+    n_rows, elapsed = score_file(args.input, args.output, args.k, args.workers, args.chunk_size, progress)
+    rate = n_rows / elapsed if elapsed else 0.0
+    print(f"\rScored {n_rows} rows in {elapsed:.1f}s ({rate:,.0f} rows/s) -> {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,181 @@
+import argparse
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+
+class PredictionCache:
+    """Bounded in-process LRU cache of recommendations with an optional TTL.
+
+    Entries belong to one model: check_model() clears the cache whenever the
+    hash of the loaded model changes.
+    """
+
+    def __init__(self, max_size=4096, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.model_hash = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def check_model(self, model_hash):
+        with self._lock:
+            if model_hash != self.model_hash:
+                if self._entries:
+                    self.invalidations += 1
+                self._entries.clear()
+                self.model_hash = model_hash
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.ttl is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'invalidations': self.invalidations,
+                'model_hash': self.model_hash,
+            }
+
+
+class SharedPredictionCache:
+    """Direct-mapped cache in a named shared memory block, shared by worker processes.
+
+    Each key hashes to one slot that holds the feature vector, k, the model
+    hash, the top-k class indices and formatted probabilities, and a CRC of
+    all of them. Writers overwrite the slot; readers only accept a slot whose
+    key, model hash and CRC all match, so a concurrently torn or stale slot
+    is simply a miss.
+
+    The block outlives every process that uses it, the one that created it
+    included, so that no worker exiting takes it away from the others. The
+    process that owns the workers removes it with unlink_shared_cache() once
+    they are gone.
+    """
+
+    def __init__(self, name, class_names, n_features=14, slots=65536, max_k=5):
+        self.class_names = list(class_names)
+        self.class_index = {class_name: i for i, class_name in enumerate(self.class_names)}
+        self.max_k = max_k
+        self.slot_dtype = np.dtype([('crc', '<u4'), ('k', '<u2'), ('model', 'S16'),
+                                    ('features', '<f8', (n_features,)),
+                                    ('classes', '<i2', (max_k,)), ('probabilities', 'S8', (max_k,))])
+        size = self.slot_dtype.itemsize * slots
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._shm = shared_memory.SharedMemory(name=name)
+        # Otherwise the resource tracker unlinks the block when this process exits
+        resource_tracker.unregister(self._shm._name, 'shared_memory')
+        self._slots = np.ndarray((self._shm.size // self.slot_dtype.itemsize,), dtype=self.slot_dtype,
+                                 buffer=self._shm.buf)
+        self.model_hash = b''
+        self.hits = 0
+        self.misses = 0
+
+    def check_model(self, model_hash):
+        self.model_hash = (model_hash or '').encode()[:16]
+
+    def _crc(self, record):
+        return zlib.crc32(record.tobytes()[4:])
+
+    def _slot(self, features, k):
+        return hash((features, k)) % len(self._slots)
+
+    def get(self, features, k):
+        record = self._slots[self._slot(features, k)].copy()
+        if (record['k'] != k or record['model'] != self.model_hash or record['crc'] != self._crc(record)
+                or tuple(record['features'].tolist()) != features):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return [(self.class_names[class_id], probability.decode())
+                for class_id, probability in zip(record['classes'][:k].tolist(), record['probabilities'][:k])]
+
+    def put(self, features, k, value):
+        if k > self.max_k or len(value) != k:
+            return
+        record = np.zeros((), dtype=self.slot_dtype)
+        record['k'] = k
+        record['model'] = self.model_hash
+        record['features'] = features
+        record['classes'][:k] = [self.class_index[class_name] for class_name, _ in value]
+        record['probabilities'][:k] = [probability.encode() for _, probability in value]
+        record['crc'] = self._crc(record)
+        self._slots[self._slot(features, k)] = record
+
+    def close(self):
+        self._slots = None
+        self._shm.close()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'name': self._shm.name,
+            'slots': len(self._slots),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+
+def unlink_shared_cache(name):
+    """Remove a SharedPredictionCache block once no process uses it; False if there was none."""
+    try:
+        shm = shared_memory.SharedMemory(name=name)
+    except FileNotFoundError:
+        return False
+    shm.close()
+    shm.unlink()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the shared prediction cache")
+    parser.add_argument('command', choices=['unlink'])
+    parser.add_argument('name', help="the RECOMMENDER_SHARED_CACHE name")
+    args = parser.parse_args()
+    if unlink_shared_cache(args.name):
+        print(f"Removed shared cache {args.name}")
+    else:
+        print(f"No shared cache named {args.name}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+import numpy as np
+
+
+class CompiledRecommender:
+    """StandardScaler + KNeighborsClassifier folded into plain NumPy arrays.
+
+    The scaler's mean/scale and the classifier's training matrix, labels and
+    neighbour count are copied out once, so predict_proba is a subtract,
+    divide, one matrix product and a vote, with none of sklearn's per-call
+    input validation.
+    """
+
+    # Rows scored per matrix product, bounding the distance matrix to ~chunk x n_train
+    chunk_size = 256
+
+    def __init__(self, mean, scale, fit_X, fit_y, n_classes, n_neighbors, fit_sq_norms=None):
+        self.mean = np.ascontiguousarray(mean, dtype=np.float64)
+        self.scale = np.ascontiguousarray(scale, dtype=np.float64)
+        self.fit_X = np.ascontiguousarray(fit_X, dtype=np.float64)
+        self.fit_y = np.ascontiguousarray(fit_y, dtype=np.intp)
+        self.n_classes = int(n_classes)
+        self.n_neighbors = int(n_neighbors)
+        # |y|^2 of every training row; |x|^2 is the same for all neighbours of x
+        # so it is left out of the ranking.
+        if fit_sq_norms is None:
+            fit_sq_norms = np.einsum('ij,ij->i', self.fit_X, self.fit_X)
+        self.fit_sq_norms = fit_sq_norms
+
+    @classmethod
+    def from_sklearn(cls, scaler, model):
+        if not hasattr(scaler, 'mean_') or not hasattr(model, '_fit_X'):
+            raise ValueError("Compiled inference needs a fitted StandardScaler and KNeighborsClassifier")
+        if model.weights != 'uniform' or model.effective_metric_ != 'euclidean':
+            raise ValueError("Compiled inference only supports uniform weights and euclidean distance")
+        return cls(scaler.mean_, scaler.scale_, model._fit_X, model._y,
+                   len(model.classes_), model.n_neighbors)
+
+    def kneighbors(self, feature_matrix):
+        """Indices of the n_neighbors closest training rows, for every row."""
+        scaled = (np.asarray(feature_matrix, dtype=np.float64) - self.mean) / self.scale
+        distances = self.fit_sq_norms - 2.0 * (scaled @ self.fit_X.T)
+        return np.argpartition(distances, self.n_neighbors - 1, axis=1)[:, :self.n_neighbors]
+
+    def predict_proba(self, feature_matrix):
+        if len(feature_matrix) > self.chunk_size:
+            return np.concatenate([self.predict_proba(feature_matrix[start:start + self.chunk_size])
+                                   for start in range(0, len(feature_matrix), self.chunk_size)])
+        neighbors = self.kneighbors(feature_matrix)
+        labels = self.fit_y[neighbors]
+        rows = np.arange(labels.shape[0])
+        probabilities = np.zeros((labels.shape[0], self.n_classes))
+        for column in labels.T:
+            probabilities[rows, column] += 1.0
+        return probabilities / self.n_neighbors
+
+    def verify(self, scaler, model, feature_matrix):
+        """True when predictions match the sklearn pipeline bit for bit."""
+        expected = model.predict_proba(scaler.transform(feature_matrix))
+        return np.array_equal(self.predict_proba(feature_matrix), expected)
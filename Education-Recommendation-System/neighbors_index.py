@@ -0,0 +1,259 @@
+"""Persistent nearest-neighbour index for the KNN career recommender.
+
+The scaled training rows are clustered offline into `n_lists` balls (k-means
+centroids plus the radius of every ball) and written cluster by cluster as
+raw .npy files, so the index can be memory-mapped read-only at startup.
+
+Queries visit the balls closest to the student first:
+  * exact mode keeps visiting while a ball could still hold a closer row
+    than the current k-th neighbour (its centroid distance minus radius),
+    so it returns the same neighbours as a full scan;
+  * approximate mode visits only the `nprobe` closest balls, trading recall
+    for latency.
+
+Build it from the pickled scaler/model with:
+
+    python neighbors_index.py build [--out Models/knn_index] [--lists N]
+"""
+import argparse
+import csv
+import json
+import os
+import pickle
+
+import numpy as np
+
+from compiled import CompiledRecommender
+
+INDEX_DIR = "Models/knn_index"
+# Training sets up to this size are scanned whole rather than ball by ball
+BRUTE_FORCE_ROWS = 10000
+
+
+def kmeans(data, n_clusters, n_iter=10, seed=0, chunk_size=4096):
+    """Plain Lloyd iterations; returns (centroids, assignment of every row)."""
+    rng = np.random.default_rng(seed)
+    centroids = data[rng.choice(len(data), n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assignment = assign(data, centroids, chunk_size)
+        counts = np.bincount(assignment, minlength=n_clusters)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, data)
+        non_empty = counts > 0
+        centroids[non_empty] = sums[non_empty] / counts[non_empty, None]
+    return centroids, assign(data, centroids, chunk_size)
+
+
+def assign(data, centroids, chunk_size=4096):
+    centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+    return np.concatenate([np.argmin(centroid_sq_norms - 2.0 * (data[start:start + chunk_size] @ centroids.T), axis=1)
+                           for start in range(0, len(data), chunk_size)])
+
+
+def build_index(mean, scale, fit_X, fit_y, n_classes, n_neighbors, out_dir=INDEX_DIR, n_lists=None):
+    """Cluster the scaled training rows and write the index files to out_dir."""
+    fit_X = np.asarray(fit_X, dtype=np.float64)
+    fit_y = np.asarray(fit_y, dtype=np.intp)
+    if n_lists is None:
+        n_lists = max(1, int(np.sqrt(len(fit_X))))
+    centroids, assignment = kmeans(fit_X, n_lists)
+    order = np.argsort(assignment, kind='stable')
+    vectors = fit_X[order]
+    labels = fit_y[order]
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=n_lists))])
+    radii = np.zeros(n_lists)
+    for ball in range(n_lists):
+        members = vectors[offsets[ball]:offsets[ball + 1]]
+        if len(members):
+            radii[ball] = np.sqrt(((members - centroids[ball]) ** 2).sum(axis=1).max())
+
+    os.makedirs(out_dir, exist_ok=True)
+    arrays = {'mean': mean, 'scale': scale, 'vectors': vectors, 'labels': labels,
+              'sq_norms': np.einsum('ij,ij->i', vectors, vectors), 'centroids': centroids,
+              'radii': radii, 'offsets': offsets}
+    for name, array in arrays.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(out_dir, "index.json"), 'w') as f:
+        json.dump({'n_classes': int(n_classes), 'n_neighbors': int(n_neighbors),
+                   'n_lists': int(n_lists), 'n_rows': int(len(vectors))}, f, indent=2)
+
+
+class NeighborIndex(CompiledRecommender):
+    """Ball-partitioned KNN index; `nprobe=None` is exact, an int is approximate.
+
+    Indexes of up to `brute_force_rows` rows are searched by scanning every row.
+    """
+
+    # predict_proba hands _query batches this large, so that batches share the
+    # work of the balls they visit; only the brute-force scan needs smaller ones
+    chunk_size = 4096
+
+    def __init__(self, mean, scale, vectors, labels, sq_norms, centroids, radii, offsets,
+                 n_classes, n_neighbors, nprobe=None, brute_force_rows=BRUTE_FORCE_ROWS):
+        super().__init__(mean, scale, vectors, labels, n_classes, n_neighbors, fit_sq_norms=sq_norms)
+        self.centroids = centroids
+        self.centroid_sq_norms = np.einsum('ij,ij->i', centroids, centroids)
+        self.radii = radii
+        self.offsets = offsets
+        self.nprobe = nprobe
+        self.brute_force_rows = brute_force_rows
+
+    @classmethod
+    def load(cls, path=INDEX_DIR, nprobe=None, mmap_mode='r', brute_force_rows=BRUTE_FORCE_ROWS):
+        with open(os.path.join(path, "index.json")) as f:
+            meta = json.load(f)
+        # Plain ndarray views of the maps: slicing an np.memmap costs more than the slice
+        arrays = {name: np.asarray(np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mmap_mode))
+                  for name in ('mean', 'scale', 'vectors', 'labels', 'sq_norms', 'centroids', 'radii', 'offsets')}
+        return cls(n_classes=meta['n_classes'], n_neighbors=meta['n_neighbors'], nprobe=nprobe,
+                   brute_force_rows=brute_force_rows, **arrays)
+
+    def kneighbors(self, feature_matrix):
+        scaled = (np.asarray(feature_matrix, dtype=np.float64) - self.mean) / self.scale
+        return self._query(scaled)
+
+    def _query(self, queries):
+        """Indices of the k nearest rows of every query.
+
+        A query on its own visits balls nearest first and stops as soon as no
+        ball can hold a closer row. A batch with at least as many queries as
+        there are balls (any batch, in approximate mode) is searched as a whole
+        instead, in passes that each go twice as deep into every query's list
+        of balls, with every ball scored against all the queries that visit it
+        as one matrix. Training sets of up to brute_force_rows rows are scanned
+        whole, which is faster there.
+        """
+        k = self.n_neighbors
+        n_queries = len(queries)
+        query_sq_norms = np.einsum('ij,ij->i', queries, queries)
+        if len(self.fit_X) <= self.brute_force_rows:
+            return self._brute_force(queries, query_sq_norms)
+        centroid_distances = np.sqrt(np.maximum(
+            self.centroid_sq_norms - 2.0 * (queries @ self.centroids.T) + query_sq_norms[:, None], 0.0))
+        if self.nprobe is None:
+            # Lower bound on the distance from each query to anything inside each ball
+            bounds = np.maximum(centroid_distances - self.radii, 0.0)
+            order = bounds
+        else:
+            bounds = None
+            order = centroid_distances
+        best_idx = np.zeros((n_queries, k), dtype=np.intp)
+        best_dist = np.full((n_queries, k), np.inf)
+
+        if n_queries == 1 or (bounds is not None and n_queries < len(self.centroids)):
+            # Too few queries per ball for scoring them together to pay off
+            visits = np.argsort(order, axis=1)
+            for i in range(n_queries):
+                if bounds is None:
+                    self._scan_one(queries[i], query_sq_norms[i], visits[i, :self.nprobe], None,
+                                   best_idx[i], best_dist[i])
+                else:
+                    self._scan_one(queries[i], query_sq_norms[i], visits[i], bounds[i], best_idx[i], best_dist[i])
+        elif bounds is None:
+            visit = np.zeros(order.shape, dtype=bool)
+            visit[np.arange(n_queries)[:, None], np.argsort(order, axis=1)[:, :self.nprobe]] = True
+            self._scan(queries, query_sq_norms, visit, best_idx, best_dist)
+        else:
+            rank = np.argsort(np.argsort(bounds, axis=1), axis=1)
+            visited = np.zeros(bounds.shape, dtype=bool)
+            depth = 1
+            while True:
+                kth = np.sqrt(np.maximum(best_dist.max(axis=1), 0.0))
+                # Balls that could still hold a row closer than the k-th neighbour so far
+                pending = ~visited & (bounds <= kth[:, None] * (1 + 1e-9) + 1e-9)
+                if not pending.any():
+                    break
+                visit = pending & (rank < depth)
+                self._scan(queries, query_sq_norms, visit, best_idx, best_dist)
+                visited |= visit
+                depth *= 2
+        # Balls with fewer than k rows between them leave a query short
+        short = np.isinf(best_dist).any(axis=1)
+        if short.any():
+            best_idx[short] = self._brute_force(queries[short], query_sq_norms[short])
+        return best_idx
+
+    def _scan_one(self, query, query_sq_norm, balls, bounds, best_idx, best_dist):
+        """Merge the rows of balls, in order, into one query's k best; stop early where bounds allow."""
+        k = self.n_neighbors
+        candidate_idx, candidate_dist = best_idx, best_dist
+        for ball in balls:
+            if bounds is not None:
+                kth = np.sqrt(max(candidate_dist.max(), 0.0))
+                if bounds[ball] > kth * (1 + 1e-9) + 1e-9:
+                    break
+            start, stop = self.offsets[ball], self.offsets[ball + 1]
+            distances = self.fit_sq_norms[start:stop] - 2.0 * (self.fit_X[start:stop] @ query) + query_sq_norm
+            candidate_idx = np.concatenate([candidate_idx, np.arange(start, stop)])
+            candidate_dist = np.concatenate([candidate_dist, distances])
+            keep = np.argpartition(candidate_dist, k - 1)[:k]
+            candidate_idx, candidate_dist = candidate_idx[keep], candidate_dist[keep]
+        best_idx[:], best_dist[:] = candidate_idx, candidate_dist
+
+    def _scan(self, queries, query_sq_norms, visit, best_idx, best_dist):
+        """Merge the rows of the balls each query visits (a queries x balls mask) into its k best."""
+        k = self.n_neighbors
+        for ball in np.flatnonzero(visit.any(axis=0)):
+            start, stop = self.offsets[ball], self.offsets[ball + 1]
+            if start == stop:
+                continue
+            rows = np.flatnonzero(visit[:, ball])
+            distances = (self.fit_sq_norms[start:stop] - 2.0 * (queries[rows] @ self.fit_X[start:stop].T)
+                         + query_sq_norms[rows, None])
+            candidate_dist = np.concatenate([best_dist[rows], distances], axis=1)
+            candidate_idx = np.concatenate(
+                [best_idx[rows], np.broadcast_to(np.arange(start, stop), distances.shape)], axis=1)
+            keep = np.argpartition(candidate_dist, k - 1, axis=1)[:, :k]
+            best_dist[rows] = np.take_along_axis(candidate_dist, keep, axis=1)
+            best_idx[rows] = np.take_along_axis(candidate_idx, keep, axis=1)
+
+    def _brute_force(self, queries, query_sq_norms):
+        # Chunked like CompiledRecommender.predict_proba, to bound the distance matrix
+        step = CompiledRecommender.chunk_size
+        neighbors = []
+        for start in range(0, len(queries), step):
+            distances = (self.fit_sq_norms - 2.0 * (queries[start:start + step] @ self.fit_X.T)
+                         + query_sq_norms[start:start + step, None])
+            neighbors.append(np.argpartition(distances, self.n_neighbors - 1, axis=1)[:, :self.n_neighbors])
+        return np.concatenate(neighbors) if neighbors else np.empty((0, self.n_neighbors), dtype=np.intp)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the KNN index from Models/scaler.pkl and Models/model.pkl")
+    parser.add_argument('command', choices=['build'])
+    parser.add_argument('--out', default=INDEX_DIR)
+    parser.add_argument('--lists', type=int, default=None, help="number of balls (default sqrt(n_rows))")
+    parser.add_argument('--check-nprobe', type=int, nargs='*', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    scaler = pickle.load(open("Models/scaler.pkl", 'rb'))
+    model = pickle.load(open("Models/model.pkl", 'rb'))
+    compiled = CompiledRecommender.from_sklearn(scaler, model)
+    build_index(compiled.mean, compiled.scale, compiled.fit_X, compiled.fit_y,
+                compiled.n_classes, compiled.n_neighbors, args.out, args.lists)
+    print(f"Index with {len(compiled.fit_X)} rows written to {args.out}")
+
+    # Neighbour recall of each mode against the exact full scan on student-scores.csv
+    from app import encode_row
+    with open("student-scores.csv", newline='') as f:
+        feature_matrix = np.array([encode_row(row) for row in csv.DictReader(f)], dtype=float)
+    scaled = (feature_matrix - compiled.mean) / compiled.scale
+
+    def neighbour_distances(fit_X, neighbors):
+        return np.sqrt(((fit_X[neighbors] - scaled[:, None, :]) ** 2).sum(axis=2))
+
+    # A returned neighbour counts as a hit when it is no farther than the true k-th neighbour
+    kth = neighbour_distances(compiled.fit_X, compiled.kneighbors(feature_matrix)).max(axis=1, keepdims=True)
+    expected = compiled.predict_proba(feature_matrix)
+    for nprobe in [None] + args.check_nprobe:
+        # Search the balls even where the app would scan every row, to report on the index itself
+        index = NeighborIndex.load(args.out, nprobe=nprobe, brute_force_rows=0)
+        found = neighbour_distances(index.fit_X, index.kneighbors(feature_matrix))
+        recall = (found <= kth * (1 + 1e-9)).mean()
+        same_proba = np.array_equal(index.predict_proba(feature_matrix), expected)
+        mode = "exact" if nprobe is None else f"nprobe={nprobe}"
+        print(f"{mode:>10}: recall {recall:.4f}, identical probabilities: {same_proba}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""Pages without per-request data, rendered once and served from memory.
+
+Every page keeps its body pre-compressed with gzip (and brotli when the
+`brotli` package is installed) together with an ETag and Last-Modified, so
+a browser revalidating a page it already has gets an empty 304.
+
+Responses are returned as (status, headers, body) so the Flask routes and
+the ASGI app can share them.
+"""
+import gzip
+import hashlib
+import os
+from email.utils import formatdate, parsedate_to_datetime
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def accepted_encodings(accept_encoding):
+    """Content codings the client accepts, ignoring the ones sent with q=0."""
+    encodings = set()
+    for part in (accept_encoding or '').split(','):
+        coding, _, params = part.strip().partition(';')
+        quality = params.strip().lower()
+        if coding and quality not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            encodings.add(coding.strip().lower())
+    return encodings
+
+
+class StaticPage:
+    def __init__(self, body, mtime, content_type='text/html; charset=utf-8'):
+        self.content_type = content_type
+        self.bodies = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.bodies['br'] = brotli.compress(body)
+        # Strong ETag of the uncompressed body; the coding is appended per
+        # representation so caches never mix them up.
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        self.mtime = int(mtime)
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+
+    @classmethod
+    def from_template(cls, jinja_env, template_name, **context):
+        template = jinja_env.get_template(template_name)
+        mtime = os.path.getmtime(template.filename) if template.filename else 0
+        return cls(template.render(**context).encode('utf-8'), mtime)
+
+    def choose_encoding(self, accept_encoding):
+        encodings = accepted_encodings(accept_encoding)
+        for coding in ('br', 'gzip'):
+            if coding in self.bodies and coding in encodings:
+                return coding
+        return 'identity'
+
+    def not_modified(self, if_none_match, if_modified_since):
+        # If-None-Match wins over If-Modified-Since when both are sent
+        if if_none_match:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or any(tag.removeprefix('W/').strip('"').split('-')[0] == self.etag for tag in tags)
+        if if_modified_since:
+            try:
+                return parsedate_to_datetime(if_modified_since).timestamp() >= self.mtime
+            except (TypeError, ValueError):
+                return False
+        return False
+
+    def response(self, headers):
+        """(status, headers, body) for a request with the given header mapping."""
+        coding = self.choose_encoding(headers.get('Accept-Encoding'))
+        response_headers = [
+            ('ETag', f'"{self.etag}-{coding}"' if coding != 'identity' else f'"{self.etag}"'),
+            ('Last-Modified', self.last_modified),
+            ('Cache-Control', 'no-cache'),
+            ('Vary', 'Accept-Encoding'),
+        ]
+        if self.not_modified(headers.get('If-None-Match'), headers.get('If-Modified-Since')):
+            return 304, response_headers, b''
+        if coding != 'identity':
+            response_headers.append(('Content-Encoding', coding))
+        response_headers.append(('Content-Type', self.content_type))
+        return 200, response_headers, self.bodies[coding]
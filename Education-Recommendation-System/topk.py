@@ -0,0 +1,49 @@
+import numpy as np
+
+# Up to this many classes a full argsort of every row is as fast as argpartition
+ARGSORT_MAX_CLASSES = 256
+
+
+def top_k(probabilities, k):
+    """Return (indices, values) of the k largest entries of every row, best first.
+
+    Up to ARGSORT_MAX_CLASSES classes (the recommender has 17) every row is
+    argsorted at once, which gives exactly the classes and order of
+    np.argsort(-row)[:k], ties included. With more classes np.argpartition
+    selects the k winners in linear time and only those are sorted, by
+    probability and then by class index; which of several classes tied at
+    the k-th probability gets in is left to argpartition. Either way the
+    answer depends only on the row and k, so a row gets the same answer
+    whatever batch it is scored in.
+    """
+    probabilities = np.atleast_2d(probabilities)
+    n_rows, n_classes = probabilities.shape
+    k = max(0, min(int(k), n_classes))
+    if n_classes <= ARGSORT_MAX_CLASSES:
+        indices = np.argsort(-probabilities, axis=1)[:, :k]
+        return indices, np.take_along_axis(probabilities, indices, axis=1)
+    rows = np.arange(n_rows)[:, None]
+    if k < n_classes:
+        candidates = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n_classes), probabilities.shape)
+    values = probabilities[rows, candidates]
+    order = np.lexsort((candidates, -values), axis=1)
+    return candidates[rows, order], values[rows, order]
+
+
+class TopKFormatter:
+    """Turn top-k indices/probabilities into (class name, "12.34%") pairs.
+
+    Class names are looked up with one fancy index into a prebuilt array and
+    the percentages go through a format method bound once at construction.
+    """
+
+    def __init__(self, class_names, probability_format="{:.2%}"):
+        self.class_names = np.array(class_names, dtype=object)
+        self.format_probability = probability_format.format
+
+    def __call__(self, indices, values):
+        format_probability = self.format_probability
+        return [[(name, format_probability(value)) for name, value in zip(row_names, row_values)]
+                for row_names, row_values in zip(self.class_names[indices].tolist(), np.asarray(values).tolist())]
@@ -1,8 +1,28 @@
+import itertools
 import os
+from dataclasses import replace
 from datetime import datetime
+from functools import cached_property
+
+from dispatch import AmbulanceDispatcher, NEAREST
+from metrics import METRICS, Profiler, timed
+from records import (Ambulance, AmbulanceStatus, Appointment, Doctor, Medicine, Patient, Room, RoomStatus,
+                     Staff, parse_date, parse_time)
+from rooms import RoomAllocator, ROOM_TYPES
+from scheduler import Scheduler, DEFAULT_DURATION
+from storage import TABLES, TextFileStorage, SQLiteStorage
+from symptoms import SymptomMatcher
+
+
+PAGE_SIZE = 20  # Records shown by the view menus before asking for more
+
+
+class HospitalError(Exception):
+    """ An operation was refused; the message says why. """
+
 
 class HospitalManagementSystem:
-    def __init__(self):
+    def __init__(self, storage=None):
         # File paths
         self.patients_file = "patients.txt"
         self.doctors_file = "doctors.txt"
@@ -12,155 +32,236 @@ class HospitalManagementSystem:
         self.staff_file = "staff.txt"  
         self.rooms_file = "rooms.txt"
         self.medicine_file = "medicines.txt"
+        self.symptoms_file = "symptoms.txt"  # Symptom knowledge base used by identify_disease
+        self.purchases_file = "medicine_purchases.txt"  # Appended to by purchase_medicine
 
-        # Load data from text files on startup
-        self.patients = self.load_data(self.patients_file)
-        self.doctors = self.load_data(self.doctors_file)
-        self.appointments = self.load_data(self.appointments_file)
-        self.ambulances = self.load_data(self.ambulances_file)
-        self.staff = self.load_data(self.staff_file)
-        self.rooms = self.load_data(self.rooms_file)
-        self.medicines = self.load_data(self.medicine_file)
+        # The .txt files by default, or a SQLiteStorage (see storage.py)
+        self.storage = storage if storage is not None else TextFileStorage()
+
+        # The entities (patients, doctors, ...) are loaded on first access, below
+
+        # Busy intervals per doctor and day, loaded as they are needed
+        self.scheduler = Scheduler(lambda doctor_id, date: self.find(self.appointments, self.appointments_file,
+                                                                     doctor_id=doctor_id, date=date))
+
+        # Built from the symptom knowledge base on first use
+        self.symptom_matcher = None
+
+        # A metrics.Profiler while one is capturing
+        self.profiler = None
+
+    # Each entity is loaded from storage the first time it is used, so startup
+    # does not wait on files the session never touches
+    @cached_property
+    def patients(self):
+        return self.load_data(self.patients_file)
+
+    @cached_property
+    def doctors(self):
+        return self.load_data(self.doctors_file)
+
+    @cached_property
+    def appointments(self):
+        return self.load_data(self.appointments_file)
+
+    @cached_property
+    def ambulances(self):
+        return self.load_data(self.ambulances_file)
+
+    @cached_property
+    def staff(self):
+        return self.load_data(self.staff_file)
+
+    @cached_property
+    def rooms(self):
+        return self.load_data(self.rooms_file)
+
+    @cached_property
+    def medicines(self):
+        return self.load_data(self.medicine_file)
+
+    @cached_property
+    def room_allocator(self):
+        """ Free rooms per type and the room of every admitted patient. """
+        return RoomAllocator(self.rooms)
+
+    @cached_property
+    def ambulance_dispatcher(self):
+        """ Available ambulances by zone and idle time, and the calls waiting for one. """
+        return AmbulanceDispatcher(self.ambulances, NEAREST)
 
     def load_data(self, filename): 
-        """ Load data from a file into a dictionary. """
-        data = {}
-        if os.path.exists(filename):
-            with open(filename, "r") as file:
-                for line in file:
-                    line = line.strip()
-                    if line:
-                        parts = line.split(",")
-                        if filename == self.medicine_file:
-                            if len(parts) >= 3:
-                                data[parts[0]] = {"name": parts[1], "price": parts[2]}
-                        else:
-                            data[parts[0]] = parts[1:]
-        return data
+        """ Load data from the storage backend into a dictionary. """
+        return self.storage.load(filename)
 
     def save_data(self, data, filename): 
-        """ Save data from a dictionary to a file. """
-        with open(filename, "w") as file:
-            for key, value in data.items():
-                if filename == self.medicine_file:
-                    file.write(f"{key},{value['name']},{value['price']}\n")
-                else:
-                    file.write(f"{key},{','.join(value)}\n")
+        """ Save a whole dictionary to the storage backend. """
+        self.storage.save(data, filename)
+
+    def save_record(self, data, filename, key):
+        """ Persist the insert, update or delete of data[key]. """
+        self.storage.save_record(data, filename, key)
+
+    def save_records(self, data, filename, keys):
+        """ Persist the changes to many keys of data in one write. """
+        self.storage.save_records(data, filename, keys)
+
+    def find(self, data, filename, **criteria):
+        """ Yield (key, value) for the records whose fields equal the criteria. """
+        return self.storage.find(data, filename, **criteria)
+
+    def scan(self, data, filename, criteria=None, order_by=None, descending=False):
+        """ Yield (key, value) for the matching records, in stored order or by a column. """
+        return self.storage.scan(data, filename, criteria, order_by, descending)
+
+    def close(self):
+        self.storage.close()
+
+    def list_records(self, data, filename, describe, empty_message, title=None, filter_column=None,
+                     page_size=PAGE_SIZE):
+        """ Print the records of an entity a page at a time, optionally filtered and sorted.
+
+        describe turns a (key, value) pair into its line. Records are read
+        lazily, so the first page shows without walking the rest, and only a
+        page plus one record is held at a time.
+        """
+        criteria = {}
+        if filter_column:
+            wanted = input(f"Filter by {filter_column} (leave blank for all): ").strip()
+            if wanted:
+                try:
+                    criteria[filter_column] = TABLES[filename].record.parse_field(filter_column, wanted)
+                except ValueError:
+                    print(empty_message)
+                    return
+        columns = ["id", *TABLES[filename].columns]
+        order_by = input(f"Sort by ({', '.join(columns)}; prefix - for descending, blank for none): ").strip()
+        descending = order_by.startswith("-")
+        order_by = order_by.lstrip("-") or None
+        if order_by is not None and order_by not in columns:
+            print(f"Unknown column {order_by!r}; showing records unsorted.")
+            order_by, descending = None, False
+
+        records = self.scan(data, filename, criteria, order_by, descending)
+        try:
+            page = list(itertools.islice(records, page_size))
+            if not page:
+                print(empty_message)
+                return
+            if title:
+                print(title)
+            while page:
+                for record in page:
+                    print(describe(*record))
+                page = list(itertools.islice(records, page_size))
+                if page and input("-- Press Enter for more, or q to stop -- ").strip().lower() == 'q':
+                    break
+        finally:
+            # Releases the SQLite cursor of a listing stopped early
+            if hasattr(records, "close"):
+                records.close()
 
     def initialize_rooms(self):
         """Initialize 5 rooms of each type and save to rooms.txt."""
         rooms = {
-            "R001": ["1", "General", "Floor 1", "Available"],
-            "R002": ["1", "General", "Floor 1", "Available"],
-            "R003": ["1", "General", "Floor 1", "Available"],
-            "R004": ["1", "General", "Floor 1", "Available"],
-            "R005": ["1", "General", "Floor 1", "Available"],
-            "R006": ["2", "Semi-Private", "Floor 2", "Available"],
-            "R007": ["2", "Semi-Private", "Floor 2", "Available"],
-            "R008": ["2", "Semi-Private", "Floor 2", "Available"],
-            "R009": ["2", "Semi-Private", "Floor 2", "Available"],
-            "R010": ["2", "Semi-Private", "Floor 2", "Available"],
-            "R011": ["3", "Private", "Floor 3", "Available"],
-            "R012": ["3", "Private", "Floor 3", "Available"],
-            "R013": ["3", "Private", "Floor 3", "Available"],
-            "R014": ["3", "Private", "Floor 3", "Available"],
-            "R015": ["3", "Private", "Floor 3", "Available"],
-            "R016": ["4", "DELUX", "Floor 4", "Available"],
-            "R017": ["4", "DELUX", "Floor 4", "Available"],
-            "R018": ["4", "DELUX", "Floor 4", "Available"],
-            "R019": ["4", "DELUX", "Floor 4", "Available"],
-            "R020": ["4", "DELUX", "Floor 4", "Available"],
+            "R001": Room("1", "General", "Floor 1", RoomStatus.AVAILABLE),
+            "R002": Room("1", "General", "Floor 1", RoomStatus.AVAILABLE),
+            "R003": Room("1", "General", "Floor 1", RoomStatus.AVAILABLE),
+            "R004": Room("1", "General", "Floor 1", RoomStatus.AVAILABLE),
+            "R005": Room("1", "General", "Floor 1", RoomStatus.AVAILABLE),
+            "R006": Room("2", "Semi-Private", "Floor 2", RoomStatus.AVAILABLE),
+            "R007": Room("2", "Semi-Private", "Floor 2", RoomStatus.AVAILABLE),
+            "R008": Room("2", "Semi-Private", "Floor 2", RoomStatus.AVAILABLE),
+            "R009": Room("2", "Semi-Private", "Floor 2", RoomStatus.AVAILABLE),
+            "R010": Room("2", "Semi-Private", "Floor 2", RoomStatus.AVAILABLE),
+            "R011": Room("3", "Private", "Floor 3", RoomStatus.AVAILABLE),
+            "R012": Room("3", "Private", "Floor 3", RoomStatus.AVAILABLE),
+            "R013": Room("3", "Private", "Floor 3", RoomStatus.AVAILABLE),
+            "R014": Room("3", "Private", "Floor 3", RoomStatus.AVAILABLE),
+            "R015": Room("3", "Private", "Floor 3", RoomStatus.AVAILABLE),
+            "R016": Room("4", "DELUX", "Floor 4", RoomStatus.AVAILABLE),
+            "R017": Room("4", "DELUX", "Floor 4", RoomStatus.AVAILABLE),
+            "R018": Room("4", "DELUX", "Floor 4", RoomStatus.AVAILABLE),
+            "R019": Room("4", "DELUX", "Floor 4", RoomStatus.AVAILABLE),
+            "R020": Room("4", "DELUX", "Floor 4", RoomStatus.AVAILABLE),
         }
         self.save_data(rooms, self.rooms_file)
+        self.rooms = self.load_data(self.rooms_file)
+        self.room_allocator = RoomAllocator(self.rooms)
         print("Rooms initialized and saved to rooms.txt successfully!")
 
     def allot_room(self):
         """Allot a room based on availability and patient preference."""
         print("\n--- Room Allotment ---")
 
-        room_types = {
-            "1": "General",
-            "2": "Semi-Private",
-            "3": "Private",
-            "4": "ICU"
-        }
-
         print("Available Room Types:")
-        for key, value in room_types.items():
+        for key, value in ROOM_TYPES.items():
             print(f"{key}. {value}")
 
         choice = input("Select room type (1-4): ")
-        if choice not in room_types:
+        if choice not in ROOM_TYPES:
             print("Invalid choice! Please select a valid room type.")
             return
 
-        selected_type = room_types[choice]
+        selected_type = ROOM_TYPES[choice]
         patient_id = input("Enter Patient ID: ")
 
-        if patient_id not in self.patients:
-            print("Patient ID not found! Please check and try again.")
+        try:
+            room_id = self.assign_room(selected_type, patient_id)
+        except HospitalError as error:
+            print(error)
             return
 
-        # Check if the patient is already occupying a room
-        for room_id, room_info in self.rooms.items():
-            if len(room_info) > 4 and room_info[4] == patient_id:
-                print(f"Patient {patient_id} is already occupying Room {room_id}. Cannot allot another room.")
-                return
+        floor_no = self.rooms[room_id].floor
+        print(f"Room {room_id} ({selected_type}) on Floor {floor_no} allotted successfully to Patient ID {patient_id}.")
 
-        # Find an available room of the selected type
-        available_rooms = {k: v for k, v in self.rooms.items() if v[1] == selected_type and v[3] == "Available"}
+    @timed
+    def assign_room(self, room_type, patient_id):
+        """Occupy the first free room of a type for a patient; returns the room ID."""
+        if patient_id not in self.patients:
+            raise HospitalError("Patient ID not found! Please check and try again.")
 
-        if not available_rooms:
-            print(f"No {selected_type} rooms available at the moment.")
-            return
+        # Check if the patient is already occupying a room
+        room_id = self.room_allocator.room_of(patient_id)
+        if room_id is not None:
+            raise HospitalError(f"Patient {patient_id} is already occupying Room {room_id}. Cannot allot another room.")
 
-        # Assign the first available room
-        room_id, info = next(iter(available_rooms.items()))
-        floor_no = info[0]
+        # Mark the first available room of the selected type as occupied by the patient
+        room_id = self.room_allocator.allot(room_type, patient_id)
+        if room_id is None:
+            raise HospitalError(f"No {room_type} rooms available at the moment.")
 
-        # Mark room as occupied and add patient ID
-        self.rooms[room_id][3] = "Occupied"
-        self.rooms[room_id].append(patient_id)
-        self.save_data(self.rooms, self.rooms_file)
-        print(f"Room {room_id} ({selected_type}) on Floor {floor_no} allotted successfully to Patient ID {patient_id}.")
+        self.save_record(self.rooms, self.rooms_file, room_id)
+        return room_id
 
     def release_room(self):
         """Release an occupied room when a patient is discharged."""
         print("\n--- Release Room ---")
         room_id = input("Enter Room ID to release: ")
 
-        if room_id in self.rooms and self.rooms[room_id][3] == "Occupied":
-            self.rooms[room_id][3] = "Available"
-            if len(self.rooms[room_id]) > 4:
-                self.rooms[room_id].pop(-1)
-            self.save_data(self.rooms, self.rooms_file)
-            print(f"Room {room_id} is now available.")
+        try:
+            self.vacate_room(room_id)
+        except HospitalError as error:
+            print(error)
         else:
-            print("Invalid Room ID or the room is already available.")
+            print(f"Room {room_id} is now available.")
+
+    @timed
+    def vacate_room(self, room_id):
+        if not self.room_allocator.release(room_id):
+            raise HospitalError("Invalid Room ID or the room is already available.")
+        self.save_record(self.rooms, self.rooms_file, room_id)
 
     def view_room_status(self):
         """Display all rooms along with their current status."""
         print("\n--- Room Status ---")
-        if not self.rooms:
-            print("No rooms found!")
-        else:
-            for room_id, room_info in self.rooms.items():
-                status = f"Room ID: {room_id}, Floor: {room_info[0]}, Type: {room_info[1]}, Status: {room_info[3]}"
-                if len(room_info) > 4:
-                    status += f", Occupied by Patient ID: {room_info[4]}"
-                print(status)
-
-    def view_room_status_a(self):
-        """Display all rooms along with their current status (admin view)."""
-        print("\n--- Room Status ---")
-        if not self.rooms:
-            print("No rooms found!")
-        else:
-            for room_id, room_info in self.rooms.items():
-                status = f"Room ID: {room_id}, Floor: {room_info[0]}, Type: {room_info[1]}, Status: {room_info[3]}"
-                if len(room_info) > 4:
-                    status += f", Occupied by Patient ID: {room_info[4]}"
-                print(status)
+
+        def describe(room_id, room):
+            status = f"Room ID: {room_id}, Floor: {room.floor}, Type: {room.type}, Status: {room.status}"
+            if room.patient_id is not None:
+                status += f", Occupied by Patient ID: {room.patient_id}"
+            return status
+        self.list_records(self.rooms, self.rooms_file, describe, "No rooms found!", filter_column="status")
 
     def menu(self):
         while True:
@@ -172,6 +273,7 @@ class HospitalManagementSystem:
                 self.login()
             elif choice == '2':
                 print("Exiting the system...")
+                self.close()
                 break
             else:
                 print("Invalid choice! Please try again.")
@@ -206,7 +308,9 @@ class HospitalManagementSystem:
             print("6. Manage ambulances")
             print("7. Manage medicine")
             print("8. View room status")
-            print("9. Logout")
+            print("9. Find free appointment slots")
+            print("10. Performance report")
+            print("11. Logout")
             choice = input("Enter your choice: ")
             if choice == '1':
                 self.manage_patients()
@@ -224,13 +328,58 @@ class HospitalManagementSystem:
             elif choice == '7':
                 self.manage_medicine()
             elif choice == '8':
-                self.view_room_status_a()
+                self.view_room_status()
             elif choice == '9':
+                self.find_free_slots()
+            elif choice == '10':
+                self.performance_menu()
+            elif choice == '11':
                 print("Logging out...")
                 break
             else:
                 print("Invalid choice! Please try again.")
 
+    def performance_menu(self):
+        """Show and export the operation metrics, and capture profiles."""
+        while True:
+            print("\n==== Performance ====")
+            print("1. Show report")
+            print("2. Export report as JSON")
+            print("3. Reset metrics")
+            print("4. Stop profiler" if self.profiler else "4. Start profiler")
+            print("5. Back")
+            choice = input("Enter your choice: ")
+            if choice == '1':
+                print(METRICS.report())
+            elif choice == '2':
+                path = input("Export to (default metrics.json): ").strip() or "metrics.json"
+                try:
+                    METRICS.export(path)
+                except OSError as error:
+                    print(f"Could not write {path}: {error}")
+                else:
+                    print(f"Metrics written to {path}")
+            elif choice == '3':
+                METRICS.reset()
+                print("Metrics reset.")
+            elif choice == '4' and self.profiler:
+                path = input("Save the full profile to (Enter to skip): ").strip() or None
+                print(self.profiler.stop(path))
+                self.profiler = None
+            elif choice == '4':
+                mode = input("Profiler (cprofile/sampling, default cprofile): ").strip().lower() or "cprofile"
+                try:
+                    self.profiler = Profiler(mode)
+                except ValueError as error:
+                    print(error)
+                    continue
+                self.profiler.start()
+                print(f"Profiling with {mode}; stop it here to see the results.")
+            elif choice == '5':
+                break
+            else:
+                print("Invalid choice! Please try again.")
+
     def patient_login(self):
         st = input("Dial 108 to call ambulance? (Enter '108' to call or any key to continue): ")
         if st == '108':
@@ -240,7 +389,7 @@ class HospitalManagementSystem:
             dis = input("Enter your symptoms to check what kind of disease you might have: ")
             patient_id = input("Enter your patient ID: ")
             if patient_id in self.patients:
-                print(f"Welcome, {self.patients[patient_id][0]}!")
+                print(f"Welcome, {self.patients[patient_id].name}!")
                 self.identify_disease(dis, patient_id)
             else:
                 print("Patient ID not found! Please check and try again.")
@@ -253,54 +402,57 @@ class HospitalManagementSystem:
             return
         
         print("\nAvailable Medicines:")
-        for med_id, details in self.medicines.items():
-            print(f"ID: {med_id}, Name: {details['name']}, Price: {details['price']}")
+        for med_id, medicine in self.medicines.items():
+            print(f"ID: {med_id}, Name: {medicine.name}, Price: {medicine.price}")
         
         med_id = input("Enter the Medicine ID you want to purchase: ")
         
         if med_id in self.medicines:
             medicine = self.medicines[med_id]
-            print(f"\nYou have selected: {medicine['name']} (Price: {medicine['price']})")
+            print(f"\nYou have selected: {medicine.name} (Price: {medicine.price})")
             
             confirm = input("Confirm purchase? (yes/no): ").strip().lower()
             if confirm == "yes":
-                purchase_record = {
-                    "patient_id": patient_id,
-                    "medicine_id": med_id,
-                    "medicine_name": medicine["name"],
-                    "price": medicine["price"],
-                    "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                }
-                print(f"Purchase successful! {medicine['name']} has been added to your records.")
-                with open("medicine_purchases.txt", "a") as file:
-                    file.write(f"{patient_id},{med_id},{medicine['name']},{medicine['price']},{purchase_record['date']}\n")
+                self.purchase_medicine(patient_id, med_id)
+                print(f"Purchase successful! {medicine.name} has been added to your records.")
             else:
                 print("Purchase cancelled.")
         else:
             print("Invalid Medicine ID. Please check and try again.")
 
+    @timed
+    def purchase_medicine(self, patient_id, med_id):
+        """Record a patient's purchase of a medicine in medicine_purchases.txt; returns the purchase."""
+        medicine = self.medicines.get(med_id)
+        if medicine is None:
+            raise HospitalError("Invalid Medicine ID. Please check and try again.")
+        purchase_record = {
+            "patient_id": patient_id,
+            "medicine_id": med_id,
+            "medicine_name": medicine.name,
+            "price": medicine.price,
+            "date": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+        line = f"{patient_id},{med_id},{medicine.name},{medicine.price},{purchase_record['date']}\n"
+        with open(self.purchases_file, "a") as file:
+            file.write(line)
+        METRICS.count(bytes_written=len(line))
+        return purchase_record
+
+    def get_symptom_matcher(self):
+        """ The matcher for symptoms.txt, built once; empty if the file is missing. """
+        if self.symptom_matcher is None:
+            if os.path.exists(self.symptoms_file):
+                self.symptom_matcher = SymptomMatcher.from_file(self.symptoms_file)
+            else:
+                self.symptom_matcher = SymptomMatcher({})
+        return self.symptom_matcher
+
     def identify_disease(self, report, patient_id=None):
         """Identify disease based on user-reported symptoms."""
-        disease_symptoms = {
-            "Flu": ["fever", "cough", "sore throat", "runny nose", "muscle aches"],
-            "Cold": ["cough", "sore throat", "runny nose", "sneezing"],
-            "Diabetes": ["increased thirst", "frequent urination", "extreme fatigue", "blurry vision"],
-            "Hypertension": ["headache", "shortness of breath", "nosebleeds", "dizziness"],
-            "Dengue": ["high fever", "severe headache", "joint pain", "skin rash", "fatigue"],
-            "Asthma": ["wheezing", "shortness of breath", "chest tightness", "coughing"],
-            "Food Poisoning": ["vomiting", "diarrhea", "stomach cramps", "nausea"],
-            "Chickenpox": ["itchy rash", "red spots", "fever", "tiredness"],
-            "Anemia": ["fatigue", "weakness", "pale skin", "shortness of breath"],
-            "Migraine": ["severe headache", "nausea", "sensitivity to light", "blurred vision"]
-        }
-        
-        identified_diseases = []
-        report = report.lower()
+        identified_diseases = [f"{disease} ({', '.join(symptoms)})"
+                               for disease, symptoms in self.get_symptom_matcher().rank(report)]
 
-        for disease, symptoms in disease_symptoms.items():
-            if any(symptom in report for symptom in symptoms):
-                identified_diseases.append(disease)
-        
         if identified_diseases:
             print("Possible diseases based on your symptoms:", ", ".join(identified_diseases))
             print("Schedule the appointment with the doctor for treatment.")
@@ -376,20 +528,34 @@ class HospitalManagementSystem:
         name = input("Enter Patient Name: ")
         while True:
             age = input("Enter Patient Age: ")
-            if age.isdigit() and 0 < int(age) < 100:
+            if self.is_valid_age(age):
                 break
             print("Invalid age! Age must be a number between 1 and 99.")
         disease = input("Enter Patient Disease: ")
-        self.patients[patient_id] = [name, age, disease]
-        self.save_data(self.patients, self.patients_file)
+        try:
+            self.register_patient(patient_id, name, age, disease)
+        except HospitalError as error:
+            print(error)
+            return
         print("Patient added successfully!")
 
+    def is_valid_age(self, age):
+        return age.isdigit() and 0 < int(age) < 100
+
+    @timed
+    def register_patient(self, patient_id, name, age, disease):
+        if patient_id in self.patients:
+            raise HospitalError("Patient ID already exists!")
+        if not self.is_valid_age(age):
+            raise HospitalError("Invalid age! Age must be a number between 1 and 99.")
+        self.patients[patient_id] = Patient(name, int(age), disease)
+        self.save_record(self.patients, self.patients_file, patient_id)
+
     def view_patients(self):
-        if not self.patients:
-            print("No patients found!")
-        else:
-            for patient_id, patient_info in self.patients.items():
-                print(f"ID: {patient_id}, Name: {patient_info[0]}, Age: {patient_info[1]}, Disease: {patient_info[2]}")
+        self.list_records(self.patients, self.patients_file,
+                          lambda patient_id, patient: f"ID: {patient_id}, Name: {patient.name}, "
+                                                      f"Age: {patient.age}, Disease: {patient.disease}",
+                          "No patients found!", filter_column="disease")
 
     def update_patient(self):
         patient_id = input("Enter Patient ID to update: ")
@@ -397,12 +563,12 @@ class HospitalManagementSystem:
             name = input("Enter new Patient Name: ")
             while True:
                 age = input("Enter Patient Age: ")
-                if age.isdigit() and 0 < int(age) < 100:
+                if self.is_valid_age(age):
                     break
                 print("Invalid age! Age must be a number between 1 and 99.")
             disease = input("Enter new Patient Disease: ")
-            self.patients[patient_id] = [name, age, disease]
-            self.save_data(self.patients, self.patients_file)
+            self.patients[patient_id] = Patient(name, int(age), disease)
+            self.save_record(self.patients, self.patients_file, patient_id)
             print("Patient updated successfully!")
         else:
             print("Patient ID not found!")
@@ -411,7 +577,7 @@ class HospitalManagementSystem:
         patient_id = input("Enter Patient ID to delete: ")
         if patient_id in self.patients:
             del self.patients[patient_id]
-            self.save_data(self.patients, self.patients_file)
+            self.save_record(self.patients, self.patients_file, patient_id)
             print("Patient deleted successfully!")
         else:
             print("Patient ID not found!")
@@ -450,37 +616,54 @@ class HospitalManagementSystem:
             price = input("Enter Medicine Price: ")
             try:
                 price = float(price)
-                if price > 0:
+                if self.is_valid_price(price):
                     break
                 print("Price must be a positive number!")
             except ValueError:
                 print("Invalid price! Please enter a valid number.")
-                
-        self.medicines[med_id] = {"name": name, "price": str(price)}
-        self.save_data(self.medicines, self.medicine_file)
+
+        try:
+            self.register_medicine(med_id, name, price)
+        except HospitalError as error:
+            print(error)
+            return
         print("Medicine added successfully!")
 
+    @timed
+    def register_medicine(self, med_id, name, price):
+        if med_id in self.medicines:
+            raise HospitalError("Medicine ID already exists!")
+        if not self.is_valid_price(price):
+            raise HospitalError("Price must be a positive number!")
+        self.medicines[med_id] = Medicine(name, float(price))
+        self.save_record(self.medicines, self.medicine_file, med_id)
+
+    def is_valid_price(self, price):
+        return price > 0
+
     def update_medicine(self):
         med_id = input("Enter Medicine ID to update: ")
         if med_id in self.medicines:
-            name = input(f"Current name: {self.medicines[med_id]['name']}\nEnter new name (press enter to keep current): ")
+            medicine = self.medicines[med_id]
+            name = input(f"Current name: {medicine.name}\nEnter new name (press enter to keep current): ")
             if name:
-                self.medicines[med_id]['name'] = name
+                medicine = replace(medicine, name=name)
                 
             while True:
-                price = input(f"Current price: {self.medicines[med_id]['price']}\nEnter new price (press enter to keep current): ")
+                price = input(f"Current price: {medicine.price}\nEnter new price (press enter to keep current): ")
                 if not price:
                     break
                 try:
                     price = float(price)
-                    if price > 0:
-                        self.medicines[med_id]['price'] = str(price)
+                    if self.is_valid_price(price):
+                        medicine = replace(medicine, price=price)
                         break
                     print("Price must be a positive number!")
                 except ValueError:
                     print("Invalid price! Please enter a valid number.")
                     
-            self.save_data(self.medicines, self.medicine_file)
+            self.medicines[med_id] = medicine
+            self.save_record(self.medicines, self.medicine_file, med_id)
             print("Medicine updated successfully!")
         else:
             print("Medicine ID not found!")
@@ -489,18 +672,15 @@ class HospitalManagementSystem:
         med_id = input("Enter Medicine ID to delete: ")
         if med_id in self.medicines:
             del self.medicines[med_id]
-            self.save_data(self.medicines, self.medicine_file)
+            self.save_record(self.medicines, self.medicine_file, med_id)
             print("Medicine deleted successfully!")
         else:
             print("Medicine ID not found!")
 
     def display_medicines(self):
-        if not self.medicines:
-            print("No medicines available.")
-        else:
-            print("\nMedicine List:")
-            for med_id, details in self.medicines.items():
-                print(f"ID: {med_id}, Name: {details['name']}, Price: {details['price']}")
+        self.list_records(self.medicines, self.medicine_file,
+                          lambda med_id, medicine: f"ID: {med_id}, Name: {medicine.name}, Price: {medicine.price}",
+                          "No medicines available.", title="\nMedicine List:")
 
     def manage_doctors(self):
         while True:
@@ -524,6 +704,9 @@ class HospitalManagementSystem:
             else:
                 print("Invalid choice! Please try again.")
 
+    def is_valid_contact(self, contact):
+        return len(contact) == 10 and contact[0] in "9876"
+
     def add_doctor(self):
         print("\n--- Add New Doctor ---")
         while True:
@@ -536,20 +719,31 @@ class HospitalManagementSystem:
         specialty = input("Enter Doctor Specialty: ")
         while True:
             contact = input("Enter Doctor Contact: ")
-            if len(contact) == 10 and contact[0] in "9876":
+            if self.is_valid_contact(contact):
                 break
             print("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
-            
-        self.doctors[doctor_id] = [name, specialty, contact]
-        self.save_data(self.doctors, self.doctors_file)
+
+        try:
+            self.register_doctor(doctor_id, name, specialty, contact)
+        except HospitalError as error:
+            print(error)
+            return
         print("Doctor added successfully!")
 
+    @timed
+    def register_doctor(self, doctor_id, name, specialty, contact):
+        if doctor_id in self.doctors:
+            raise HospitalError("This ID already exists. Please use a unique ID.")
+        if not self.is_valid_contact(contact):
+            raise HospitalError("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
+        self.doctors[doctor_id] = Doctor(name, specialty, contact)
+        self.save_record(self.doctors, self.doctors_file, doctor_id)
+
     def view_doctors(self):
-        if not self.doctors:
-            print("No doctors found!")
-        else:
-            for doctor_id, doctor_info in self.doctors.items():
-                print(f"ID: {doctor_id}, Name: {doctor_info[0]}, Specialty: {doctor_info[1]}, Contact: {doctor_info[2]}")
+        self.list_records(self.doctors, self.doctors_file,
+                          lambda doctor_id, doctor: f"ID: {doctor_id}, Name: {doctor.name}, "
+                                                    f"Specialty: {doctor.specialty}, Contact: {doctor.contact}",
+                          "No doctors found!", filter_column="specialty")
 
     def update_doctor(self):
         doctor_id = input("Enter Doctor ID to update: ")
@@ -558,12 +752,12 @@ class HospitalManagementSystem:
             specialty = input("Enter new Doctor Specialty: ")
             while True:
                 contact = input("Enter new Doctor Contact: ")
-                if len(contact) == 10 and contact[0] in "9876":
+                if self.is_valid_contact(contact):
                     break
                 print("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
                 
-            self.doctors[doctor_id] = [name, specialty, contact]
-            self.save_data(self.doctors, self.doctors_file)
+            self.doctors[doctor_id] = Doctor(name, specialty, contact)
+            self.save_record(self.doctors, self.doctors_file, doctor_id)
             print("Doctor updated successfully!")
         else:
             print("Doctor ID not found!")
@@ -572,23 +766,26 @@ class HospitalManagementSystem:
         doctor_id = input("Enter Doctor ID to delete: ")
         if doctor_id in self.doctors:
             del self.doctors[doctor_id]
-            self.save_data(self.doctors, self.doctors_file)
+            self.save_record(self.doctors, self.doctors_file, doctor_id)
             print("Doctor deleted successfully!")
         else:
             print("Doctor ID not found!")
 
     def validate_date(self, date_str):
+        error = self.date_error(date_str)
+        if error:
+            print(error)
+        return error is None
+
+    def date_error(self, date_str):
+        """ Why date_str is not a valid appointment date, or None if it is. """
         try:
             appointment_date = datetime.strptime(date_str, "%Y-%m-%d").date()
-            today_date = datetime.today().date()
-            if appointment_date >= today_date:
-                return True
-            else:
-                print("Invalid date! You cannot schedule an appointment in the past.")
-                return False
         except ValueError:
-            print("Invalid date format. Please use YYYY-MM-DD.")
-            return False
+            return "Invalid date format. Please use YYYY-MM-DD."
+        if appointment_date < datetime.today().date():
+            return "Invalid date! You cannot schedule an appointment in the past."
+        return None
 
     def is_valid_24_hour_time(self, time_str):
         parts = time_str.split(":")
@@ -600,11 +797,13 @@ class HospitalManagementSystem:
         hours, minutes = int(hours), int(minutes)
         return 0 <= hours < 24 and 0 <= minutes < 60
 
-    def is_appointment_conflict(self, doctor_id, date, time):
-        for appointment_id, appointment_info in self.appointments.items():
-            if appointment_info[1] == doctor_id and appointment_info[2] == date and appointment_info[3] == time:
-                return True
-        return False
+    @timed
+    def is_appointment_conflict(self, doctor_id, date, time, duration=DEFAULT_DURATION, ignore=None):
+        """ True if the doctor has an appointment overlapping [time, time + duration) (a date and a time).
+
+        The appointment with ID `ignore`, one being rescheduled, is left out.
+        """
+        return not self.scheduler.is_free(doctor_id, date, time, duration, ignore)
 
     def schedule_appointment(self, patient_id=None):
         if patient_id is None:
@@ -623,37 +822,102 @@ class HospitalManagementSystem:
             if self.validate_date(date):
                 break
 
+        while True:
+            duration = input(f"Enter Appointment Duration in minutes (default {DEFAULT_DURATION}): ").strip()
+            if not duration:
+                duration = DEFAULT_DURATION
+                break
+            if duration.isdigit() and self.is_valid_duration(int(duration)):
+                duration = int(duration)
+                break
+            print("Invalid duration! Enter a number of minutes between 1 and 480.")
+
         while True:
             time = input("Enter Appointment Time (HH:MM): ")
             if self.is_valid_24_hour_time(time):
-                if self.is_appointment_conflict(doctor_id, date, time):
-                    print(f"Conflict! Doctor is already booked for {time} on {date}. Please choose another time.")
+                if self.is_appointment_conflict(doctor_id, parse_date(date), parse_time(time), duration):
+                    print(f"Conflict! Doctor is already booked around {time} on {date}. Please choose another time.")
+                    after = datetime.combine(parse_date(date), parse_time(time))
+                    slots = self.scheduler.free_slots(doctor_id, after, 3, duration)
+                    if slots:
+                        print("Next free slots: " + ", ".join(f"{slot_date} {slot_time:%H:%M}"
+                                                              for slot_date, slot_time in slots))
                 else:
                     break
             else:
                 print("Invalid time! Please enter a valid 24-hour format time (HH:MM).")
 
-        appointment_id = f"{patient_id}{doctor_id}{date}_{time}"
-        self.appointments[appointment_id] = [patient_id, doctor_id, date, time]
-        self.save_data(self.appointments, self.appointments_file)
+        try:
+            self.book_appointment(patient_id, doctor_id, date, time, duration)
+        except HospitalError as error:
+            print(error)
+            return
         print("Appointment scheduled successfully!")
 
+    def is_valid_duration(self, duration):
+        return 0 < duration <= 8 * 60
+
+    @timed
+    def book_appointment(self, patient_id, doctor_id, date, time, duration=DEFAULT_DURATION):
+        """Book a doctor for a patient if the slot is valid and free; returns the appointment ID."""
+        if patient_id not in self.patients:
+            raise HospitalError("Patient not found!")
+        if doctor_id not in self.doctors:
+            raise HospitalError("Doctor not found!")
+        error = self.date_error(date)
+        if error:
+            raise HospitalError(error)
+        if not self.is_valid_24_hour_time(time):
+            raise HospitalError("Invalid time! Please enter a valid 24-hour format time (HH:MM).")
+        if not self.is_valid_duration(duration):
+            raise HospitalError("Invalid duration! Enter a number of minutes between 1 and 480.")
+        if self.is_appointment_conflict(doctor_id, parse_date(date), parse_time(time), duration):
+            raise HospitalError(f"Conflict! Doctor is already booked around {time} on {date}. Please choose another time.")
+
+        appointment_id = f"{patient_id}{doctor_id}{date}_{time}"
+        self.appointments[appointment_id] = Appointment(patient_id, doctor_id, parse_date(date), parse_time(time),
+                                                        duration)
+        self.save_record(self.appointments, self.appointments_file, appointment_id)
+        self.scheduler.add(appointment_id, self.appointments[appointment_id])
+        return appointment_id
+
+    def find_free_slots(self):
+        """Show the next free slots of a doctor, or the earliest slot for a specialty."""
+        print("\n--- Find Free Slots ---")
+        query = input("Enter Doctor ID or Specialty: ").strip()
+        after = datetime.now()
+        if query in self.doctors:
+            slots = self.scheduler.free_slots(query, after, 5)
+            if not slots:
+                print("No free slots found.")
+            for date, time in slots:
+                print(f"Dr. {self.doctors[query].name} is free on {date} at {time:%H:%M}")
+        else:
+            doctor_ids = [doctor_id for doctor_id, _ in self.find(self.doctors, self.doctors_file, specialty=query)]
+            slot = self.scheduler.earliest_slot(doctor_ids, after)
+            if slot is None:
+                print(f"No free {query} slots found.")
+            else:
+                doctor_id, date, time = slot
+                print(f"Earliest {query} slot: Dr. {self.doctors[doctor_id].name} (ID {doctor_id}) "
+                      f"on {date} at {time:%H:%M}")
+
+    @timed
     def view_patient_info(self, patient_id):
         if patient_id in self.patients:
             patient = self.patients[patient_id]
-            print(f"ID: {patient_id}, Name: {patient[0]}, Age: {patient[1]}, Disease: {patient[2]}")
+            print(f"ID: {patient_id}, Name: {patient.name}, Age: {patient.age}, Disease: {patient.disease}")
         else:
             print("Patient ID not found!")
 
+    @timed
     def view_patient_appointments(self, patient_id):
         appointments_found = False
-        for appointment_id, appointment_info in self.appointments.items():
-            if appointment_info[0] == patient_id:
-                doctor = self.doctors[appointment_info[1]][0]
-                date = appointment_info[2]
-                time = appointment_info[3]
-                print(f"Appointment with Dr. {doctor} on {date} at {time}")
-                appointments_found = True
+        for appointment_id, appointment in self.find(self.appointments, self.appointments_file,
+                                                     patient_id=patient_id):
+            doctor = self.doctors[appointment.doctor_id].name
+            print(f"Appointment with Dr. {doctor} on {appointment.date} at {appointment.time:%H:%M}")
+            appointments_found = True
         if not appointments_found:
             print("No appointments found.")
 
@@ -691,21 +955,31 @@ class HospitalManagementSystem:
         
         while True:
             contact = input("Enter Staff Contact Number: ")
-            if len(contact) == 10 and contact[0] in "9876":
+            if self.is_valid_contact(contact):
                 break
             print("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
 
-        self.staff[staff_id] = [name, role, contact]
-        self.save_data(self.staff, self.staff_file)
+        try:
+            self.register_staff(staff_id, name, role, contact)
+        except HospitalError as error:
+            print(error)
+            return
         print("Staff member added successfully!")
 
+    @timed
+    def register_staff(self, staff_id, name, role, contact):
+        if staff_id in self.staff:
+            raise HospitalError("This ID already exists. Please use a unique ID.")
+        if not self.is_valid_contact(contact):
+            raise HospitalError("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
+        self.staff[staff_id] = Staff(name, role, contact)
+        self.save_record(self.staff, self.staff_file, staff_id)
+
     def view_staff(self):
-        if not self.staff:
-            print("No staff members found!")
-        else:
-            print("\n--- Staff Members ---")
-            for staff_id, staff_info in self.staff.items():
-                print(f"ID: {staff_id}, Name: {staff_info[0]}, Role: {staff_info[1]}, Contact: {staff_info[2]}")
+        self.list_records(self.staff, self.staff_file,
+                          lambda staff_id, member: f"ID: {staff_id}, Name: {member.name}, "
+                                                   f"Role: {member.role}, Contact: {member.contact}",
+                          "No staff members found!", title="\n--- Staff Members ---", filter_column="role")
 
     def update_staff(self):
         staff_id = input("Enter Staff ID to update: ")
@@ -715,12 +989,12 @@ class HospitalManagementSystem:
             
             while True:
                 contact = input("Enter new Contact Number: ")
-                if len(contact) == 10 and contact[0] in "9876":
+                if self.is_valid_contact(contact):
                     break
                 print("Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6.")
             
-            self.staff[staff_id] = [name, role, contact]
-            self.save_data(self.staff, self.staff_file)
+            self.staff[staff_id] = Staff(name, role, contact)
+            self.save_record(self.staff, self.staff_file, staff_id)
             print("Staff member updated successfully!")
         else:
             print("Staff ID not found!")
@@ -729,7 +1003,7 @@ class HospitalManagementSystem:
         staff_id = input("Enter Staff ID to delete: ")
         if staff_id in self.staff:
             del self.staff[staff_id]
-            self.save_data(self.staff, self.staff_file)
+            self.save_record(self.staff, self.staff_file, staff_id)
             print("Staff member deleted successfully!")
         else:
             print("Staff ID not found!")
@@ -741,7 +1015,8 @@ class HospitalManagementSystem:
             print("2. View Ambulances")
             print("3. Update Ambulance")
             print("4. Delete Ambulance")
-            print("5. Back to Admin Menu")
+            print("5. Ambulance Returned")
+            print("6. Back to Admin Menu")
             choice = input("Enter your choice: ")
             if choice == '1':
                 self.add_ambulances()
@@ -752,6 +1027,8 @@ class HospitalManagementSystem:
             elif choice == '4':
                 self.delete_ambulances()
             elif choice == '5':
+                self.ambulance_returned()
+            elif choice == '6':
                 break
             else:
                 print("Invalid choice! Please try again.")
@@ -764,29 +1041,47 @@ class HospitalManagementSystem:
             return
             
         driver_name = input("Enter Driver Name: ")
-        status = "Available"
-        self.ambulances[ambulance_id] = [driver_name, status]
-        self.save_data(self.ambulances, self.ambulances_file)
+        zone = self.input_zone("Enter Zone number (leave blank if none): ")
+        try:
+            call = self.register_ambulance(ambulance_id, driver_name, zone)
+        except HospitalError as error:
+            print(error)
+            return
         print("Ambulance added successfully!")
+        self.announce_dispatch(ambulance_id, call)
+
+    @timed
+    def register_ambulance(self, ambulance_id, driver, zone=None):
+        """Add an available ambulance; returns the waiting call it was sent straight to, if any."""
+        if ambulance_id in self.ambulances:
+            raise HospitalError("Ambulance ID already exists!")
+        self.ambulances[ambulance_id] = Ambulance(driver, AmbulanceStatus.AVAILABLE, zone)
+        return self.refresh_ambulance(ambulance_id)
 
     def view_ambulances(self):
-        if not self.ambulances:
-            print("No ambulances found!")
-        else:
-            for ambulance_id, info in self.ambulances.items():
-                print(f"ID: {ambulance_id}, Driver: {info[0]}, Status: {info[1]}")
+        def describe(ambulance_id, ambulance):
+            zone = f", Zone: {ambulance.zone}" if ambulance.zone is not None else ""
+            return f"ID: {ambulance_id}, Driver: {ambulance.driver}, Status: {ambulance.status}{zone}"
+        self.list_records(self.ambulances, self.ambulances_file, describe, "No ambulances found!",
+                          filter_column="status")
+        waiting = len(self.ambulance_dispatcher.pending)
+        if waiting:
+            print(f"Calls waiting for an ambulance: {waiting}")
 
     def update_ambulances(self):
         ambulance_id = input("Enter Ambulance ID to update: ")
         if ambulance_id in self.ambulances:
             driver_name = input("Enter new Driver Name: ")
             status = input("Enter new Status (Available/Booked): ").capitalize()
-            if status not in ["Available", "Booked"]:
+            try:
+                status = AmbulanceStatus(status)
+            except ValueError:
                 print("Invalid status! Setting to 'Available'.")
-                status = "Available"
-            self.ambulances[ambulance_id] = [driver_name, status]
-            self.save_data(self.ambulances, self.ambulances_file)
+                status = AmbulanceStatus.AVAILABLE
+            self.ambulances[ambulance_id] = replace(self.ambulances[ambulance_id], driver=driver_name, status=status)
+            call = self.refresh_ambulance(ambulance_id)
             print("Ambulance updated successfully!")
+            self.announce_dispatch(ambulance_id, call)
         else:
             print("Ambulance ID not found!")
 
@@ -794,28 +1089,80 @@ class HospitalManagementSystem:
         ambulance_id = input("Enter Ambulance ID to delete: ")
         if ambulance_id in self.ambulances:
             del self.ambulances[ambulance_id]
-            self.save_data(self.ambulances, self.ambulances_file)
+            self.refresh_ambulance(ambulance_id)
             print("Ambulance deleted successfully!")
         else:
             print("Ambulance ID not found!")
 
+    def input_zone(self, prompt):
+        while True:
+            zone = input(prompt).strip()
+            if not zone:
+                return None
+            if zone.isdigit():
+                return int(zone)
+            print("Invalid zone! Enter a zone number or leave it blank.")
+
     def book_ambulance(self):
         print("\n--- Book an Ambulance ---")
-        available_ambulances = {k: v for k, v in self.ambulances.items() if v[1] == "Available"}
-
-        if not available_ambulances:
-            print("No ambulances are available at the moment.")
+        zone = self.input_zone("Enter your Zone number (leave blank if unknown): ")
+        call = self.dispatch_ambulance(zone)
+        if call.ambulance_id is None:
+            position = self.ambulance_dispatcher.position(call.call_id)
+            print(f"No ambulances are available at the moment. Your call (number {call.call_id}) is "
+                  f"{position} in the queue and gets the next ambulance that returns.")
             return
 
-        ambulance_id, info = next(iter(available_ambulances.items()))
-        driver_name = info[0]
+        ambulance_id = call.ambulance_id
+        driver_name = self.ambulances[ambulance_id].driver
+        print(f"Ambulance ID: {ambulance_id} (Driver: {driver_name}) has been booked successfully!")
 
-        self.ambulances[ambulance_id][1] = "Booked"
-        self.save_data(self.ambulances, self.ambulances_file)
+    def ambulance_returned(self):
+        ambulance_id = input("Enter Ambulance ID that has returned: ")
+        try:
+            call = self.return_ambulance(ambulance_id)
+        except HospitalError as error:
+            print(error)
+            return
+        if call is None:
+            print(f"Ambulance {ambulance_id} is available again.")
+        else:
+            self.announce_dispatch(ambulance_id, call)
+
+    def announce_dispatch(self, ambulance_id, call):
+        if call is not None:
+            print(f"Ambulance {ambulance_id} dispatched to waiting call number {call.call_id}.")
+
+    @timed
+    def dispatch_ambulance(self, zone=None):
+        """Send an ambulance to a call, or queue the call if none is free; returns the dispatch.Call."""
+        call = self.ambulance_dispatcher.request(zone)
+        if call.ambulance_id is not None:
+            self.save_record(self.ambulances, self.ambulances_file, call.ambulance_id)
+        return call
+
+    @timed
+    def return_ambulance(self, ambulance_id):
+        """Take back a booked ambulance; returns the waiting call it was sent on to, if any."""
+        try:
+            call = self.ambulance_dispatcher.release(ambulance_id)
+        except KeyError:
+            raise HospitalError("Ambulance ID not found!")
+        except ValueError:
+            raise HospitalError(f"Ambulance {ambulance_id} is not booked.")
+        self.save_record(self.ambulances, self.ambulances_file, ambulance_id)
+        return call
 
-        print(f"Ambulance ID: {ambulance_id} (Driver: {driver_name}) has been booked successfully!")
+    @timed
+    def refresh_ambulance(self, ambulance_id):
+        """Save an edited ambulance and tell the dispatcher; returns the waiting call it was sent to, if any."""
+        call = self.ambulance_dispatcher.refresh(ambulance_id)
+        self.save_record(self.ambulances, self.ambulances_file, ambulance_id)
+        return call
 
 # Main program execution
 if __name__ == "__main__":
-    hospital_system = HospitalManagementSystem()
+    # HOSPITAL_DB=hospital.db runs on the SQLite database made by `python storage.py migrate`
+    database = os.environ.get("HOSPITAL_DB")
+    hospital_system = HospitalManagementSystem(SQLiteStorage(database) if database else None)
     hospital_system.menu()
\ No newline at end of file
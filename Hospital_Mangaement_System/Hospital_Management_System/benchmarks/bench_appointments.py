@@ -0,0 +1,100 @@
+"""Appointment conflict checks and per-patient lookups: full scans vs the in-memory indexes.
+
+    python -m benchmarks.bench_appointments [--appointments 1000000]
+
+Writes a synthetic appointments.txt to a temporary directory, loads it with
+TextFileStorage (which builds the indexes) and times both operations.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+import timeit
+
+from records import parse_time
+from storage import TextFileStorage
+
+
+def write_appointments(n_appointments, n_patients, n_doctors, rng):
+    with open("appointments.txt", "w") as file:
+        for i in range(n_appointments):
+            patient_id = rng.randrange(n_patients)
+            doctor_id = rng.randrange(n_doctors)
+            date = f"2026-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+            time_str = f"{rng.randrange(24):02d}:{rng.randrange(0, 60, 15):02d}"
+            file.write(f"{i},{patient_id},{doctor_id},{date},{time_str}\n")
+
+
+def rss_mb():
+    with open("/proc/self/statm") as file:
+        return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+
+
+def scan_conflict(appointments, doctor_id, date, time):
+    """ The previous is_appointment_conflict. """
+    for appointment_id, appointment_info in appointments.items():
+        if appointment_info.doctor_id == doctor_id and appointment_info.date == date and appointment_info.time == time:
+            return True
+    return False
+
+
+def scan_patient(appointments, patient_id):
+    """ The loop of the previous view_patient_appointments. """
+    return [appointment_id for appointment_id, appointment_info in appointments.items()
+            if appointment_info.patient_id == patient_id]
+
+
+def best_of(fn, repeat=3):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--appointments', type=int, nargs='+', default=[1000000])
+    parser.add_argument('--patients', type=int, default=100000)
+    parser.add_argument('--doctors', type=int, default=2000)
+    args = parser.parse_args()
+
+    storage = TextFileStorage(use_cache=False)
+    cwd = os.getcwd()
+    for n_appointments in args.appointments:
+        rng = random.Random(0)
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                write_appointments(n_appointments, args.patients, args.doctors, rng)
+                start = time.perf_counter()
+                appointments = storage.load("appointments.txt")
+                load_seconds = time.perf_counter() - start
+                before_mb = rss_mb()
+                start = time.perf_counter()
+                appointments.reindex()
+                reindex_seconds = time.perf_counter() - start
+                index_mb = rss_mb() - before_mb
+            finally:
+                os.chdir(cwd)
+
+        # Probe a booked slot of a random appointment (worst case for the scan is a miss)
+        probe = appointments[str(rng.randrange(n_appointments))]
+        doctor_id, date, free_time = probe.doctor_id, probe.date, parse_time("23:59")
+        patient_id = probe.patient_id
+        print(f"{n_appointments} appointments: load {load_seconds:.1f}s, "
+              f"index build {reindex_seconds:.1f}s (~{index_mb:.0f}MB of indexes)")
+        print(f"{'operation':<26} {'scan ms':>10} {'index us':>10}")
+        rows = [
+            ("conflict check (free)", lambda: scan_conflict(appointments, doctor_id, date, free_time),
+             lambda: next(storage.find(appointments, "appointments.txt", doctor_id=doctor_id, date=date,
+                                       time=free_time), None)),
+            ("patient appointments", lambda: scan_patient(appointments, patient_id),
+             lambda: list(storage.find(appointments, "appointments.txt", patient_id=patient_id))),
+        ]
+        for label, scan, indexed in rows:
+            assert bool(scan()) == bool(indexed())
+            print(f"{label:<26} {best_of(scan) * 1e3:>10.1f} {best_of(indexed) * 1e6:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+"""Onboarding a hospital: bulk.py imports vs adding patients one at a time.
+
+    python -m benchmarks.bench_bulk [--patients 50000] [--batch-size 5000] [--db]
+
+The input is a generated patients CSV in the patients.txt layout, with a few
+percent of rows carrying duplicate IDs or invalid ages. The one-at-a-time
+baselines add each accepted row the way add_patient does: the original
+full-file rewrite per record (timed on a prefix, as it is quadratic) and
+the journal append per record. Appointments are imported too, as they are
+the most expensive rows to check.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+
+from a import HospitalManagementSystem
+from bulk import import_rows
+from records import Patient
+from storage import SQLiteStorage
+
+
+def write_patients(path, n_patients, rng):
+    with open(path, "w") as file:
+        for i in range(n_patients):
+            patient_id = f"P{rng.randrange(i)}" if i and rng.random() < 0.02 else f"P{i}"
+            age = str(rng.randint(1, 99)) if rng.random() > 0.01 else "150"
+            file.write(f"{patient_id},Patient {i},{age},{rng.choice(['Flu', 'Cold', 'Asthma', 'Migraine'])}\n")
+
+
+def write_doctors(path, n_doctors):
+    with open(path, "w") as file:
+        for i in range(n_doctors):
+            file.write(f"D{i},Doctor {i},Cardiology,98765{i:05d}\n")
+
+
+def write_appointments(path, n_appointments, n_patients, n_doctors, rng):
+    first_day = date.today() + timedelta(days=1)
+    with open(path, "w") as file:
+        for i in range(n_appointments):
+            day = first_day + timedelta(days=rng.randrange(60))
+            minutes = rng.randrange(9 * 60, 17 * 60, 30)
+            file.write(f"A{i},P{rng.randrange(n_patients)},D{rng.randrange(n_doctors)},{day.isoformat()},"
+                       f"{minutes // 60:02d}:{minutes % 60:02d},30\n")
+
+
+def one_at_a_time(hospital, path, limit, rewrite):
+    """ Seconds to add the first `limit` valid rows one record at a time. """
+    start = time.perf_counter()
+    added = 0
+    with open(path) as file:
+        for line in file:
+            patient_id, name, age, disease = line.rstrip("\n").split(",")
+            if patient_id in hospital.patients or not hospital.is_valid_age(age):
+                continue
+            hospital.patients[patient_id] = Patient(name, int(age), disease)
+            if rewrite:
+                hospital.save_data(hospital.patients, hospital.patients_file)
+            else:
+                hospital.save_record(hospital.patients, hospital.patients_file, patient_id)
+            added += 1
+            if added == limit:
+                break
+    return time.perf_counter() - start, added
+
+
+def fresh_hospital(directory, database):
+    os.chdir(directory)
+    for name in os.listdir(directory):
+        if not name.endswith(".csv"):
+            os.remove(name)
+    return HospitalManagementSystem(SQLiteStorage(database) if database else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=50000)
+    parser.add_argument('--appointments', type=int, default=50000)
+    parser.add_argument('--doctors', type=int, default=200)
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--rewrite-prefix', type=int, default=2000,
+                        help="rows timed with the full-rewrite baseline")
+    parser.add_argument('--db', action='store_true', help="import into SQLite instead of the .txt files")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        patients_csv = os.path.join(directory, "patients.csv")
+        doctors_csv = os.path.join(directory, "doctors.csv")
+        appointments_csv = os.path.join(directory, "appointments.csv")
+        write_patients(patients_csv, args.patients, rng)
+        write_doctors(doctors_csv, args.doctors)
+        write_appointments(appointments_csv, args.appointments, args.patients, args.doctors, rng)
+        database = "hospital.db" if args.db else None
+        try:
+            rows = []
+            if not args.db:
+                # On SQLite save_data of a table onto itself writes nothing; there is no rewrite to time
+                hospital = fresh_hospital(directory, database)
+                seconds, added = one_at_a_time(hospital, patients_csv, args.rewrite_prefix, rewrite=True)
+                hospital.close()
+                rows.append(("save_data per record", added, seconds))
+
+            hospital = fresh_hospital(directory, database)
+            seconds, added = one_at_a_time(hospital, patients_csv, None, rewrite=False)
+            hospital.close()
+            rows.append(("save_record per record", added, seconds))
+
+            hospital = fresh_hospital(directory, database)
+            report = import_rows(hospital, "patients", patients_csv, args.batch_size)
+            rows.append(("bulk import patients", report.accepted, report.seconds))
+            import_rows(hospital, "doctors", doctors_csv, args.batch_size)
+            appointments = import_rows(hospital, "appointments", appointments_csv, args.batch_size)
+            rows.append(("bulk import appointments", appointments.accepted, appointments.seconds))
+            hospital.close()
+        finally:
+            os.chdir(cwd)
+
+    print(f"{args.patients} patient rows, {args.appointments} appointment rows, "
+          f"{'SQLite' if args.db else 'text files'}, batches of {args.batch_size}")
+    print(f"{'method':<26} {'rows':>7} {'seconds':>8} {'rows/s':>10}")
+    for method, count, seconds in rows:
+        print(f"{method:<26} {count:>7} {seconds:>8.2f} {count / seconds:>10,.0f}")
+    print(f"patients rejected: {report.rejected} ({', '.join(f'{n} {r}' for r, n in report.reasons.items())})")
+    print(f"appointments rejected: {appointments.rejected} "
+          f"({', '.join(f'{n} {r}' for r, n in appointments.reasons.items())})")
+
+
+if __name__ == '__main__':
+    main()
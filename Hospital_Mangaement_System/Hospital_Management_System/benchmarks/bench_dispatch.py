@@ -0,0 +1,171 @@
+"""Ambulance dispatch under a simulated call storm, and the cost of one dispatch.
+
+    python -m benchmarks.bench_dispatch [--ambulances 50] [--zones 10] [--hours 24] [--threads 32]
+
+The storm is a discrete-event simulation on a virtual clock: calls arrive at
+random over the day at --rate per hour, three times as fast during a
+two-hour storm, and every ambulance is busy 30-90 minutes per call. Queue
+wait is measured on that clock; dispatch latency is the real time spent in
+each request(). A final run hammers one dispatcher from --threads threads
+and checks no ambulance was ever handed out twice.
+"""
+import argparse
+import heapq
+import itertools
+import random
+import threading
+import time
+from dataclasses import replace
+
+from dispatch import LONGEST_IDLE, NEAREST, AmbulanceDispatcher
+from records import Ambulance, AmbulanceStatus
+
+
+def make_fleet(n_ambulances, n_zones):
+    return {f"A{i}": Ambulance(f"Driver {i}", AmbulanceStatus.AVAILABLE, i % n_zones) for i in range(n_ambulances)}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def scan_dispatch(ambulances):
+    """ The previous book_ambulance: collect every available ambulance and take the first. """
+    available = {key: info for key, info in ambulances.items() if info.status == AmbulanceStatus.AVAILABLE}
+    if not available:
+        return None
+    ambulance_id = next(iter(available))
+    ambulances[ambulance_id] = replace(ambulances[ambulance_id], status=AmbulanceStatus.BOOKED)
+    return ambulance_id
+
+
+def simulate(policy, args):
+    rng = random.Random(1)
+    now = [0.0]
+    fleet = make_fleet(args.ambulances, args.zones)
+    dispatcher = AmbulanceDispatcher(fleet, policy, clock=lambda: now[0])
+    storm_start, storm_end = 8 * 60.0, 10 * 60.0
+
+    events = []  # (minute, order, kind, ambulance_id)
+    minute, order = 0.0, 0
+    while minute < args.hours * 60:
+        rate = args.rate * (3 if storm_start <= minute < storm_end else 1)
+        minute += rng.expovariate(rate / 60)
+        events.append((minute, order, "call", None))
+        order += 1
+    heapq.heapify(events)
+
+    calls, latencies, distances = [], [], []
+
+    orders = itertools.count(order)
+
+    def send(call):
+        distances.append(abs(fleet[call.ambulance_id].zone - call.zone))
+        heapq.heappush(events, (now[0] + rng.uniform(30, 90), next(orders), "return", call.ambulance_id))
+
+    while events:
+        now[0], _, kind, ambulance_id = heapq.heappop(events)
+        if kind == "call":
+            start = time.perf_counter()
+            call = dispatcher.request(rng.randrange(args.zones))
+            latencies.append(time.perf_counter() - start)
+            calls.append(call)
+            if call.ambulance_id is not None:
+                send(call)
+        else:
+            call = dispatcher.release(ambulance_id)
+            if call is not None:
+                send(call)
+
+    waits = [call.wait for call in calls]
+    return dispatcher.stats, waits, latencies, distances
+
+
+def hammer(n_threads, n_ambulances, per_thread):
+    """ Claim and return ambulances from many threads; returns (operations/s, problems found). """
+    fleet = make_fleet(n_ambulances, 1)
+    dispatcher = AmbulanceDispatcher(fleet)
+    held = [[] for _ in range(n_threads)]
+    waiting = [[] for _ in range(n_threads)]
+
+    def worker(number):
+        rng = random.Random(number)
+        mine, calls = held[number], waiting[number]
+        for _ in range(per_thread):
+            # Queued calls may have been given an ambulance returned by another thread
+            for call in [call for call in calls if call.ambulance_id is not None]:
+                calls.remove(call)
+                mine.append(call.ambulance_id)
+            if mine and rng.random() < 0.5:
+                dispatcher.release(mine.pop(rng.randrange(len(mine))))
+            else:
+                call = dispatcher.request()
+                if call.ambulance_id is None:
+                    calls.append(call)
+                else:
+                    mine.append(call.ambulance_id)
+
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    out = [ambulance_id for mine in held for ambulance_id in mine]
+    out += [call.ambulance_id for calls in waiting for call in calls if call.ambulance_id is not None]
+    booked = sorted(key for key, info in fleet.items() if info.status == AmbulanceStatus.BOOKED)
+    problems = [f"{ambulance_id} held twice" for ambulance_id in set(out) if out.count(ambulance_id) > 1]
+    if sorted(out) != booked:
+        problems.append(f"{len(out)} ambulances held, {len(booked)} booked")
+    return n_threads * per_thread / elapsed, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--ambulances', type=int, default=50)
+    parser.add_argument('--zones', type=int, default=10)
+    parser.add_argument('--hours', type=int, default=24)
+    parser.add_argument('--rate', type=float, default=30, help="calls per hour outside the storm")
+    parser.add_argument('--threads', type=int, default=32)
+    args = parser.parse_args()
+
+    print(f"{args.ambulances} ambulances in {args.zones} zones, {args.rate:g} calls/h, 3x during 08:00-10:00")
+    print(f"{'policy':<13} {'calls':>6} {'queued':>7} {'max queue':>9} {'wait p50':>9} {'wait p95':>9} "
+          f"{'wait max':>9} {'zones away':>10} {'dispatch p50':>12} {'p99':>7}")
+    for policy in (LONGEST_IDLE, NEAREST):
+        stats, waits, latencies, distances = simulate(policy, args)
+        print(f"{policy:<13} {stats['calls']:>6} {stats['queued']:>7} {stats['max_queue']:>9} "
+              f"{percentile(waits, 0.5):>7.1f}m {percentile(waits, 0.95):>7.1f}m {max(waits):>7.1f}m "
+              f"{sum(distances) / len(distances):>10.2f} {percentile(latencies, 0.5) * 1e6:>10.1f}us "
+              f"{percentile(latencies, 0.99) * 1e6:>5.1f}us")
+
+    print()
+    print(f"{'fleet':>7} {'scan dispatch':>14} {'dispatcher':>11}")
+    for n_ambulances in (100, 10000):
+        fleet = make_fleet(n_ambulances, args.zones)
+        rounds = 2000
+        start = time.perf_counter()
+        for _ in range(rounds):
+            ambulance_id = scan_dispatch(fleet)
+            fleet[ambulance_id] = replace(fleet[ambulance_id], status=AmbulanceStatus.AVAILABLE)
+        scan = (time.perf_counter() - start) / rounds
+        dispatcher = AmbulanceDispatcher(make_fleet(n_ambulances, args.zones), NEAREST)
+        start = time.perf_counter()
+        for i in range(rounds):
+            dispatcher.release(dispatcher.request(i % args.zones).ambulance_id)
+        fast = (time.perf_counter() - start) / rounds
+        print(f"{n_ambulances:>7} {scan * 1e6:>12.1f}us {fast * 1e6:>9.1f}us")
+
+    print()
+    rate, problems = hammer(args.threads, args.ambulances, 5000)
+    print(f"{args.threads} threads claiming and returning {args.ambulances} ambulances: {rate:,.0f} ops/s, "
+          f"problems: {len(problems)}")
+    for problem in problems[:10]:
+        print("  ", problem)
+
+
+if __name__ == '__main__':
+    main()
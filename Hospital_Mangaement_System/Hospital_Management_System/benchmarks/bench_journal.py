@@ -0,0 +1,83 @@
+"""Patient updates per second: rewriting patients.txt vs the journal (save_record).
+
+    python -m benchmarks.bench_journal [--patients 10000 100000 1000000] [--seconds 3]
+
+Each mode updates random patients for up to --seconds (or --updates) and
+includes fsync and compaction time. Runs in a temporary directory.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from a import HospitalManagementSystem
+from records import Patient
+from storage import TextFileStorage
+
+
+def write_patients(n_patients):
+    with open("patients.txt", "w") as file:
+        for i in range(n_patients):
+            file.write(f"{i},patient{i},{i % 90 + 1},disease{i % 50}\n")
+
+
+def rewrite_patients(hospital):
+    """ The previous save_data: rewrite the whole file in place, no fsync. """
+    with open(hospital.patients_file, "w") as file:
+        for key, value in hospital.patients.items():
+            file.write(f"{key},{','.join(value.to_fields())}\n")
+
+
+def updates_per_second(hospital, save, n_updates, seconds):
+    rng = random.Random(0)
+    keys = list(hospital.patients)
+    done = 0
+    start = time.perf_counter()
+    while done < n_updates and time.perf_counter() - start < seconds:
+        patient_id = rng.choice(keys)
+        hospital.patients[patient_id] = Patient(f"patient{patient_id}", rng.randint(1, 99), "flu")
+        save(patient_id)
+        done += 1
+    hospital.close()
+    return done / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--updates', type=int, default=20000)
+    parser.add_argument('--seconds', type=float, default=3.0)
+    args = parser.parse_args()
+
+    modes = [
+        ("full rewrite", None),
+        ("journal fsync=1", 1),
+        ("journal fsync=100", 100),
+        ("journal no fsync", 0),
+    ]
+    cwd = os.getcwd()
+    print(f"{'patients':>9}  {'mode':<20} {'updates/s':>10}")
+    for n_patients in args.patients:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                write_patients(n_patients)
+                for label, fsync_every in modes:
+                    hospital = HospitalManagementSystem(TextFileStorage(fsync_every=fsync_every or 0))
+                    if fsync_every is None:
+                        def save(patient_id):
+                            rewrite_patients(hospital)
+                    else:
+                        def save(patient_id):
+                            hospital.save_record(hospital.patients, hospital.patients_file, patient_id)
+                    rate = updates_per_second(hospital, save, args.updates, args.seconds)
+                    print(f"{n_patients:>9}  {label:<20} {rate:>10.0f}")
+                    # Leave the next mode a clean snapshot
+                    hospital.save_data(hospital.patients, hospital.patients_file)
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+"""Time to the first page of a listing vs the full report, on the text files and SQLite.
+
+    python -m benchmarks.bench_listing [--patients 1000 100000 1000000] [--page-size 20]
+
+Lists synthetic patients through storage.scan, as view_patients does:
+unfiltered, filtered by disease (an indexed column) and sorted by age and by
+disease. "first page" is the time until a page of lines is formatted, "full"
+the time to format every matching line, which is what the views did before
+they paged.
+"""
+import argparse
+import gc
+import itertools
+import os
+import random
+import tempfile
+import time
+
+from storage import SQLiteStorage, TextFileStorage
+
+DISEASES = 50
+
+CASES = [
+    ("unfiltered", {}, None, False),
+    ("filtered", {"disease": "Disease 7"}, None, False),
+    ("sorted by age", {}, "age", False),
+    ("sorted by disease", {}, "disease", True),
+]
+
+
+def write_patients(n_patients, rng):
+    with open("patients.txt", "w") as file:
+        for i in range(n_patients):
+            file.write(f"P{i},Patient {i},{rng.randint(1, 99)},Disease {rng.randrange(DISEASES)}\n")
+
+
+def describe(patient_id, patient):
+    return f"ID: {patient_id}, Name: {patient.name}, Age: {patient.age}, Disease: {patient.disease}"
+
+
+def time_listing(storage, data, criteria, order_by, descending, page_size):
+    """ Seconds to the first page and to the last line of one listing. """
+    # Garbage from the previous listing would otherwise be collected on our clock
+    gc.collect()
+    start = time.perf_counter()
+    records = storage.scan(data, "patients.txt", criteria, order_by, descending)
+    lines = [describe(*record) for record in itertools.islice(records, page_size)]
+    first_page = time.perf_counter() - start
+    for record in records:
+        lines.append(describe(*record))
+    return first_page, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, nargs='+', default=[1000, 100000, 1000000])
+    parser.add_argument('--page-size', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'patients':>9} {'backend':<8} {'listing':<18} {'first page':>11} {'full':>10}")
+    cwd = os.getcwd()
+    for n_patients in args.patients:
+        with tempfile.TemporaryDirectory() as directory:
+            os.chdir(directory)
+            try:
+                write_patients(n_patients, random.Random(0))
+                text = TextFileStorage()
+                sqlite = SQLiteStorage(os.path.join(directory, "hospital.db"))
+                patients = text.load("patients.txt")
+                table = sqlite.load("patients.txt")
+                with sqlite.transaction():
+                    table.insert_many(patients.items())
+                for backend, storage, data in (("text", text, patients), ("sqlite", sqlite, table)):
+                    for name, criteria, order_by, descending in CASES:
+                        first_page, full = time_listing(storage, data, criteria, order_by, descending,
+                                                        args.page_size)
+                        print(f"{n_patients:>9} {backend:<8} {name:<18} {first_page * 1e3:>9.2f}ms "
+                              f"{full * 1e3:>8.1f}ms")
+                sqlite.close()
+                text.close()
+            finally:
+                os.chdir(cwd)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Memory per record: lists of strings vs the typed records of records.py.
+
+    python -m benchmarks.bench_records [--records 200000]
+
+Generates --records lines per entity file and parses them both ways: the
+previous line.split(",")[1:] (a {"name", "price"} dict for medicines) and
+Record.from_fields. Bytes per record are what tracemalloc sees allocated
+for the values, keys excluded, as they are the same strings either way.
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from rooms import ROOM_TYPES
+from storage import TABLES
+
+DISEASES = ["Flu", "Cold", "Asthma", "Migraine", "Diabetes", "Fever", "Malaria", "Typhoid"]
+
+
+def generate(entity, n_records, rng):
+    """ Yield the lines of an entity file. """
+    first_day = date(2026, 1, 1)
+    types = list(ROOM_TYPES.values())
+    for i in range(n_records):
+        if entity == "patients":
+            yield f"P{i},Patient {i},{rng.randint(1, 99)},{rng.choice(DISEASES)}"
+        elif entity == "doctors":
+            yield f"D{i},Doctor {i},Specialty {rng.randrange(40)},9{rng.randrange(10 ** 9):09d}"
+        elif entity == "appointments":
+            minutes = rng.randrange(9 * 60, 17 * 60, 15)
+            yield (f"A{i},P{rng.randrange(n_records // 4 + 1)},D{rng.randrange(2000)},"
+                   f"{first_day + timedelta(days=rng.randrange(365))},{minutes // 60:02d}:{minutes % 60:02d},30")
+        elif entity == "staff":
+            yield f"S{i},Staff {i},{rng.choice(['Nurse', 'Technician', 'Receptionist', 'Cleaner'])},8{i % 10 ** 9:09d}"
+        elif entity == "rooms":
+            floor = rng.randrange(1, 21)
+            occupied = rng.random() < 0.7
+            yield (f"R{i},{floor},{rng.choice(types)},Floor {floor},"
+                   + (f"Occupied,P{rng.randrange(n_records)}" if occupied else "Available"))
+        elif entity == "ambulances":
+            yield f"A{i},Driver {i},{rng.choice(['Available', 'Booked'])},{rng.randrange(50)}"
+        else:
+            yield f"M{i},Medicine {i},{rng.randrange(1, 5000) / 4}"
+
+
+def parse_lists(lines, table):
+    """ The previous parse_record. """
+    if table.name == "medicines":
+        return [{"name": parts[1], "price": parts[2]} for parts in (line.split(",") for line in lines)]
+    return [line.split(",")[1:] for line in lines]
+
+
+def parse_records(lines, table):
+    return [table.record.from_fields(line.split(",")[1:]) for line in lines]
+
+
+def measure(parse, lines, table):
+    """ (bytes per record, microseconds per record) of parsing every line. """
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    values = parse(lines, table)
+    seconds = time.perf_counter() - start
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding the values is not part of them
+    size -= len(values) * 8
+    del values
+    return size / len(lines), seconds / len(lines) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--records', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{args.records} records per entity (tracemalloc slows parsing down alike for both)")
+    print(f"{'entity':<13} {'list B/rec':>10} {'record B/rec':>12} {'saved':>6} {'list us':>8} {'record us':>10}")
+    for table in TABLES.values():
+        lines = list(generate(table.name, args.records, random.Random(0)))
+        old_bytes, old_us = measure(parse_lists, lines, table)
+        new_bytes, new_us = measure(parse_records, lines, table)
+        print(f"{table.name:<13} {old_bytes:>10.0f} {new_bytes:>12.0f} {1 - new_bytes / old_bytes:>6.0%} "
+              f"{old_us:>8.2f} {new_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Room allot/release: the previous full scans vs RoomAllocator's free lists.
+
+    python -m benchmarks.bench_rooms [--beds 1000 10000]
+
+Each hospital starts half full; every step admits one patient and discharges
+another, without persisting anything.
+"""
+import argparse
+import random
+import time
+
+from records import Room
+from rooms import ROOM_TYPES, RoomAllocator
+
+
+def make_rooms(n_beds):
+    """ Rooms in the previous layout, lists of strings. """
+    types = list(ROOM_TYPES.values())
+    rooms = {}
+    for i in range(n_beds):
+        room_type = types[i % len(types)]
+        rooms[f"R{i:06d}"] = [str(i % 20 + 1), room_type, f"Floor {i % 20 + 1}", "Available"]
+    return rooms
+
+
+def scan_allot(rooms, room_type, patient_id):
+    """ The previous allot_room: scan for the patient, then filter all rooms of the type. """
+    for room_id, room_info in rooms.items():
+        if len(room_info) > 4 and room_info[4] == patient_id:
+            return None
+    available_rooms = {k: v for k, v in rooms.items() if v[1] == room_type and v[3] == "Available"}
+    if not available_rooms:
+        return None
+    room_id, info = next(iter(available_rooms.items()))
+    rooms[room_id][3] = "Occupied"
+    rooms[room_id].append(patient_id)
+    return room_id
+
+
+def scan_release(rooms, room_id):
+    if room_id in rooms and rooms[room_id][3] == "Occupied":
+        rooms[room_id][3] = "Available"
+        if len(rooms[room_id]) > 4:
+            rooms[room_id].pop(-1)
+        return True
+    return False
+
+
+def steps_per_second(allot, release, n_beds, seconds, max_steps):
+    rng = random.Random(0)
+    types = list(ROOM_TYPES.values())
+    admitted = []
+    for patient in range(n_beds // 2):
+        room_id = allot(types[patient % len(types)], str(patient))
+        admitted.append(room_id)
+    next_patient = n_beds
+    steps = 0
+    start = time.perf_counter()
+    while steps < max_steps and time.perf_counter() - start < seconds:
+        room_id = allot(rng.choice(types), str(next_patient))
+        next_patient += 1
+        if room_id is not None:
+            admitted.append(room_id)
+        release(admitted.pop(rng.randrange(len(admitted))))
+        steps += 1
+    return steps / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--beds', type=int, nargs='+', default=[1000, 10000])
+    parser.add_argument('--seconds', type=float, default=3.0)
+    parser.add_argument('--steps', type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"{'beds':>7} {'scan steps/s':>13} {'allocator steps/s':>18} {'speedup':>8}")
+    for n_beds in args.beds:
+        rooms = make_rooms(n_beds)
+        old = steps_per_second(lambda room_type, patient_id: scan_allot(rooms, room_type, patient_id),
+                               lambda room_id: scan_release(rooms, room_id), n_beds, args.seconds, args.steps)
+        allocator = RoomAllocator({room_id: Room.from_fields(info) for room_id, info in make_rooms(n_beds).items()})
+        new = steps_per_second(lambda room_type, patient_id: (None if allocator.room_of(patient_id) is not None
+                                                             else allocator.allot(room_type, patient_id)),
+                               allocator.release, n_beds, args.seconds, args.steps)
+        print(f"{n_beds:>7} {old:>13.0f} {new:>18.0f} {new / old:>7.0f}x")
+
+
+if __name__ == '__main__':
+    main()
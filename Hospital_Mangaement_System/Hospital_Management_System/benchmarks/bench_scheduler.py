@@ -0,0 +1,71 @@
+"""Scheduling engine latency: overlap checks, next free slots and earliest slot per specialty.
+
+    python -m benchmarks.bench_scheduler [--doctors 2000] [--specialties 20] [--per-day 12]
+
+Bookings are generated on demand from (doctor, date), so a year of them for
+thousands of doctors costs no memory until a day is first looked at.
+"""
+import argparse
+import random
+import timeit
+from datetime import date, datetime, time, timedelta
+
+from records import Appointment
+from scheduler import Scheduler, to_time
+
+
+def booked_day(doctor_id, day, per_day):
+    """ Deterministic 30-minute bookings between 09:00 and 17:00. """
+    rng = random.Random(f"{doctor_id}/{day}")
+    starts = rng.sample(range(9 * 60, 17 * 60, 30), min(per_day, 16))
+    return [(f"{doctor_id}_{day}_{start}", Appointment(f"p{start}", doctor_id, day, to_time(start), 30))
+            for start in starts]
+
+
+def best_of(fn, repeat=5):
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--doctors', type=int, default=2000)
+    parser.add_argument('--specialties', type=int, default=20)
+    parser.add_argument('--per-day', type=int, default=12, help="30-minute bookings per doctor per day (max 16)")
+    parser.add_argument('--days', type=int, default=365)
+    args = parser.parse_args()
+
+    scheduler = Scheduler(lambda doctor_id, day: booked_day(doctor_id, day, args.per_day),
+                          horizon_days=args.days)
+    doctors = [str(i) for i in range(args.doctors)]
+    specialty = doctors[::args.specialties]
+    start_day = date(2026, 1, 1)
+    rng = random.Random(0)
+
+    def random_day():
+        return start_day + timedelta(days=rng.randrange(args.days))
+
+    # Load a full year for a sample of doctors
+    for doctor_id in doctors[:100]:
+        for offset in range(args.days):
+            scheduler.day(doctor_id, start_day + timedelta(days=offset))
+    cached = len(scheduler.days)
+
+    after = datetime(2026, 3, 2, 9, 0)
+    rows = [
+        ("overlap check (cached day)", lambda: scheduler.is_free(rng.choice(doctors[:100]), random_day(),
+                                                                 time(10, 10), 30)),
+        ("overlap check (cold day)", lambda: Scheduler(scheduler.load_day).is_free(rng.choice(doctors), random_day(),
+                                                                                  time(10, 10), 30)),
+        ("next 5 free slots", lambda: scheduler.free_slots(rng.choice(doctors[:100]), after, 5)),
+        (f"earliest of {len(specialty)} doctors", lambda: scheduler.earliest_slot(specialty, after)),
+    ]
+    print(f"{args.doctors} doctors, {args.per_day} bookings/day, {cached} doctor-days cached")
+    print(f"{'operation':<30} {'us':>10}")
+    for label, fn in rows:
+        print(f"{label:<30} {best_of(fn) * 1e6:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Concurrency stress test and throughput report for service.py.
+
+    python -m benchmarks.bench_service [--clients 100] [--ops 200] [--db]
+
+Starts the service in a fresh directory holding doctors, rooms and
+ambulances, then lets every client thread fire a mix of requests over its
+own keep-alive connection. Clients compete for the same things: patient IDs
+registered by several clients, the calendars of a few doctors, a limited
+number of rooms and ambulances. Afterwards the service is stopped, the data
+is loaded back from disk, and every acknowledged change is checked to be
+there exactly once:
+
+  * every patient answered 201 exists, and each contested ID was granted once
+  * every appointment answered 201 exists and no doctor is double booked
+  * rooms were allotted and released alternately, each to one patient at a time
+  * no more ambulances were booked than exist, and each one once
+
+Exits with status 1 if anything was lost.
+"""
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+from records import AmbulanceStatus, RoomStatus
+from rooms import ROOM_TYPES
+from scheduler import to_minutes
+from storage import SQLiteStorage, TextFileStorage, migrate
+
+SERVICE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "service.py")
+
+
+def write_hospital(directory, n_doctors, n_rooms, n_ambulances):
+    with open(os.path.join(directory, "doctors.txt"), "w") as file:
+        for i in range(n_doctors):
+            file.write(f"D{i},Doctor {i},Cardiology,555-{i:04d}\n")
+    with open(os.path.join(directory, "rooms.txt"), "w") as file:
+        types = list(ROOM_TYPES.values())
+        for i in range(n_rooms):
+            file.write(f"R{i:04d},{i % 5 + 1},{types[i % len(types)]},Floor {i % 5 + 1},Available\n")
+    with open(os.path.join(directory, "ambulances.txt"), "w") as file:
+        for i in range(n_ambulances):
+            file.write(f"A{i},Driver {i},Available\n")
+
+
+def start_service(directory, port, database):
+    command = [sys.executable, SERVICE, "--port", str(port)]
+    if database:
+        command += ["--db", database]
+    process = subprocess.Popen(command, cwd=directory, stdout=subprocess.PIPE, text=True)
+    process.stdout.readline()  # "Serving on ..."
+    return process
+
+
+class Client(threading.Thread):
+    def __init__(self, number, args, port, results):
+        super().__init__()
+        self.number = number
+        self.args = args
+        self.port = port
+        self.results = results
+        self.rng = random.Random(number)
+
+    def call(self, method, path, payload=None):
+        body = json.dumps(payload) if payload is not None else None
+        start = time.perf_counter()
+        self.connection.request(method, path, body, {"Content-Type": "application/json"})
+        response = self.connection.getresponse()
+        answer = json.loads(response.read())
+        return response.status, answer, time.perf_counter() - start
+
+    def run(self):
+        self.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+        args, rng = self.args, self.rng
+        first_day = date.today() + timedelta(days=1)
+        own_patients = []
+        for i in range(args.ops):
+            kind = rng.choices(["patient", "contested", "appointment", "allot", "release", "ambulance"],
+                               weights=[25, 5, 40, 15, 10, 5])[0]
+            if kind in ("patient", "contested") or not own_patients:
+                kind = "contested" if kind == "contested" else "patient"
+                patient_id = f"S{rng.randrange(args.ops)}" if kind == "contested" else f"C{self.number}_{i}"
+                request = ("POST", "/patients", {"id": patient_id, "name": f"Client {self.number}",
+                                                 "age": rng.randint(1, 99), "disease": "Flu"})
+            elif kind == "appointment":
+                day = first_day + timedelta(days=rng.randrange(args.days))
+                minutes = rng.randrange(9 * 60, 17 * 60, 15)
+                request = ("POST", "/appointments", {"patient_id": rng.choice(own_patients),
+                                                     "doctor_id": f"D{rng.randrange(args.doctors)}",
+                                                     "date": day.isoformat(),
+                                                     "time": f"{minutes // 60:02d}:{minutes % 60:02d}",
+                                                     "duration": rng.choice([15, 30, 45])})
+            elif kind == "allot":
+                request = ("POST", "/rooms/allot", {"patient_id": rng.choice(own_patients),
+                                                    "room_type": rng.choice(list(ROOM_TYPES.values()))})
+            elif kind == "release":
+                request = ("POST", f"/rooms/R{rng.randrange(args.rooms):04d}/release", None)
+            else:
+                request = ("POST", "/ambulances/book", None)
+            status, answer, seconds = self.call(*request)
+            if kind == "patient" and status == 201:
+                own_patients.append(request[2]["id"])
+            self.results.append((kind, request, status, answer, seconds))
+        self.connection.close()
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else 0.0
+
+
+def load_back(directory, database):
+    """ The patients, appointments, rooms and ambulances as stored on disk. """
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        storage = SQLiteStorage(database) if database else TextFileStorage()
+        data = {filename: dict(storage.load(filename).items())
+                for filename in ("patients.txt", "appointments.txt", "rooms.txt", "ambulances.txt")}
+        storage.close()
+    finally:
+        os.chdir(cwd)
+    return data
+
+
+def check(results, data, n_ambulances):
+    """ List of problems found comparing the acknowledged requests with the stored data. """
+    problems = []
+    patients, appointments = data["patients.txt"], data["appointments.txt"]
+    rooms, ambulances = data["rooms.txt"], data["ambulances.txt"]
+
+    granted = defaultdict(int)
+    for kind, request, status, answer, _ in results:
+        if kind in ("patient", "contested") and status == 201:
+            granted[request[2]["id"]] += 1
+            if request[2]["id"] not in patients:
+                problems.append(f"lost patient {request[2]['id']}")
+        elif kind == "appointment" and status == 201 and answer["id"] not in appointments:
+            problems.append(f"lost appointment {answer['id']}")
+    problems += [f"patient {patient_id} registered {count} times"
+                 for patient_id, count in granted.items() if count > 1]
+
+    booked = defaultdict(list)
+    for value in appointments.values():
+        start = to_minutes(value.time)
+        booked[(value.doctor_id, value.date)].append((start, start + value.duration))
+    for (doctor_id, day), intervals in booked.items():
+        intervals.sort()
+        for (_, end), (next_start, _) in zip(intervals, intervals[1:]):
+            if next_start < end:
+                problems.append(f"doctor {doctor_id} double booked on {day}")
+
+    # A room alternates between allotted and released, whatever order the answers came back in
+    allotted, released = defaultdict(list), defaultdict(int)
+    for kind, request, status, answer, _ in results:
+        if kind == "allot" and status == 201:
+            allotted[answer["room_id"]].append(request[2]["patient_id"])
+        elif kind == "release" and status == 200:
+            released[answer["room_id"]] += 1
+    occupants = defaultdict(list)
+    for room_id, info in rooms.items():
+        occupied = info.status == RoomStatus.OCCUPIED
+        if len(allotted[room_id]) - released[room_id] != occupied:
+            problems.append(f"room {room_id}: {len(allotted[room_id])} allotments, {released[room_id]} releases, "
+                            f"{info.status.value.lower()}")
+        if occupied:
+            occupants[info.patient_id].append(room_id)
+            if info.patient_id not in allotted[room_id]:
+                problems.append(f"room {room_id} held by {info.patient_id}, who was never allotted it")
+    problems += [f"patient {patient_id} holds rooms {', '.join(room_ids)}"
+                 for patient_id, room_ids in occupants.items() if len(room_ids) > 1]
+
+    dispatched = [answer["ambulance_id"] for kind, _, status, answer, _ in results
+                  if kind == "ambulance" and status == 201]
+    if len(dispatched) != len(set(dispatched)) or len(dispatched) > n_ambulances:
+        problems.append(f"{len(dispatched)} dispatches for {len(set(dispatched))} ambulances")
+    if sorted(dispatched) != sorted(key for key, info in ambulances.items() if info.status == AmbulanceStatus.BOOKED):
+        problems.append("booked ambulances on disk differ from the dispatches")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--ops', type=int, default=200, help="requests per client")
+    parser.add_argument('--doctors', type=int, default=20)
+    parser.add_argument('--days', type=int, default=5)
+    parser.add_argument('--rooms', type=int, default=400)
+    parser.add_argument('--ambulances', type=int, default=50)
+    parser.add_argument('--port', type=int, default=8118)
+    parser.add_argument('--db', action='store_true', help="run the service on SQLite instead of the .txt files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        write_hospital(directory, args.doctors, args.rooms, args.ambulances)
+        database = None
+        if args.db:
+            database = os.path.join(directory, "hospital.db")
+            migrate(database, directory)
+        service = start_service(directory, args.port, database)
+        results = []
+        try:
+            clients = [Client(number, args, args.port, results) for number in range(args.clients)]
+            start = time.perf_counter()
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+            elapsed = time.perf_counter() - start
+        finally:
+            service.send_signal(signal.SIGINT)
+            service.wait()
+        data = load_back(directory, database)
+
+    print(f"{args.clients} clients x {args.ops} requests on {'SQLite' if args.db else 'text files'}: "
+          f"{len(results) / elapsed:,.0f} requests/s")
+    print(f"{'operation':<12} {'requests':>9} {'accepted':>9} {'p50 ms':>8} {'p99 ms':>8}")
+    by_kind = defaultdict(list)
+    for result in results:
+        by_kind[result[0]].append(result)
+    for kind, rows in by_kind.items():
+        seconds = [row[4] for row in rows]
+        accepted = sum(row[2] in (200, 201) for row in rows)
+        print(f"{kind:<12} {len(rows):>9} {accepted:>9} {percentile(seconds, 0.5) * 1000:>8.2f} "
+              f"{percentile(seconds, 0.99) * 1000:>8.2f}")
+
+    problems = check(results, data, args.ambulances)
+    for problem in problems[:20]:
+        print("LOST UPDATE:", problem)
+    print(f"lost updates: {len(problems)}")
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+"""Time to menu with lazy loading, and to the first use of an entity with and without the snapshot cache.
+
+    python -m benchmarks.bench_startup [--patients 1000000] [--appointments 1000000] [--repeat 3]
+
+Writes synthetic entity files (the other five hold --others records each)
+and times fresh interpreters that construct a HospitalManagementSystem and
+touch the named entities, as a menu session would on its first use of them.
+"parse" runs start without caches, "cache" runs read the ones the parse
+left behind. "all entities, parse" is what startup cost when __init__
+loaded every file. Times are wall clock, interpreter start included; the
+first row is an interpreter that does nothing. Best of --repeat.
+"""
+import argparse
+import glob
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.bench_records import generate
+from storage import TABLES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import sys
+from a import HospitalManagementSystem
+hospital = HospitalManagementSystem()
+for name in sys.argv[1:]:
+    getattr(hospital, name)
+"""
+
+ALL = [table.name for table in TABLES.values()]
+
+CASES = [
+    ("python alone", None, False),
+    ("menu", [], True),
+    ("book an ambulance", ["ambulance_dispatcher"], True),
+    ("patients, parse", ["patients"], False),
+    ("patients, cache", ["patients"], True),
+    ("appointments, parse", ["appointments"], False),
+    ("appointments, cache", ["appointments"], True),
+    ("all entities, parse", ALL, False),
+    ("all entities, cache", ALL, True),
+]
+
+
+def write_files(directory, counts, rng):
+    for filename, table in TABLES.items():
+        with open(os.path.join(directory, filename), "w") as file:
+            for line in generate(table.name, counts[table.name], rng):
+                file.write(line + "\n")
+
+
+def run(directory, entities, cached):
+    """ Seconds for a fresh interpreter to start and load the entities. """
+    if not cached:
+        for path in glob.glob(os.path.join(directory, "*.cache")):
+            os.remove(path)
+    command = [sys.executable, "-c", "pass"] if entities is None else [sys.executable, "-c", CHILD, *entities]
+    start = time.perf_counter()
+    subprocess.run(command, cwd=directory, env={**os.environ, "PYTHONPATH": ROOT}, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patients', type=int, default=1000000)
+    parser.add_argument('--appointments', type=int, default=1000000)
+    parser.add_argument('--others', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    counts = {table.name: args.others for table in TABLES.values()}
+    counts.update(patients=args.patients, appointments=args.appointments)
+    with tempfile.TemporaryDirectory() as directory:
+        write_files(directory, counts, random.Random(0))
+        # The caches the "cache" cases read
+        run(directory, ALL, False)
+        print(f"{args.patients} patients, {args.appointments} appointments, {args.others} of everything else")
+        print(f"{'case':<22} {'seconds':>8}")
+        for name, entities, cached in CASES:
+            seconds = min(run(directory, entities, cached) for _ in range(args.repeat))
+            print(f"{name:<22} {seconds:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""Repeatable benchmark suite of the hospital's operations, with stored results to compare.
+
+    python -m benchmarks.bench_suite [--scale small|medium|large] [--db] [--ops 1000] [--seed 0]
+    python -m benchmarks.bench_suite --compare benchmarks/results/<earlier run>.json
+
+Generates a hospital with generate.py, then times through the
+non-interactive API of HospitalManagementSystem:
+
+  * load: a fresh system loading every entity, parsing the files and
+    reading the snapshot caches (once each)
+  * add: register_patient with new IDs
+  * schedule: book_appointment at random doctors, days and times, some of
+    them refused as conflicts
+  * allot / release: assign_room and vacate_room
+  * book_ambulance: dispatch_ambulance, then return_ambulance
+  * buy_medicine: purchase_medicine
+  * listing: the first page of the patients, unfiltered, filtered by
+    disease and sorted by age, as the view menus fetch it
+
+The same seed replays the same operations on the same data. Each case
+reports its throughput, latency percentiles, and bytes written and records
+scanned per operation (from metrics.py). The counts do not depend on the
+machine, so they show a change in work done that timing noise would hide.
+The results are saved as JSON in --save. --compare checks them against an
+earlier file and exits with status 1 when a case is slower by more than
+--threshold, or does more work.
+"""
+import argparse
+import gc
+import glob
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+from a import HospitalError, HospitalManagementSystem
+from generate import generate, write
+from metrics import METRICS
+from rooms import ROOM_TYPES
+from storage import TABLES, SQLiteStorage, TextFileStorage
+
+SCALES = {
+    "small": {"patients": 10000, "doctors": 200, "appointments": 20000, "rooms": 1000, "ambulances": 100,
+              "staff": 500, "medicines": 1000},
+    "medium": {"patients": 100000, "doctors": 2000, "appointments": 200000, "rooms": 5000, "ambulances": 500,
+               "staff": 2000, "medicines": 5000},
+    "large": {"patients": 1000000, "doctors": 10000, "appointments": 1000000, "rooms": 20000,
+              "ambulances": 2000, "staff": 10000, "medicines": 20000},
+}
+
+RESULTS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Days ahead that bookings are generated and made on
+DAYS = 90
+
+
+def percentile(sorted_seconds, fraction):
+    return sorted_seconds[min(len(sorted_seconds) - 1, int(fraction * len(sorted_seconds)))]
+
+
+def summarise(latencies, operation=None, metrics=None):
+    """ The result of a case: throughput, latency percentiles, and work per op from the metrics snapshot. """
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    result = {
+        "ops": len(latencies),
+        "ops_per_second": len(latencies) / total if total else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1e3,
+        "p95_ms": percentile(latencies, 0.95) * 1e3,
+        "p99_ms": percentile(latencies, 0.99) * 1e3,
+    }
+    stats = (metrics or {}).get(operation)
+    if stats and stats["calls"]:
+        result["bytes_per_op"] = stats["bytes_written"] / stats["calls"]
+        result["scanned_per_op"] = stats["records_scanned"] / stats["calls"]
+    return result
+
+
+def timed_calls(calls):
+    """ Run zero-argument calls, returning each one's seconds and how many were refused. """
+    latencies, refused = [], 0
+    for call in calls:
+        start = time.perf_counter()
+        try:
+            call()
+        except HospitalError:
+            refused += 1
+        latencies.append(time.perf_counter() - start)
+    return latencies, refused
+
+
+def new_system(database):
+    return HospitalManagementSystem(SQLiteStorage(database) if database else TextFileStorage())
+
+
+def load_all(hospital):
+    for table in TABLES.values():
+        getattr(hospital, table.name)
+
+
+def bench_load(database):
+    """ Seconds to load every entity into a fresh system, by how the records were read. """
+    results = {}
+    ways = [("load", None)] if database else [("load (parse)", False), ("load (cache)", True)]
+    for name, cached in ways:
+        if cached is False:
+            for path in glob.glob("*.cache"):
+                os.remove(path)
+        gc.collect()
+        start = time.perf_counter()
+        hospital = new_system(database)
+        load_all(hospital)
+        results[name] = summarise([time.perf_counter() - start])
+        hospital.close()
+    return results
+
+
+def bench_operations(hospital, counts, n_ops, rng):
+    """ {case: result} of the operations that change data. """
+    results = {}
+    tomorrow = date.today() + timedelta(days=1)
+    # Loading belongs to the load case, not to the first operation of this one
+    load_all(hospital)
+    hospital.room_allocator.ensure_built()
+    hospital.ambulance_dispatcher.ensure_built()
+
+    def case(name, operation, calls):
+        METRICS.reset()
+        gc.collect()
+        latencies, refused = timed_calls(calls)
+        results[name] = summarise(latencies, operation, METRICS.snapshot()["operations"])
+        results[name]["refused"] = refused
+
+    case("add", "HospitalManagementSystem.register_patient",
+         [lambda i=i: hospital.register_patient(f"NEW{i}", f"Patient {i}", str(rng.randint(1, 99)), "Flu")
+          for i in range(n_ops)])
+
+    doctor_ids = list(itertools.islice(hospital.doctors, counts["doctors"]))
+    patient_ids = list(itertools.islice(hospital.patients, counts["patients"]))
+
+    def booking():
+        day = tomorrow + timedelta(days=rng.randrange(DAYS - 1))
+        minutes = rng.randrange(9 * 60, 17 * 60 - 30, 15)
+        return (rng.choice(patient_ids), rng.choice(doctor_ids), day.isoformat(),
+                f"{minutes // 60:02d}:{minutes % 60:02d}", 30)
+    case("schedule", "HospitalManagementSystem.book_appointment",
+         [lambda args=booking(): hospital.book_appointment(*args) for _ in range(n_ops)])
+
+    # Patients without a room, so allotting is refused only when a type is full
+    occupants = {room.patient_id for room in hospital.rooms.values() if room.patient_id is not None}
+    free_patients = [patient_id for patient_id in patient_ids if patient_id not in occupants][:n_ops]
+    room_types = list(ROOM_TYPES.values())
+    allotted = []
+
+    def allot(patient_id, room_type):
+        allotted.append(hospital.assign_room(room_type, patient_id))
+    case("allot", "HospitalManagementSystem.assign_room",
+         [lambda patient_id=patient_id: allot(patient_id, rng.choice(room_types)) for patient_id in free_patients])
+    case("release", "HospitalManagementSystem.vacate_room",
+         [lambda room_id=room_id: hospital.vacate_room(room_id) for room_id in allotted])
+
+    def book_ambulance():
+        call = hospital.dispatch_ambulance(rng.randrange(20))
+        if call.ambulance_id is not None:
+            hospital.return_ambulance(call.ambulance_id)
+    case("book_ambulance", "HospitalManagementSystem.dispatch_ambulance", [book_ambulance] * n_ops)
+
+    medicine_ids = list(itertools.islice(hospital.medicines, counts["medicines"]))
+    case("buy_medicine", "HospitalManagementSystem.purchase_medicine",
+         [lambda: hospital.purchase_medicine(rng.choice(patient_ids), rng.choice(medicine_ids))] * n_ops)
+    return results
+
+
+def bench_listing(hospital, repeat, page_size=20):
+    """ {case: result} of fetching the first page of the patients list. """
+    results = {}
+    listings = [
+        ("listing (unfiltered)", None, None),
+        ("listing (filtered)", {"disease": "Flu"}, None),
+        ("listing (sorted)", None, "age"),
+    ]
+    for name, criteria, order_by in listings:
+        latencies = []
+        for _ in range(repeat):
+            gc.collect()
+            start = time.perf_counter()
+            records = hospital.scan(hospital.patients, hospital.patients_file, criteria, order_by)
+            list(itertools.islice(records, page_size))
+            latencies.append(time.perf_counter() - start)
+            if hasattr(records, "close"):
+                records.close()
+        results[name] = summarise(latencies)
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(before, after, threshold):
+    """ Print the change of every case and return the names of those that regressed. """
+    if (before["meta"]["scale"], before["meta"]["backend"]) != (after["meta"]["scale"], after["meta"]["backend"]):
+        print(f"Warning: comparing {before['meta']['scale']}/{before['meta']['backend']} "
+              f"with {after['meta']['scale']}/{after['meta']['backend']}")
+    regressed = []
+    print(f"\n{'case':<22} {'p50 before':>10} {'p50 now':>10} {'change':>8} {'work':>6}")
+    for name, now in after["results"].items():
+        old = before["results"].get(name)
+        if old is None:
+            continue
+        change = now["p50_ms"] / old["p50_ms"] - 1 if old["p50_ms"] else 0.0
+        more_work = any(now.get(counter, 0) > old.get(counter, 0) * (1 + threshold) + 1e-9
+                        for counter in ("bytes_per_op", "scanned_per_op"))
+        flag = change > threshold or more_work
+        if flag:
+            regressed.append(name)
+        print(f"{name:<22} {old['p50_ms']:>9.3f}ms {now['p50_ms']:>8.3f}ms {change:>+8.0%} "
+              f"{'more' if more_work else 'same':>6}{'  REGRESSED' if flag else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default="small")
+    parser.add_argument('--db', action='store_true', help="run on SQLite instead of the .txt files")
+    parser.add_argument('--ops', type=int, default=1000, help="operations per case")
+    parser.add_argument('--listing-repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--save', default=RESULTS, help="directory the results are written to")
+    parser.add_argument('--compare', help="results of an earlier run to compare with")
+    parser.add_argument('--threshold', type=float, default=0.10, help="slowdown counted as a regression")
+    args = parser.parse_args()
+
+    counts = SCALES[args.scale]
+    backend = "sqlite" if args.db else "text"
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            database = os.path.join(directory, "hospital.db") if args.db else None
+            start = time.perf_counter()
+            storage = SQLiteStorage(database) if database else TextFileStorage()
+            write(storage, generate(counts, args.seed, date.today() + timedelta(days=1), DAYS))
+            storage.close()
+            print(f"{args.scale} hospital ({', '.join(f'{n} {entity}' for entity, n in counts.items())}) "
+                  f"on {backend}, generated in {time.perf_counter() - start:.1f}s")
+
+            results = bench_load(database)
+            hospital = new_system(database)
+            results.update(bench_operations(hospital, counts, args.ops, random.Random(args.seed)))
+            results.update(bench_listing(hospital, args.listing_repeat))
+            hospital.close()
+        finally:
+            os.chdir(cwd)
+
+    print(f"\n{'case':<22} {'ops':>6} {'ops/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} "
+          f"{'bytes/op':>9} {'scanned/op':>10} {'refused':>7}")
+    for name, result in results.items():
+        print(f"{name:<22} {result['ops']:>6} {result['ops_per_second']:>10.1f} {result['p50_ms']:>9.3f} "
+              f"{result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f} {result.get('bytes_per_op', 0):>9.0f} "
+              f"{result.get('scanned_per_op', 0):>10.1f} {result.get('refused', ''):>7}")
+
+    run = {
+        "meta": {
+            "scale": args.scale, "backend": backend, "counts": counts, "ops": args.ops, "seed": args.seed,
+            "commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+    os.makedirs(args.save, exist_ok=True)
+    path = os.path.join(args.save, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.scale}-{backend}.json")
+    with open(path, "w") as file:
+        json.dump(run, file, indent=2)
+    print(f"\nResults saved to {path}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressed = compare(json.load(file), run, args.threshold)
+        if regressed:
+            print(f"\nRegressed: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
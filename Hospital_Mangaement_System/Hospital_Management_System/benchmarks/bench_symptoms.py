@@ -0,0 +1,84 @@
+"""Symptom matching: the previous per-disease substring checks vs SymptomMatcher.
+
+    python -m benchmarks.bench_symptoms [--diseases 10000] [--symptoms 100000] [--reports 2000]
+
+The catalogue is generated: symptoms are 1-3 word phrases over a fixed
+vocabulary. Every symptom belongs to one disease, and every disease also
+lists two random symptoms of others. Each report names three symptoms of
+one disease among unrelated words.
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from symptoms import SymptomMatcher
+
+
+def make_catalogue(n_diseases, n_symptoms, rng):
+    vocabulary = [f"{rng.choice('bcdfghklmnprstvz')}{rng.choice('aeiou')}{rng.choice('bcdfghklmnprstvz')}"
+                  f"{rng.choice('aeiou')}{i}" for i in range(5000)]
+    symptoms = set()
+    while len(symptoms) < n_symptoms:
+        symptoms.add(" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))))
+    symptoms = sorted(symptoms)
+    rng.shuffle(symptoms)
+    # Every symptom belongs to one disease, and each disease shares two more with others
+    catalogue = {f"Disease {i}": symptoms[i::n_diseases] + rng.sample(symptoms, 2) for i in range(n_diseases)}
+    return catalogue, vocabulary
+
+
+def make_reports(catalogue, vocabulary, n_reports, rng):
+    diseases = list(catalogue)
+    reports = []
+    for _ in range(n_reports):
+        named = rng.sample(catalogue[rng.choice(diseases)], 3)
+        noise = rng.choices(vocabulary, k=6)
+        reports.append(", ".join(named + [" ".join(noise)]))
+    return reports
+
+
+def scan_identify(catalogue, report):
+    """ The previous identify_disease: a substring check per disease and symptom. """
+    report = report.lower()
+    return [disease for disease, symptoms in catalogue.items() if any(symptom in report for symptom in symptoms)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--diseases', type=int, default=10000)
+    parser.add_argument('--symptoms', type=int, default=100000)
+    parser.add_argument('--reports', type=int, default=2000)
+    parser.add_argument('--scan-reports', type=int, default=50, help="reports timed with the substring scan")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    catalogue, vocabulary = make_catalogue(args.diseases, args.symptoms, rng)
+    reports = make_reports(catalogue, vocabulary, args.reports, rng)
+
+    start = time.perf_counter()
+    matcher = SymptomMatcher(catalogue)
+    build_seconds = time.perf_counter() - start
+    tracemalloc.start()
+    SymptomMatcher(catalogue)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for report in reports[:args.scan_reports]:
+        scan_identify(catalogue, report)
+    scan_rate = args.scan_reports / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    rankings = list(matcher.rank_many(reports))
+    match_rate = len(reports) / (time.perf_counter() - start)
+
+    print(f"{len(catalogue)} diseases, {len(matcher.symptoms)} symptoms, {len(matcher.goto)} automaton states")
+    print(f"build: {build_seconds:.2f}s, {build_peak / 2**20:.0f} MiB peak")
+    print(f"{'substring scan':<16} {scan_rate:>10,.1f} reports/s")
+    print(f"{'SymptomMatcher':<16} {match_rate:>10,.1f} reports/s  ({match_rate / scan_rate:,.0f}x)")
+    print(f"average diseases per report: {sum(map(len, rankings)) / len(rankings):.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Bulk import and export of the hospital's entity files.
+
+Rows use the layout of the entity file itself: "id,field,field,..." in the
+column order of patients.txt, doctors.txt and so on (medicines: id,name,price).
+JSON Lines files hold one object per row with "id" and the column names of
+the records (see records.py) instead.
+
+    python bulk.py import patients new_patients.csv [--batch-size 5000] [--rejects rejects.csv]
+    python bulk.py import appointments bookings.jsonl --allow-past
+    python bulk.py export doctors doctors.jsonl
+
+Every row is checked with the same rules as the menus (ages, phone numbers,
+prices, appointment dates and times, room types...), IDs already stored or
+seen earlier in the input are rejected, and appointments must not overlap the
+doctor's other bookings. Accepted rows are committed in batches, each batch
+as one journal write (or one SQLite transaction). HOSPITAL_DB selects the
+SQLite database, as for a.py.
+"""
+import argparse
+import csv
+import json
+import os
+import time
+from datetime import datetime
+
+from a import HospitalManagementSystem
+from metrics import timed
+from records import parse_date, parse_time
+from rooms import ROOM_TYPES
+from scheduler import DEFAULT_DURATION
+from storage import TABLES, SQLiteStorage
+
+ENTITIES = {table.name: filename for filename, table in TABLES.items()}
+
+# Trailing columns a record may go without
+OPTIONAL_COLUMNS = {"appointments": 1, "rooms": 1, "ambulances": 1}
+
+
+def read_rows(path, table):
+    """ Yield (line number, key, fields) per row of a CSV or JSON Lines file; fields is a string for a bad row. """
+    if path.endswith(".jsonl"):
+        with open(path) as file:
+            for number, line in enumerate(file, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError:
+                    yield number, None, "invalid JSON"
+                    continue
+                if not isinstance(row, dict) or "id" not in row:
+                    yield number, None, "missing id"
+                    continue
+                fields = [row.get(column) for column in table.columns]
+                while fields and fields[-1] is None:
+                    fields.pop()
+                yield number, str(row["id"]), ["" if field is None else str(field) for field in fields]
+    else:
+        with open(path, newline="") as file:
+            for number, row in enumerate(csv.reader(file), 1):
+                if row:
+                    yield number, row[0], row[1:]
+
+
+def check_row(hospital, table, key, fields, allow_past=False):
+    """ Why a row cannot be imported, or None if it can. """
+    required = len(table.columns) - OPTIONAL_COLUMNS.get(table.name, 0)
+    if not key:
+        return "missing id"
+    if not required <= len(fields) <= len(table.columns):
+        expected = str(required) if required == len(table.columns) else f"{required} to {len(table.columns)}"
+        return f"expected {expected} fields, got {len(fields)}"
+    if any("," in field or "\n" in field for field in [key, *fields]):
+        return "fields cannot contain commas or line breaks"
+
+    name = table.name
+    if name == "patients":
+        if not hospital.is_valid_age(fields[1]):
+            return "Invalid age! Age must be a number between 1 and 99."
+    elif name in ("doctors", "staff"):
+        if not hospital.is_valid_contact(fields[2]):
+            return "Invalid phone number! It should be 10 digits and start with 9, 8, 7, or 6."
+    elif name == "medicines":
+        try:
+            if not hospital.is_valid_price(float(fields[1])):
+                return "Price must be a positive number!"
+        except ValueError:
+            return "Invalid price! Please enter a valid number."
+    elif name == "appointments":
+        patient_id, doctor_id, date, time_str = fields[:4]
+        if patient_id not in hospital.patients:
+            return "Patient not found!"
+        if doctor_id not in hospital.doctors:
+            return "Doctor not found!"
+        if allow_past:
+            try:
+                datetime.strptime(date, "%Y-%m-%d")
+            except ValueError:
+                return "Invalid date format. Please use YYYY-MM-DD."
+        else:
+            error = hospital.date_error(date)
+            if error:
+                return error
+        if not hospital.is_valid_24_hour_time(time_str):
+            return "Invalid time! Please enter a valid 24-hour format time (HH:MM)."
+        duration = fields[4] if len(fields) > 4 and fields[4] else None
+        if duration is not None and not (duration.isdigit() and hospital.is_valid_duration(int(duration))):
+            return "Invalid duration! Enter a number of minutes between 1 and 480."
+        duration = int(duration) if duration else DEFAULT_DURATION
+        # A replaced booking cannot conflict with the slot it is moving out of
+        if hospital.is_appointment_conflict(doctor_id, parse_date(date), parse_time(time_str), duration, ignore=key):
+            return "Conflict! Doctor is already booked at that time."
+    elif name == "rooms":
+        if fields[1] not in ROOM_TYPES.values():
+            return f"Invalid room type {fields[1]!r}"
+        if fields[3] not in ("Available", "Occupied"):
+            return "Invalid status! Rooms are Available or Occupied."
+        if (fields[3] == "Occupied") != (len(fields) > 4 and bool(fields[4])):
+            return "Occupied rooms, and only those, need a patient ID."
+    elif name == "ambulances":
+        if fields[1] not in ("Available", "Booked"):
+            return "Invalid status! Ambulances are Available or Booked."
+        if len(fields) > 2 and fields[2] and not fields[2].lstrip("-").isdigit():
+            return "Invalid zone! Zones are numbers."
+    return None
+
+
+class ImportReport:
+    def __init__(self):
+        self.accepted = 0
+        self.rejected = 0
+        self.reasons = {}
+        self.seconds = 0.0
+
+    def reject(self, reason):
+        self.rejected += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+
+    @property
+    def rows_per_second(self):
+        return (self.accepted + self.rejected) / self.seconds if self.seconds else 0.0
+
+
+@timed
+def import_rows(hospital, entity, path, batch_size=5000, replace=False, allow_past=False, rejects=None):
+    """ Import a CSV or JSON Lines file into an entity; returns an ImportReport.
+
+    rejects, if given, is a csv.writer that gets (line, id, reason) for every
+    rejected row.
+    """
+    filename = ENTITIES[entity]
+    table = TABLES[filename]
+    data = getattr(hospital, entity)
+    report = ImportReport()
+    seen = set()
+    start = time.perf_counter()
+    rows = read_rows(path, table)
+    exhausted = False
+    while not exhausted:
+        batch = []
+        with hospital.storage.transaction():
+            for number, key, fields in rows:
+                if isinstance(fields, str):
+                    reason = fields
+                elif key in seen:
+                    reason = "duplicate ID in input"
+                elif key in data and not replace:
+                    reason = "ID already exists"
+                else:
+                    reason = check_row(hospital, table, key, fields, allow_past)
+                if reason is None:
+                    try:
+                        value = table.record.from_fields(fields)
+                    except ValueError:
+                        reason = "Invalid field value"
+                if reason is not None:
+                    report.reject(reason)
+                    if rejects is not None:
+                        rejects.writerow([number, key, reason])
+                    continue
+
+                seen.add(key)
+                if entity == "appointments" and key in data:
+                    hospital.scheduler.remove(key, data[key])
+                data[key] = value
+                if entity == "appointments":
+                    # Later rows of the same import are checked against this one
+                    hospital.scheduler.add(key, data[key])
+                batch.append(key)
+                if len(batch) >= batch_size:
+                    break
+            else:
+                exhausted = True
+            hospital.save_records(data, filename, batch)
+        report.accepted += len(batch)
+    report.seconds = time.perf_counter() - start
+
+    # The allocators were built from the old data; let them rebuild on next use
+    if entity == "rooms":
+        hospital.room_allocator.free = None
+    elif entity == "ambulances":
+        hospital.ambulance_dispatcher.free = None
+    return report
+
+
+@timed
+def export_rows(hospital, entity, path):
+    """ Write an entity to a CSV or JSON Lines file, streaming; returns the number of rows. """
+    filename = ENTITIES[entity]
+    table = TABLES[filename]
+    data = getattr(hospital, entity)
+    count = 0
+    with open(path, "w", newline="") as file:
+        for key, value in data.items():
+            fields = value.to_fields()
+            if path.endswith(".jsonl"):
+                row = {"id": key, **dict(zip(table.columns, fields))}
+                file.write(json.dumps(row) + "\n")
+            else:
+                file.write(",".join([key, *fields]) + "\n")
+            count += 1
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk import and export of the hospital entity files")
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('entity', choices=sorted(ENTITIES))
+    parser.add_argument('path', help="a .csv file in the entity file layout, or a .jsonl file")
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--replace', action='store_true', help="overwrite records whose ID already exists")
+    parser.add_argument('--allow-past', action='store_true', help="accept appointments dated in the past")
+    parser.add_argument('--rejects', help="write rejected rows (line, id, reason) to this CSV file")
+    args = parser.parse_args()
+
+    database = os.environ.get("HOSPITAL_DB")
+    hospital = HospitalManagementSystem(SQLiteStorage(database) if database else None)
+    try:
+        if args.command == 'export':
+            start = time.perf_counter()
+            count = export_rows(hospital, args.entity, args.path)
+            seconds = time.perf_counter() - start
+            print(f"Exported {count} {args.entity} to {args.path} in {seconds:.1f}s")
+            return
+
+        rejects_file = open(args.rejects, "w", newline="") if args.rejects else None
+        try:
+            rejects = csv.writer(rejects_file) if rejects_file else None
+            report = import_rows(hospital, args.entity, args.path, args.batch_size, args.replace,
+                                 args.allow_past, rejects)
+        finally:
+            if rejects_file:
+                rejects_file.close()
+        print(f"Imported {report.accepted} {args.entity}, rejected {report.rejected} rows "
+              f"in {report.seconds:.1f}s ({report.rows_per_second:,.0f} rows/s)")
+        for reason, count in sorted(report.reasons.items(), key=lambda item: -item[1]):
+            print(f"  {count:>8}  {reason}")
+    finally:
+        hospital.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import replace
+
+from metrics import METRICS
+from records import AmbulanceStatus
+
+LONGEST_IDLE = "longest-idle"
+NEAREST = "nearest"
+
+
+class Call:
+    """ One ambulance request; ambulance_id stays None while the call waits in the queue. """
+
+    def __init__(self, call_id, zone, received_at):
+        self.call_id = call_id
+        self.zone = zone
+        self.received_at = received_at
+        self.ambulance_id = None
+        self.assigned_at = None
+
+    @property
+    def wait(self):
+        return None if self.assigned_at is None else self.assigned_at - self.received_at
+
+
+class AmbulanceDispatcher:
+    """ Available ambulances in priority order, and the calls waiting for one.
+
+    With the longest-idle policy every available ambulance sits in one heap
+    ordered by when it became free. With the nearest policy there is such a
+    heap per zone, and a call takes the longest idle ambulance of the zone
+    closest to its own (zones are numbered along a line; ambulances without a
+    zone come last). A call that finds no ambulance waits in a FIFO and gets
+    the next one that is returned.
+
+    Every claim is a check-and-set on the ambulance's status under one lock:
+    an ambulance is only handed out if it is still "Available", so two
+    simultaneous calls never get the same vehicle. Heap entries of
+    ambulances changed elsewhere are recognised as stale and skipped.
+    """
+
+    def __init__(self, ambulances, policy=LONGEST_IDLE, clock=time.monotonic):
+        self.ambulances = ambulances
+        self.policy = policy
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.pending = deque()
+        self.free = None
+        self.zones = []
+        self.entries = {}
+        self._sequence = itertools.count()
+        self._call_ids = itertools.count(1)
+        self.stats = {"calls": 0, "dispatched": 0, "queued": 0, "served_from_queue": 0, "max_queue": 0}
+
+    def build(self):
+        self.free, self.entries = {}, {}
+        now = self.clock()
+        for ambulance_id, info in self.ambulances.items():
+            if info.status == AmbulanceStatus.AVAILABLE:
+                self._push(ambulance_id, info, now)
+        METRICS.count(records_scanned=len(self.ambulances))
+
+    def ensure_built(self):
+        if self.free is None:
+            self.build()
+
+    def _heap_key(self, info):
+        return info.zone if self.policy == NEAREST else None
+
+    def _push(self, ambulance_id, info, idle_since):
+        entry = (idle_since, next(self._sequence), ambulance_id)
+        self.entries[ambulance_id] = entry
+        key = self._heap_key(info)
+        if key not in self.free:
+            self.free[key] = []
+            if key is not None:
+                self.zones = sorted(zone for zone in self.free if zone is not None)
+        heapq.heappush(self.free[key], entry)
+
+    def _top(self, key):
+        """ The current entry at the top of a heap, dropping stale ones. """
+        heap = self.free.get(key)
+        while heap:
+            entry = heap[0]
+            ambulance_id = entry[2]
+            info = self.ambulances.get(ambulance_id)
+            if (self.entries.get(ambulance_id) is entry and info is not None
+                    and info.status == AmbulanceStatus.AVAILABLE):
+                return entry
+            heapq.heappop(heap)
+            if self.entries.get(ambulance_id) is entry:
+                del self.entries[ambulance_id]
+        return None
+
+    def _zones_by_distance(self, zone):
+        """ Yield the zones in order of distance from a zone, equally distant ones together. """
+        right = bisect.bisect_left(self.zones, zone)
+        left = right - 1
+        while left >= 0 or right < len(self.zones):
+            distance = min(zone - self.zones[left] if left >= 0 else float("inf"),
+                           self.zones[right] - zone if right < len(self.zones) else float("inf"))
+            group = []
+            while left >= 0 and zone - self.zones[left] == distance:
+                group.append(self.zones[left])
+                left -= 1
+            while right < len(self.zones) and self.zones[right] - zone == distance:
+                group.append(self.zones[right])
+                right += 1
+            yield group
+
+    def _candidate(self, zone):
+        """ The key of the heap to dispatch a call in a zone from, or False if no ambulance is free. """
+        if self.policy == NEAREST and self.zones:
+            groups = [self.zones] if zone is None else self._zones_by_distance(zone)
+            for group in groups:
+                # Among equally near zones the longest idle ambulance wins
+                tops = [(entry, key) for key in group for entry in [self._top(key)] if entry]
+                if tops:
+                    return min(tops)[1]
+        return None if self._top(None) else False
+
+    def _claim(self, key):
+        """ Check-and-set the status of the ambulance at the top of a heap; returns its ID. """
+        entry = heapq.heappop(self.free[key])
+        ambulance_id = entry[2]
+        del self.entries[ambulance_id]
+        self.ambulances[ambulance_id] = replace(self.ambulances[ambulance_id], status=AmbulanceStatus.BOOKED)
+        return ambulance_id
+
+    def request(self, zone=None):
+        """ Dispatch an ambulance to a new call, or queue the call; returns the Call. """
+        with self.lock:
+            self.ensure_built()
+            now = self.clock()
+            call = Call(next(self._call_ids), zone, now)
+            self.stats["calls"] += 1
+            key = self._candidate(zone) if not self.pending else False
+            if key is False:
+                self.pending.append(call)
+                self.stats["queued"] += 1
+                self.stats["max_queue"] = max(self.stats["max_queue"], len(self.pending))
+            else:
+                call.ambulance_id = self._claim(key)
+                call.assigned_at = now
+                self.stats["dispatched"] += 1
+            return call
+
+    def release(self, ambulance_id):
+        """ An ambulance is back; it goes to the oldest waiting call, or becomes available.
+
+        Returns the call it was sent to, or None. Raises KeyError for an
+        unknown ambulance and ValueError if it was not booked.
+        """
+        with self.lock:
+            self.ensure_built()
+            info = self.ambulances[ambulance_id]
+            if info.status != AmbulanceStatus.BOOKED:
+                raise ValueError(f"Ambulance {ambulance_id} is not booked")
+            if self.pending:
+                return self._serve_pending(ambulance_id)
+            self.ambulances[ambulance_id] = replace(info, status=AmbulanceStatus.AVAILABLE)
+            self._push(ambulance_id, self.ambulances[ambulance_id], self.clock())
+            return None
+
+    def refresh(self, ambulance_id):
+        """ Pick up an ambulance added, edited or deleted outside the dispatcher.
+
+        An ambulance that is now available goes to the oldest waiting call,
+        which is returned; otherwise returns None.
+        """
+        with self.lock:
+            if self.free is None:
+                return None
+            info = self.ambulances.get(ambulance_id)
+            entry = self.entries.pop(ambulance_id, None)
+            if info is None or info.status != AmbulanceStatus.AVAILABLE:
+                return None
+            if self.pending:
+                self.ambulances[ambulance_id] = replace(info, status=AmbulanceStatus.BOOKED)
+                return self._serve_pending(ambulance_id)
+            # An ambulance that was already free keeps its place in the idle order
+            self._push(ambulance_id, info, entry[0] if entry else self.clock())
+            return None
+
+    def _serve_pending(self, ambulance_id):
+        call = self.pending.popleft()
+        call.ambulance_id = ambulance_id
+        call.assigned_at = self.clock()
+        self.stats["served_from_queue"] += 1
+        return call
+
+    def position(self, call_id):
+        """ 1-based place of a waiting call in the queue, or None if it is not waiting. """
+        with self.lock:
+            for position, call in enumerate(self.pending, 1):
+                if call.call_id == call_id:
+                    return position
+        return None
@@ -0,0 +1,163 @@
+"""Generate a synthetic hospital: patients, doctors, bookings, rooms and the rest.
+
+The same counts, seed and start date always give the same records. Every
+record passes the checks of the menus and of bulk.py: ages 1-99, valid
+phone numbers, appointments inside opening hours that never overlap the
+doctor's other bookings, each occupied room held by a different patient.
+
+    python generate.py [--patients 1000] [--doctors 50] [--appointments 5000] [--seed 0] [--dir .]
+    python generate.py --patients 1000000 --appointments 1000000 --db hospital.db
+
+Existing entity files (or tables) are only replaced with --force.
+"""
+import argparse
+import os
+import random
+from datetime import date, timedelta
+
+from records import (Ambulance, AmbulanceStatus, Appointment, Doctor, Medicine, Patient, Room, RoomStatus, Staff,
+                     parse_date)
+from rooms import ROOM_TYPES
+from scheduler import to_time
+from storage import TABLES, SQLiteStorage, TextFileStorage
+
+DEFAULT_COUNTS = {"patients": 1000, "doctors": 50, "appointments": 5000, "rooms": 200, "ambulances": 20,
+                  "staff": 100, "medicines": 200}
+
+FIRST_NAMES = ["Aarav", "Diya", "Ishaan", "Ananya", "Vihaan", "Saanvi", "Arjun", "Meera", "Kabir", "Priya",
+               "Rohan", "Kavya", "Aditya", "Nisha", "Rahul", "Sneha", "Vikram", "Pooja", "Karan", "Riya"]
+LAST_NAMES = ["Sharma", "Patel", "Iyer", "Reddy", "Gupta", "Nair", "Singh", "Das", "Mehta", "Rao",
+              "Joshi", "Kulkarni", "Bose", "Khan", "Menon", "Verma", "Pillai", "Chopra", "Sethi", "Desai"]
+# The diseases of symptoms.txt
+DISEASES = ["Flu", "Cold", "Diabetes", "Hypertension", "Dengue", "Asthma", "Food Poisoning", "Chickenpox",
+            "Anemia", "Migraine"]
+SPECIALTIES = ["Cardiology", "Neurology", "Orthopedics", "Pediatrics", "Gynecology", "Dermatology",
+               "General Medicine", "ENT", "Ophthalmology", "Psychiatry"]
+ROLES = ["Nurse", "Nurse", "Nurse", "Technician", "Receptionist", "Pharmacist", "Cleaner"]
+MEDICINES = ["Paracetamol", "Ibuprofen", "Amoxicillin", "Metformin", "Amlodipine", "Cetirizine", "Omeprazole",
+             "Salbutamol", "Azithromycin", "Atorvastatin"]
+# Share of the rooms of each type
+ROOM_MIX = {"General": 50, "Semi-Private": 25, "Private": 15, "DELUX": 10}
+ROOMS_PER_FLOOR = 20
+# Booking lengths in minutes, and how often they occur
+DURATIONS = [15, 30, 30, 30, 45, 60]
+OPEN_MINUTES, CLOSE_MINUTES = 9 * 60, 17 * 60
+
+
+def person(rng):
+    return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+
+
+def contact(rng):
+    return f"{rng.choice('9876')}{rng.randrange(10 ** 9):09d}"
+
+
+def generate_appointments(rng, n_appointments, patient_ids, doctor_ids, start, days):
+    """ Bookings spread over the doctors and days, each after the doctor's previous one that day. """
+    if n_appointments and not (patient_ids and doctor_ids):
+        raise ValueError("Appointments need at least one patient and one doctor")
+    appointments = {}
+    # The end of the last booking per (doctor, day)
+    booked_until = {}
+    attempts = 0
+    while len(appointments) < n_appointments:
+        attempts += 1
+        if attempts > 20 * n_appointments + 1000:
+            raise ValueError(f"{n_appointments} appointments do not fit {len(doctor_ids)} doctors over {days} days")
+        doctor_id = rng.choice(doctor_ids)
+        day = start + timedelta(days=rng.randrange(days))
+        begin = booked_until.get((doctor_id, day), OPEN_MINUTES) + rng.choice((0, 0, 15, 30))
+        duration = rng.choice(DURATIONS)
+        if begin + duration > CLOSE_MINUTES:
+            continue
+        booked_until[doctor_id, day] = begin + duration
+        patient_id = rng.choice(patient_ids)
+        time = to_time(begin)
+        appointments[f"{patient_id}{doctor_id}{day}_{time:%H:%M}"] = Appointment(patient_id, doctor_id, day, time,
+                                                                                  duration)
+    return appointments
+
+
+def generate_rooms(rng, n_rooms, patient_ids, occupancy):
+    types = rng.choices(list(ROOM_MIX), weights=list(ROOM_MIX.values()), k=n_rooms)
+    occupied = rng.sample(range(n_rooms), min(round(n_rooms * occupancy), len(patient_ids)))
+    patients = dict(zip(occupied, rng.sample(patient_ids, len(occupied))))
+    rooms = {}
+    for i, room_type in enumerate(types):
+        floor = str(i // ROOMS_PER_FLOOR + 1)
+        patient_id = patients.get(i)
+        status = RoomStatus.AVAILABLE if patient_id is None else RoomStatus.OCCUPIED
+        rooms[f"R{i + 1:05d}"] = Room(floor, room_type, f"Floor {floor}", status, patient_id)
+    return rooms
+
+
+def generate(counts=None, seed=0, start=None, days=90, occupancy=0.6, zones=20):
+    """ {filename: {key: record}} for a hospital with the given number of each entity.
+
+    counts maps entity names (patients, doctors, ...) to how many to make,
+    defaulting to DEFAULT_COUNTS. Appointments fall on the `days` days from
+    `start` (today by default); `occupancy` is the share of occupied rooms.
+    """
+    counts = {**DEFAULT_COUNTS, **(counts or {})}
+    start = start or date.today()
+    rng = random.Random(seed)
+    patients = {f"P{i}": Patient(person(rng), rng.randint(1, 99), rng.choice(DISEASES))
+                for i in range(1, counts["patients"] + 1)}
+    doctors = {f"D{i}": Doctor(f"Dr. {person(rng)}", rng.choice(SPECIALTIES), contact(rng))
+               for i in range(1, counts["doctors"] + 1)}
+    patient_ids, doctor_ids = list(patients), list(doctors)
+    data = {
+        "patients.txt": patients,
+        "doctors.txt": doctors,
+        "appointments.txt": generate_appointments(rng, counts["appointments"], patient_ids, doctor_ids, start, days),
+        "rooms.txt": generate_rooms(rng, counts["rooms"], patient_ids, occupancy),
+        "ambulances.txt": {f"AMB{i}": Ambulance(person(rng), AmbulanceStatus.AVAILABLE, rng.randrange(zones))
+                           for i in range(1, counts["ambulances"] + 1)},
+        "staff.txt": {f"S{i}": Staff(person(rng), rng.choice(ROLES), contact(rng))
+                      for i in range(1, counts["staff"] + 1)},
+        "medicines.txt": {f"M{i}": Medicine(f"{rng.choice(MEDICINES)} {rng.choice((5, 10, 250, 500))}mg",
+                                            rng.randrange(100, 50000) / 100)
+                          for i in range(1, counts["medicines"] + 1)},
+    }
+    return data
+
+
+def write(storage, data):
+    """ Replace the stored entities with generated ones. """
+    for filename, records in data.items():
+        storage.save(records, filename)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    for entity, count in DEFAULT_COUNTS.items():
+        parser.add_argument(f'--{entity}', type=int, default=count)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--start', type=parse_date, help="first day of the bookings, YYYY-MM-DD (default today)")
+    parser.add_argument('--days', type=int, default=90, help="days the bookings are spread over")
+    parser.add_argument('--occupancy', type=float, default=0.6, help="share of the rooms occupied")
+    parser.add_argument('--dir', default=".", help="where the .txt files go")
+    parser.add_argument('--db', help="write a SQLite database instead of the .txt files")
+    parser.add_argument('--force', action='store_true', help="replace existing data")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    os.chdir(args.dir)
+    if args.db:
+        storage = SQLiteStorage(args.db)
+        existing = [table.name for filename, table in TABLES.items() if len(storage.load(filename))]
+    else:
+        storage = TextFileStorage()
+        existing = [filename for filename in TABLES if os.path.exists(filename)]
+    if existing and not args.force:
+        parser.error(f"{', '.join(existing)} already hold data in {os.path.abspath(args.dir)}; use --force")
+
+    counts = {entity: getattr(args, entity) for entity in DEFAULT_COUNTS}
+    data = generate(counts, args.seed, args.start, args.days, args.occupancy)
+    write(storage, data)
+    storage.close()
+    print(", ".join(f"{len(records)} {TABLES[filename].name}" for filename, records in data.items()))
+
+
+if __name__ == '__main__':
+    main()
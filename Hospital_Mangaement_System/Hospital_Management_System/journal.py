@@ -0,0 +1,96 @@
+import os
+import time
+
+
+class Journal:
+    """ Append-only log of the changes made to one entity file since its last snapshot.
+
+    Every line is "U,<record line>" for an insert or update and "D,<key>" for a
+    delete, so replaying the journal over the snapshot in order rebuilds the
+    current data. A line without its trailing newline was cut off by a crash
+    and is ignored.
+
+    Appends are flushed right away; fsync is batched: it runs after every
+    `fsync_every` records or once `fsync_interval` seconds have passed since
+    the last one (fsync_every=0 leaves syncing to the OS).
+    """
+
+    def __init__(self, path, fsync_every=1, fsync_interval=None):
+        self.path = path
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+        self.records = 0
+        self.bytes_written = 0
+        self._file = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def read(self):
+        """ Yield (op, line) for every complete record in the journal. """
+        self.records = 0
+        if not os.path.exists(self.path):
+            return
+        valid_bytes = 0
+        with open(self.path, "rb") as file:
+            for raw_line in file:
+                if not raw_line.endswith(b"\n"):
+                    break
+                valid_bytes += len(raw_line)
+                op, _, record = raw_line.decode().rstrip("\r\n").partition(",")
+                if op in ("U", "D") and record:
+                    self.records += 1
+                    yield op, record
+        # Cut off a torn last record so the next append starts on a new line
+        if valid_bytes < os.path.getsize(self.path):
+            with open(self.path, "r+b") as file:
+                file.truncate(valid_bytes)
+
+    def append(self, op, record):
+        if self._file is None:
+            self._file = open(self.path, "a")
+        line = f"{op},{record}\n"
+        self._file.write(line)
+        self._file.flush()
+        self.records += 1
+        self.bytes_written += len(line)
+        self._unsynced += 1
+        if self.fsync_every and (self._unsynced >= self.fsync_every or self._interval_elapsed()):
+            self.sync()
+
+    def append_many(self, records):
+        """ Append (op, record) pairs with one write and at most one fsync. """
+        if self._file is None:
+            self._file = open(self.path, "a")
+        lines = "".join(f"{op},{record}\n" for op, record in records)
+        if not lines:
+            return
+        self._file.write(lines)
+        self._file.flush()
+        count = lines.count("\n")
+        self.records += count
+        self.bytes_written += len(lines)
+        self._unsynced += count
+        if self.fsync_every:
+            self.sync()
+
+    def _interval_elapsed(self):
+        return self.fsync_interval is not None and time.monotonic() - self._last_sync >= self.fsync_interval
+
+    def sync(self):
+        if self._file is not None and self._unsynced:
+            os.fsync(self._file.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def truncate(self):
+        """ Drop all records; called once they are part of a new snapshot. """
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.records = 0
+
+    def close(self):
+        if self._file is not None:
+            self.sync()
+            self._file.close()
+            self._file = None
@@ -0,0 +1,195 @@
+"""Typed records of the hospital's entities.
+
+The storage backends parse every row of an entity file into one of these
+when it is loaded, so the rest of the system reads named fields of the
+right type: ages, durations and zones are ints, prices floats, appointment
+dates and times datetime.date and datetime.time, and room and ambulance
+statuses enums. Records are slotted dataclasses; a record holds its fields
+and nothing else, and columns with few distinct values (diseases, room
+types, dates...) share one object per value. See benchmarks/bench_records.py
+for the bytes per record against the lists of strings they replace.
+
+Like those lists, records are replaced and never edited in place
+(dataclasses.replace), so the indexes of IndexedDict and the SQLite tables
+see every change.
+"""
+import sys
+import types
+from dataclasses import dataclass, field, fields
+from datetime import date, datetime, time
+from enum import Enum
+from functools import lru_cache
+
+# Field metadata for columns with few distinct values, stored once per value
+SHARED = {"shared": True}
+
+
+class Status(str, Enum):
+    """ An enum whose members compare equal to, and print as, their stored text. """
+
+    def __str__(self):
+        return self.value
+
+
+class RoomStatus(Status):
+    AVAILABLE = "Available"
+    OCCUPIED = "Occupied"
+
+
+class AmbulanceStatus(Status):
+    AVAILABLE = "Available"
+    BOOKED = "Booked"
+
+
+@lru_cache(maxsize=None)
+def parse_date(text):
+    """ A YYYY-MM-DD date; equal dates share one object. """
+    return datetime.strptime(text, "%Y-%m-%d").date()
+
+
+@lru_cache(maxsize=None)
+def parse_time(text):
+    """ An HH:MM time; equal times share one object. """
+    return datetime.strptime(text, "%H:%M").time()
+
+
+def format_time(value):
+    return f"{value:%H:%M}"
+
+
+PARSERS = {str: str, int: int, float: float, date: parse_date, time: parse_time}
+FORMATTERS = {date: date.isoformat, time: format_time}
+SQL_TYPES = {int: "INTEGER", float: "REAL"}
+
+
+class Record:
+    """ Base of the record classes: parsing from and formatting to the stored fields.
+
+    Stored fields are strings in the entity files, in column order, with
+    trailing empty ones left out; an empty field is None for optional
+    columns. Subclasses are made with @record.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_fields(cls, values):
+        """ A record from its stored fields (SQLite values will do); ValueError if one does not parse. """
+        if len(values) > len(cls.columns):
+            raise ValueError(f"{cls.__name__} has {len(cls.columns)} fields, got {len(values)}")
+        args = []
+        for (parse, missing), value in zip(cls.parsers, values):
+            args.append(parse(value) if value is not None and value != "" else missing(value))
+        for parse, missing in cls.parsers[len(values):]:
+            args.append(missing(None))
+        return cls(*args)
+
+    @classmethod
+    def parse_field(cls, column, text):
+        """ The typed value of one column from its text; ValueError if it does not parse. """
+        parse, missing = cls.parsers[cls.columns.index(column)]
+        return parse(text) if text != "" else missing(text)
+
+    @classmethod
+    def format_field(cls, column, value):
+        """ The stored text of one column's value, None for a missing one. """
+        return None if value is None else cls.formatters[column](value)
+
+    def stored(self):
+        """ The stored fields, None for missing ones. """
+        return [None if value is None else formatter(value)
+                for formatter, value in zip(self.formatters.values(), self.values())]
+
+    def to_fields(self):
+        """ The stored fields as in the entity files, trailing empty ones left out. """
+        values = ["" if value is None else value for value in self.stored()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def values(self):
+        return [getattr(self, column) for column in self.columns]
+
+
+def _missing(column, kind, optional):
+    """ What an empty stored field becomes: None, "", or an error. """
+    if optional:
+        return lambda value: None
+    if kind is str:
+        return lambda value: ""
+
+    def missing(value):
+        raise ValueError(f"{column} is required")
+    return missing
+
+
+def record(cls):
+    """ Make a Record subclass a slotted dataclass and work out how to parse and format its columns. """
+    cls = dataclass(slots=True)(cls)
+    cls.columns = [column.name for column in fields(cls)]
+    cls.parsers, cls.formatters, cls.column_types, cls.kinds = [], {}, {}, {}
+    for column in fields(cls):
+        kind, optional = column.type, False
+        if isinstance(kind, types.UnionType):
+            kind, optional = next(arg for arg in kind.__args__ if arg is not type(None)), True
+        parse = sys.intern if column.metadata.get("shared") else PARSERS.get(kind, kind)
+        cls.parsers.append((parse, _missing(column.name, kind, optional)))
+        cls.formatters[column.name] = FORMATTERS.get(kind, str)
+        cls.column_types[column.name] = SQL_TYPES.get(kind, "TEXT")
+        cls.kinds[column.name] = kind
+    return cls
+
+
+@record
+class Patient(Record):
+    name: str
+    age: int
+    disease: str = field(metadata=SHARED)
+
+
+@record
+class Doctor(Record):
+    name: str
+    specialty: str = field(metadata=SHARED)
+    contact: str
+
+
+@record
+class Appointment(Record):
+    patient_id: str = field(metadata=SHARED)
+    doctor_id: str = field(metadata=SHARED)
+    date: date
+    time: time
+    # Minutes; added later, so older records go without it
+    duration: int | None = None
+
+
+@record
+class Staff(Record):
+    name: str
+    role: str = field(metadata=SHARED)
+    contact: str
+
+
+@record
+class Room(Record):
+    floor: str = field(metadata=SHARED)
+    type: str = field(metadata=SHARED)
+    location: str = field(metadata=SHARED)
+    status: RoomStatus
+    # Only set while the room is occupied
+    patient_id: str | None = None
+
+
+@record
+class Ambulance(Record):
+    driver: str
+    status: AmbulanceStatus
+    # Added for dispatching to the nearest ambulance; older records go without it
+    zone: int | None = None
+
+
+@record
+class Medicine(Record):
+    name: str
+    price: float
@@ -0,0 +1,85 @@
+import heapq
+from dataclasses import replace
+
+from metrics import METRICS
+from records import RoomStatus
+
+# Menu choice -> room type, as stored in rooms.txt
+ROOM_TYPES = {
+    "1": "General",
+    "2": "Semi-Private",
+    "3": "Private",
+    "4": "DELUX",
+}
+
+
+def floor_key(floor):
+    """ Sort key putting numeric floors in numeric order, lowest first. """
+    return (0, int(floor), "") if floor.isdigit() else (1, 0, floor)
+
+
+class RoomAllocator:
+    """ Free rooms per type in a heap ordered by floor and room ID, plus a patient -> room map.
+
+    Allotting pops the lowest free room of a type and releasing pushes it
+    back, both O(log n). Heap entries are checked against the rooms mapping
+    when popped, so a room changed behind the allocator's back is skipped
+    rather than handed out twice. Built on first use.
+    """
+
+    def __init__(self, rooms):
+        self.rooms = rooms
+        self.free = None
+        self.patient_rooms = None
+
+    def build(self):
+        self.free = {}
+        self.patient_rooms = {}
+        for room_id, info in self.rooms.items():
+            if info.status == RoomStatus.AVAILABLE:
+                self.free.setdefault(info.type, []).append((floor_key(info.floor), room_id))
+            elif info.patient_id is not None:
+                self.patient_rooms[info.patient_id] = room_id
+        for heap in self.free.values():
+            heapq.heapify(heap)
+        METRICS.count(records_scanned=len(self.rooms))
+
+    def ensure_built(self):
+        if self.free is None:
+            self.build()
+
+    def room_of(self, patient_id):
+        """ The room the patient occupies, or None. """
+        self.ensure_built()
+        room_id = self.patient_rooms.get(patient_id)
+        if room_id is not None:
+            info = self.rooms.get(room_id)
+            if info is None or info.patient_id != patient_id:
+                del self.patient_rooms[patient_id]
+                return None
+        return room_id
+
+    def allot(self, room_type, patient_id):
+        """ Occupy the first free room of a type for the patient; returns its ID or None. """
+        self.ensure_built()
+        heap = self.free.get(room_type)
+        while heap:
+            _, room_id = heapq.heappop(heap)
+            info = self.rooms.get(room_id)
+            if info is not None and info.type == room_type and info.status == RoomStatus.AVAILABLE:
+                self.rooms[room_id] = replace(info, status=RoomStatus.OCCUPIED, patient_id=patient_id)
+                self.patient_rooms[patient_id] = room_id
+                return room_id
+        return None
+
+    def release(self, room_id):
+        """ Free an occupied room; returns False if it is not occupied. """
+        self.ensure_built()
+        info = self.rooms.get(room_id)
+        if info is None or info.status != RoomStatus.OCCUPIED:
+            return False
+        self.rooms[room_id] = replace(info, status=RoomStatus.AVAILABLE, patient_id=None)
+        if info.patient_id is not None and self.patient_rooms.get(info.patient_id) == room_id:
+            del self.patient_rooms[info.patient_id]
+        heapq.heappush(self.free.setdefault(info.type, []), (floor_key(info.floor), room_id))
+        return True
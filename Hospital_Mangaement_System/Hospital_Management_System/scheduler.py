@@ -0,0 +1,199 @@
+import bisect
+from datetime import time, timedelta
+
+DEFAULT_DURATION = 30  # minutes, for appointments stored without a duration
+MINUTES_PER_DAY = 24 * 60
+
+
+def to_minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def to_time(minutes):
+    return time(minutes // 60, minutes % 60)
+
+
+class DoctorDay:
+    """ The bookings of one doctor on one date.
+
+    Besides every booking's interval it keeps the union of them as two sorted
+    lists of disjoint busy intervals, so an overlap check is two bisects.
+    """
+
+    def __init__(self):
+        self.bookings = {}
+        self.starts = []
+        self.ends = []
+
+    def add(self, appointment_id, start, end):
+        self.bookings[appointment_id] = (start, end)
+        # Busy intervals that overlap or touch [start, end) are merged with it
+        first = bisect.bisect_left(self.ends, start)
+        last = bisect.bisect_right(self.starts, end)
+        if first < last:
+            start = min(start, self.starts[first])
+            end = max(end, self.ends[last - 1])
+        self.starts[first:last] = [start]
+        self.ends[first:last] = [end]
+
+    def remove(self, appointment_id):
+        del self.bookings[appointment_id]
+        bookings = sorted(self.bookings.items(), key=lambda booking: booking[1])
+        self.bookings, self.starts, self.ends = {}, [], []
+        for booking_id, (start, end) in bookings:
+            self.add(booking_id, start, end)
+
+    def without(self, appointment_id):
+        """ A copy of the day with one booking taken out. """
+        day = DoctorDay()
+        for booking_id, (start, end) in sorted(self.bookings.items(), key=lambda booking: booking[1]):
+            if booking_id != appointment_id:
+                day.add(booking_id, start, end)
+        return day
+
+    def overlaps(self, start, end):
+        i = bisect.bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return True
+        return i + 1 < len(self.starts) and self.starts[i + 1] < end
+
+    def gaps(self, open_minutes, close_minutes):
+        """ Yield the free (start, end) intervals between open and close. """
+        free_from = open_minutes
+        for i in range(bisect.bisect_right(self.ends, open_minutes), len(self.starts)):
+            if self.starts[i] >= close_minutes:
+                break
+            if self.starts[i] > free_from:
+                yield free_from, self.starts[i]
+            free_from = max(free_from, self.ends[i])
+        if free_from < close_minutes:
+            yield free_from, close_minutes
+
+
+class Scheduler:
+    """ Appointment intervals per doctor and day, loaded on demand from the appointments.
+
+    load_day(doctor_id, date) returns the (appointment_id, Appointment) pairs
+    of one doctor's day; days are cached once loaded, empty ones included, and
+    kept current through add() and remove(). A booking that runs past midnight
+    also holds the start of the next day, up to its end. Dates and times are
+    datetime.date and datetime.time.
+    Free slots are only suggested within opening hours, on a grid of
+    slot_minutes, and up to horizon_days ahead.
+    """
+
+    def __init__(self, load_day, open_time=time(9), close_time=time(17), slot_minutes=15, horizon_days=365):
+        self.load_day = load_day
+        self.open_minutes = to_minutes(open_time)
+        self.close_minutes = to_minutes(close_time)
+        self.slot_minutes = slot_minutes
+        self.horizon_days = horizon_days
+        self.days = {}
+
+    def interval(self, value):
+        """ (start, end) in minutes of an appointment, or None if its duration is invalid. """
+        start = to_minutes(value.time)
+        duration = value.duration if value.duration is not None else DEFAULT_DURATION
+        if duration <= 0:
+            return None
+        return start, start + duration
+
+    def day(self, doctor_id, date):
+        key = (doctor_id, date)
+        day = self.days.get(key)
+        if day is None:
+            day = DoctorDay()
+            for appointment_id, value in self.load_day(doctor_id, date):
+                interval = self.interval(value)
+                if interval is not None:
+                    day.add(appointment_id, *interval)
+            for appointment_id, (start, end) in self._overnight(doctor_id, date - timedelta(days=1)):
+                day.add(appointment_id, 0, end - MINUTES_PER_DAY)
+            # Empty days are kept too, so searches for free slots do not reload them
+            self.days[key] = day
+        return day
+
+    def _overnight(self, doctor_id, date):
+        """ The (appointment_id, interval) of a doctor's bookings on a date that run past midnight. """
+        day = self.days.get((doctor_id, date))
+        if day is not None:
+            bookings = day.bookings.items()
+        else:
+            bookings = ((appointment_id, self.interval(value)) for appointment_id, value in self.load_day(doctor_id, date))
+        return [(appointment_id, interval) for appointment_id, interval in bookings
+                if interval is not None and interval[1] > MINUTES_PER_DAY]
+
+    def add(self, appointment_id, value):
+        interval = self.interval(value)
+        if interval is None:
+            return
+        # Days not cached yet pick the booking up when day() loads them
+        start, end = interval
+        day = self.days.get((value.doctor_id, value.date))
+        if day is not None:
+            day.add(appointment_id, start, end)
+        if end > MINUTES_PER_DAY:
+            day = self.days.get((value.doctor_id, value.date + timedelta(days=1)))
+            if day is not None:
+                day.add(appointment_id, 0, end - MINUTES_PER_DAY)
+
+    def remove(self, appointment_id, value):
+        for date in (value.date, value.date + timedelta(days=1)):
+            day = self.days.get((value.doctor_id, date))
+            if day is not None and appointment_id in day.bookings:
+                day.remove(appointment_id)
+
+    def is_free(self, doctor_id, date, time, duration=DEFAULT_DURATION, ignore=None):
+        """ True if nothing overlaps [time, time + duration); the booking `ignore` (an ID) does not count. """
+        start = to_minutes(time)
+        end = start + duration
+        if self._overlaps(doctor_id, date, start, end, ignore):
+            return False
+        # The part past midnight must also be free on the next day
+        return end <= MINUTES_PER_DAY or not self._overlaps(doctor_id, date + timedelta(days=1), 0,
+                                                             end - MINUTES_PER_DAY, ignore)
+
+    def _overlaps(self, doctor_id, date, start, end, ignore):
+        day = self.day(doctor_id, date)
+        if ignore in day.bookings:
+            day = day.without(ignore)
+        return day.overlaps(start, end)
+
+    def free_slots(self, doctor_id, after, count=1, duration=DEFAULT_DURATION):
+        """ The first `count` free (date, time) slots of a doctor starting at or after a datetime. """
+        return self._slots(lambda date: self.day(doctor_id, date), after, count, duration)
+
+    def _slots(self, day_on, after, count, duration):
+        slots = []
+        for offset in range(self.horizon_days):
+            date = after.date() + timedelta(days=offset)
+            open_minutes = self.open_minutes
+            if offset == 0:
+                open_minutes = max(open_minutes, after.hour * 60 + after.minute)
+            if open_minutes + duration > self.close_minutes:
+                continue
+            for gap_start, gap_end in day_on(date).gaps(open_minutes, self.close_minutes):
+                # Round up to the slot grid
+                start = -(-gap_start // self.slot_minutes) * self.slot_minutes
+                while start + duration <= gap_end:
+                    slots.append((date, to_time(start)))
+                    if len(slots) == count:
+                        return slots
+                    start += duration
+        return slots
+
+    def earliest_slot(self, doctor_ids, after, duration=DEFAULT_DURATION):
+        """ (doctor_id, date, time) of the earliest free slot among the doctors, or None. """
+        # No doctor can beat the first slot of an empty calendar, so stop at it
+        first_possible = self._slots(lambda date: EMPTY_DAY, after, 1, duration)[:1]
+        best = None
+        for doctor_id in doctor_ids:
+            slots = self.free_slots(doctor_id, after, 1, duration)
+            if slots and (best is None or slots[0] < best[1:]):
+                best = (doctor_id, *slots[0])
+                if slots == first_possible:
+                    break
+        return best
+
+
+EMPTY_DAY = DoctorDay()
@@ -0,0 +1,245 @@
+"""Serve the hospital's front-desk operations to many terminals over HTTP.
+
+One process owns the data: a single HospitalManagementSystem whose dicts (or
+SQLite tables) are the authoritative store, so terminals no longer overwrite
+each other's files. Requests run on a thread each. An operation locks the
+entities it reads and changes - the patient, the doctor, the room type - so
+operations on different entities run concurrently and those on the same
+entity one after the other.
+
+    python service.py [--port 8108] [--db hospital.db]
+
+    POST /patients              {"id", "name", "age", "disease"}
+    GET  /patients/<id>
+    POST /appointments          {"patient_id", "doctor_id", "date", "time", "duration"}
+    POST /rooms/allot           {"patient_id", "room_type"}
+    POST /rooms/<id>/release
+    POST /ambulances/book       {"zone"} (optional)
+    POST /ambulances/<id>/return
+    GET  /calls/<id>            a call that had to wait for an ambulance
+    GET  /metrics               operation latencies and counters (see metrics.py)
+
+Refused operations answer 409 with {"error": message}; an ambulance call that
+has to wait answers 202 with its call_id.
+"""
+import argparse
+import json
+import threading
+import zlib
+from contextlib import ExitStack, contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from a import HospitalError, HospitalManagementSystem
+from metrics import METRICS, timed
+from scheduler import DEFAULT_DURATION
+from storage import TABLES, IndexedDict, SQLiteStorage
+
+
+class StripedLocks:
+    """ A fixed pool of locks that entity keys hash onto.
+
+    hold() takes the locks of several keys in one fixed order, so two
+    operations locking overlapping sets of entities cannot deadlock.
+    """
+
+    def __init__(self, stripes=1024):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+
+    def stripe(self, key):
+        return zlib.crc32(repr(key).encode()) % len(self.locks)
+
+    @contextmanager
+    def hold(self, *keys):
+        with ExitStack() as stack:
+            for stripe in sorted({self.stripe(key) for key in keys}):
+                stack.enter_context(self.locks[stripe])
+            yield
+
+
+class HospitalService:
+    """ Thread-safe front-desk operations over one HospitalManagementSystem. """
+
+    def __init__(self, hospital):
+        self.hospital = hospital
+        self.locks = StripedLocks()
+        # Loaded and built up front; doing it lazily from two threads would race
+        for table in TABLES.values():
+            data = getattr(hospital, table.name)
+            if isinstance(data, IndexedDict):
+                # Index builds would otherwise stall the first request of each kind
+                data.reindex()
+        hospital.room_allocator.ensure_built()
+        hospital.ambulance_dispatcher.ensure_built()
+        # Queued ambulance calls, until their caller has seen them dispatched
+        self.calls = {}
+
+    @timed
+    def register_patient(self, patient_id, name, age, disease):
+        with self.locks.hold(("patient", patient_id)):
+            self.hospital.register_patient(patient_id, name, str(age), disease)
+        return {"id": patient_id}
+
+    @timed
+    def get_patient(self, patient_id):
+        info = self.hospital.patients.get(patient_id)
+        if info is None:
+            return None
+        return {"id": patient_id, "name": info.name, "age": info.age, "disease": info.disease}
+
+    @timed
+    def book_appointment(self, patient_id, doctor_id, date, time, duration=DEFAULT_DURATION):
+        # The conflict check and the booking must see the same calendar
+        with self.locks.hold(("doctor", doctor_id)):
+            appointment_id = self.hospital.book_appointment(patient_id, doctor_id, date, time, int(duration))
+        return {"id": appointment_id}
+
+    @timed
+    def allot_room(self, patient_id, room_type):
+        with self.locks.hold(("patient", patient_id), ("room_type", room_type)):
+            room_id = self.hospital.assign_room(room_type, patient_id)
+        return {"room_id": room_id}
+
+    @timed
+    def release_room(self, room_id):
+        info = self.hospital.rooms.get(room_id)
+        room_type = info.type if info else None
+        with self.locks.hold(("room_type", room_type)):
+            self.hospital.vacate_room(room_id)
+        return {"room_id": room_id}
+
+    @timed
+    def book_ambulance(self, zone=None):
+        # The dispatcher claims ambulances atomically itself
+        call = self.hospital.dispatch_ambulance(None if zone is None else int(zone))
+        if call.ambulance_id is None:
+            self.calls[call.call_id] = call
+        return self.call_status(call)
+
+    @timed
+    def return_ambulance(self, ambulance_id):
+        call = self.hospital.return_ambulance(ambulance_id)
+        return {"ambulance_id": ambulance_id, "dispatched_to": None if call is None else call.call_id}
+
+    @timed
+    def get_call(self, call_id):
+        call = self.calls.get(call_id)
+        if call is None:
+            return None
+        if call.ambulance_id is not None:
+            del self.calls[call_id]
+        return self.call_status(call)
+
+    def call_status(self, call):
+        status = {"call_id": call.call_id, "ambulance_id": call.ambulance_id}
+        if call.ambulance_id is None:
+            status["position"] = self.hospital.ambulance_dispatcher.position(call.call_id)
+        else:
+            status["driver"] = self.hospital.ambulances[call.ambulance_id].driver
+            status["wait"] = round(call.wait, 3)
+        return status
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so a terminal reuses its connection
+    disable_nagle_algorithm = True  # headers and body go out as separate writes
+    service = None
+    quiet = True
+
+    def do_GET(self):
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "patients":
+            patient = self.service.get_patient(parts[1])
+            if patient is None:
+                self.reply(404, {"error": "Patient ID not found!"})
+            else:
+                self.reply(200, patient)
+        elif len(parts) == 2 and parts[0] == "calls" and parts[1].isdigit():
+            call = self.service.get_call(int(parts[1]))
+            if call is None:
+                self.reply(404, {"error": "No such waiting call"})
+            else:
+                self.reply(200, call)
+        elif parts == ["metrics"]:
+            self.reply(200, METRICS.snapshot())
+        else:
+            self.reply(404, {"error": f"No such resource: {self.path}"})
+
+    def do_POST(self):
+        parts = self.path.strip("/").split("/")
+        try:
+            body = self.read_json()
+            if parts == ["patients"]:
+                result = self.service.register_patient(body["id"], body["name"], body["age"], body["disease"])
+            elif parts == ["appointments"]:
+                result = self.service.book_appointment(body["patient_id"], body["doctor_id"], body["date"],
+                                                       body["time"], body.get("duration", DEFAULT_DURATION))
+            elif parts == ["rooms", "allot"]:
+                result = self.service.allot_room(body["patient_id"], body["room_type"])
+            elif len(parts) == 3 and parts[0] == "rooms" and parts[2] == "release":
+                result = self.service.release_room(parts[1])
+            elif parts == ["ambulances", "book"]:
+                result = self.service.book_ambulance(body.get("zone"))
+                if result["ambulance_id"] is None:
+                    self.reply(202, result)
+                    return
+            elif len(parts) == 3 and parts[0] == "ambulances" and parts[2] == "return":
+                result = self.service.return_ambulance(parts[1])
+            else:
+                self.reply(404, {"error": f"No such resource: {self.path}"})
+                return
+        except HospitalError as error:
+            self.reply(409, {"error": str(error)})
+        except (KeyError, TypeError, ValueError) as error:
+            self.reply(400, {"error": f"Bad request: {error!r}"})
+        else:
+            self.reply(200 if parts[-1] in ("release", "return") else 201, result)
+
+    def read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(length)) if length else {}
+
+    def reply(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+
+class ServiceHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # terminals connecting at once are queued, not reset
+
+
+def make_server(service, host="127.0.0.1", port=8108, quiet=True):
+    handler = type("Handler", (RequestHandler,), {"service": service, "quiet": quiet})
+    return ServiceHTTPServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the hospital front-desk operations over HTTP")
+    parser.add_argument('--host', default="127.0.0.1")
+    parser.add_argument('--port', type=int, default=8108)
+    parser.add_argument('--db', help="SQLite database made by `python storage.py migrate` (default: the .txt files)")
+    parser.add_argument('--verbose', action='store_true', help="log every request")
+    args = parser.parse_args()
+
+    hospital = HospitalManagementSystem(SQLiteStorage(args.db) if args.db else None)
+    server = make_server(HospitalService(hospital), args.host, args.port, quiet=not args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_port}", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        hospital.close()
+
+
+if __name__ == '__main__':
+    main()
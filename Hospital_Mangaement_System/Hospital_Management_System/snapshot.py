@@ -0,0 +1,79 @@
+"""Binary snapshot cache of the parsed entity files.
+
+Parsing a .txt file costs a few microseconds a line, seconds for a million
+records. TextFileStorage.load keeps what it parsed from each file in
+<filename>.cache and, while the file's size and modification time still
+match the ones recorded there, reads that instead: one bulk read and a
+marshal.loads, then a record built per row from ready-typed columns.
+
+The cache holds the records column by column, so marshal writes each shared
+value (a disease, a date...) once and the loaded records share it again.
+Dates, times and statuses are stored as their text and parsed once per
+distinct value. The journal is not cached; it is replayed on top as after
+a parse. A cache that is missing, stale or unreadable is simply rebuilt.
+"""
+import marshal
+import os
+
+from metrics import METRICS
+
+# Bump when the layout below changes, so older caches are rebuilt
+VERSION = 1
+
+# Column types marshal stores as they are
+PLAIN = (str, int, float)
+
+
+def cache_path(filename):
+    return filename + ".cache"
+
+
+def signature(filename, table):
+    """ What a cache of the file must have been made from: the layout, the table and the file's stat. """
+    stat = os.stat(filename)
+    return VERSION, table.name, tuple(table.columns), stat.st_mtime_ns, stat.st_size
+
+
+def read(filename, table, expected):
+    """ (records, unparsed) cached for the file with the expected signature, or None.
+
+    records is an iterable of (key, record).
+    """
+    try:
+        with open(cache_path(filename), "rb") as file:
+            blob = file.read()
+        cached, keys, columns, unparsed = marshal.loads(blob)
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if cached != expected:
+        return None
+    record = table.record
+    for i, column in enumerate(table.columns):
+        if record.kinds[column] not in PLAIN:
+            texts = columns[i]
+            values = {text: None if text is None else record.parse_field(column, text) for text in set(texts)}
+            columns[i] = list(map(values.__getitem__, texts))
+    return zip(keys, map(record, *columns)), unparsed
+
+
+def write(filename, table, expected, data, unparsed):
+    """ Cache the records and unparsed lines parsed from a file with the expected signature.
+
+    Best effort: a cache that cannot be written costs the next load a parse.
+    """
+    record = table.record
+    columns = []
+    for column in table.columns:
+        values = [getattr(value, column) for value in data.values()]
+        if record.kinds[column] not in PLAIN:
+            texts = {value: record.format_field(column, value) for value in set(values)}
+            values = list(map(texts.__getitem__, values))
+        columns.append(values)
+    path = cache_path(filename)
+    try:
+        with open(path + ".tmp", "wb") as file:
+            marshal.dump((expected, list(data), columns, dict(unparsed)), file)
+            METRICS.count(bytes_written=file.tell())
+        os.replace(path + ".tmp", path)
+    except OSError:
+        pass
@@ -0,0 +1,568 @@
+"""Storage backends for HospitalManagementSystem.
+
+Each entity file (patients.txt, doctors.txt, ...) is a table. A backend hands
+out one mapping per table, from record ID to the record (see records.py),
+and persists changes to it:
+
+  * TextFileStorage keeps the comma-separated .txt files, loaded into dicts,
+    with changes appended to a journal per file (see journal.py) and the
+    parsed records cached in a binary snapshot per file (see snapshot.py).
+  * SQLiteStorage keeps everything in one SQLite database in WAL mode. Its
+    tables are mappings that read and write the database directly, so
+    startup does not depend on how many records there are, and find() uses
+    the indexes on doctor, patient, date and room status.
+
+Convert the .txt files into a database with:
+
+    python storage.py migrate [--db hospital.db]
+"""
+import argparse
+import contextlib
+import gc
+import os
+import sqlite3
+import threading
+import time
+from collections.abc import MutableMapping
+from operator import attrgetter, itemgetter
+
+import snapshot
+from journal import Journal
+from metrics import METRICS, timed
+from records import Ambulance, Appointment, Doctor, Medicine, Patient, Room, Staff
+
+
+@contextlib.contextmanager
+def paused_gc():
+    """ Pause the cyclic garbage collector, for bulk allocations that make no cycles.
+
+    Collecting the young generation again and again as millions of records
+    or sort keys are allocated would otherwise double or triple their time.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+class Table:
+    def __init__(self, name, record, indexes=()):
+        self.name = name
+        self.record = record
+        self.columns = record.columns
+        self.column_types = record.column_types
+        self.indexes = indexes
+
+    def field(self, value, column):
+        """ The value of one column in a record. """
+        return getattr(value, column)
+
+    def sort_key(self, column):
+        """ Key function over (key, value) pairs ordering by a column ("id" for the key).
+
+        Missing values come first, as NULLs do in SQLite.
+        """
+        if column == "id":
+            return itemgetter(0)
+        if column not in self.column_types:
+            raise ValueError(f"{self.name} has no column {column!r}")
+        field = attrgetter(column)
+
+        def key(record):
+            value = field(record[1])
+            return value is not None, value
+        return key
+
+
+TABLES = {
+    "patients.txt": Table("patients", Patient, indexes=[["disease"]]),
+    "doctors.txt": Table("doctors", Doctor, indexes=[["specialty"]]),
+    "appointments.txt": Table("appointments", Appointment,
+                              indexes=[["patient_id"], ["doctor_id"], ["doctor_id", "date"], ["date"]]),
+    "ambulances.txt": Table("ambulances", Ambulance, indexes=[["status"]]),
+    "staff.txt": Table("staff", Staff, indexes=[["role"]]),
+    "rooms.txt": Table("rooms", Room, indexes=[["status", "type"], ["status"], ["patient_id"]]),
+    "medicines.txt": Table("medicines", Medicine),
+}
+
+
+class IndexedDict(dict):
+    """ dict of records that keeps a hash index over each of its table's indexes.
+
+    An index maps the tuple of indexed column values to the list of record
+    keys holding them, so find() on an indexed set of columns is a single
+    lookup. Each index is built by the first lookup that needs it. Values
+    must be replaced, not edited in place, for the indexes to stay in step.
+    Writes from several threads are safe; index maintenance runs under a
+    lock.
+    """
+
+    def __init__(self, table):
+        super().__init__()
+        self.table = table
+        self.indexes = {}  # The indexes built so far
+        # The column value for a one-column index, else the tuple of them
+        self.index_keys = {tuple(columns): attrgetter(*columns) for columns in table.indexes}
+        self.lock = threading.Lock()
+
+    def reindex(self):
+        """ Rebuild every index now rather than on first use. """
+        with self.lock:
+            self.indexes = {columns: self._build(columns) for columns in self.index_keys}
+
+    def _build(self, columns):
+        """ One index, in one pass over the records. """
+        getter = self.index_keys[columns]
+        index = {}
+        for key, value in self.items():
+            index_key = getter(value)
+            bucket = index.get(index_key)
+            if bucket is None:
+                index[index_key] = [key]
+            else:
+                bucket.append(key)
+        return index
+
+    def index(self, columns):
+        """ The index over some columns, built if this is its first use. """
+        index = self.indexes.get(columns)
+        if index is None:
+            with self.lock:
+                index = self.indexes.get(columns)
+                if index is None:
+                    index = self.indexes[columns] = self._build(columns)
+        return index
+
+    def index_key(self, columns, value):
+        return self.index_keys[columns](value)
+
+    def _unindex(self, key, value):
+        for columns, index in self.indexes.items():
+            index_key = self.index_key(columns, value)
+            bucket = index[index_key]
+            bucket.remove(key)
+            if not bucket:
+                del index[index_key]
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            old_value = self.get(key)
+            if old_value is not None:
+                self._unindex(key, old_value)
+            super().__setitem__(key, value)
+            for columns, index in self.indexes.items():
+                index.setdefault(self.index_key(columns, value), []).append(key)
+
+    def __delitem__(self, key):
+        with self.lock:
+            self._unindex(key, self[key])
+            super().__delitem__(key)
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self[key]
+            del self[key]
+            return value
+        if default:
+            return default[0]
+        raise KeyError(key)
+
+    def lookup(self, criteria):
+        """ Keys of the records matching the widest index covered by the criteria, or None. """
+        best = None
+        for columns in self.index_keys:
+            if all(column in criteria for column in columns) and (best is None or len(columns) > len(best)):
+                best = columns
+        if best is None:
+            return None
+        values = tuple(criteria[column] for column in best)
+        return self.index(best).get(values[0] if len(best) == 1 else values, [])
+
+
+class TextFileStorage:
+    """ The .txt files, loaded into dicts, with a journal of changes per file.
+
+    Journal appends and snapshots of a file are serialised by a lock per
+    file, so threads may save records of the same file concurrently.
+
+    Lines whose fields do not parse (an appointment at 23:60, say) are not
+    loaded, but kept in unparsed and written back with every snapshot, so
+    no data is lost to a stricter parser.
+
+    What is parsed from a file is cached in <filename>.cache and read back
+    from there while the file is unchanged (see snapshot.py); use_cache=False
+    always parses.
+    """
+
+    def __init__(self, fsync_every=100, fsync_interval=1.0, compact_min=1000, use_cache=True):
+        self.fsync_every = fsync_every
+        self.use_cache = use_cache
+        self.fsync_interval = fsync_interval
+        self.compact_min = compact_min
+        self.journals = {}
+        self.file_locks = {}
+        self._journals_lock = threading.Lock()
+        self.unparsed = {}  # filename -> {key: line}
+
+    def journal(self, filename):
+        if filename not in self.journals:
+            with self._journals_lock:
+                if filename not in self.journals:
+                    self.file_locks[filename] = threading.RLock()
+                    self.journals[filename] = Journal(filename + ".journal", self.fsync_every, self.fsync_interval)
+        return self.journals[filename]
+
+    def file_lock(self, filename):
+        self.journal(filename)
+        return self.file_locks[filename]
+
+    def parse_record(self, filename, line):
+        """ Parse one line of an entity file into (key, record), or None if it does not parse. """
+        parts = line.split(",")
+        try:
+            return parts[0], TABLES[filename].record.from_fields(parts[1:])
+        except ValueError:
+            return None
+
+    def format_record(self, filename, key, value):
+        return f"{key},{','.join(value.to_fields())}"
+
+    @timed
+    def load(self, filename):
+        """ Load a file (or its cache) into a dictionary and replay its journal. """
+        table = TABLES[filename]
+        data = IndexedDict(table)
+        unparsed = self.unparsed[filename] = {}
+        # Plain dict writes while loading; the indexes are built on first use
+        put = dict.__setitem__
+        if os.path.exists(filename):
+            signature = snapshot.signature(filename, table)
+            with paused_gc():
+                cached = snapshot.read(filename, table, signature) if self.use_cache else None
+                if cached is not None:
+                    records, cached_unparsed = cached
+                    dict.update(data, records)
+                    unparsed.update(cached_unparsed)
+                else:
+                    self.parse_file(filename, data, unparsed)
+                    if self.use_cache:
+                        snapshot.write(filename, table, signature, data, unparsed)
+        for op, line in self.journal(filename).read():
+            if op == "D":
+                dict.pop(data, line, None)
+                unparsed.pop(line, None)
+            else:
+                record = self.parse_record(filename, line)
+                if record is not None:
+                    put(data, record[0], record[1])
+                    unparsed.pop(record[0], None)
+                else:
+                    unparsed[line.split(",", 1)[0]] = line
+        METRICS.count(records_scanned=len(data) + len(unparsed))
+        return data
+
+    def parse_file(self, filename, data, unparsed):
+        """ Parse every line of a file into data, or into unparsed if it does not parse. """
+        put = dict.__setitem__
+        with open(filename, "r") as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    record = self.parse_record(filename, line)
+                    if record is not None:
+                        put(data, record[0], record[1])
+                    else:
+                        unparsed[line.split(",", 1)[0]] = line
+
+    @timed
+    def save(self, data, filename):
+        """ Write a full snapshot of a dictionary to a file and clear its journal. """
+        # Write next to the file and rename over it, so a crash leaves either the
+        # old or the new snapshot, never a truncated one
+        temp_filename = filename + ".tmp"
+        with self.file_lock(filename):
+            # A copy, as other threads may add records while the snapshot is written;
+            # their journal records wait for the lock and land in the new journal
+            records = list(data.items())
+            with open(temp_filename, "w") as file:
+                for key, value in records:
+                    file.write(self.format_record(filename, key, value) + "\n")
+                for key, line in self.unparsed.get(filename, {}).items():
+                    if key not in data:
+                        file.write(line + "\n")
+                file.flush()
+                os.fsync(file.fileno())
+                METRICS.count(bytes_written=os.fstat(file.fileno()).st_size)
+            os.replace(temp_filename, filename)
+            self.journal(filename).truncate()
+
+    @timed
+    def save_record(self, data, filename, key):
+        """ Record the insert, update or delete of data[key] in the file's journal. """
+        journal = self.journal(filename)
+        with self.file_lock(filename):
+            value = data.get(key)
+            written = journal.bytes_written
+            if value is not None:
+                journal.append("U", self.format_record(filename, key, value))
+            else:
+                journal.append("D", key)
+            METRICS.count(bytes_written=journal.bytes_written - written)
+            # Compact once the journal holds more records than the snapshot, which
+            # keeps the cost of the full rewrite amortised to O(1) per change
+            if journal.records > max(self.compact_min, len(data)):
+                self.save(data, filename)
+
+    @timed
+    def save_records(self, data, filename, keys):
+        """ Like save_record for many keys, as one journal write. """
+        journal = self.journal(filename)
+        with self.file_lock(filename):
+            records = []
+            for key in keys:
+                value = data.get(key)
+                if value is not None:
+                    records.append(("U", self.format_record(filename, key, value)))
+                else:
+                    records.append(("D", key))
+            written = journal.bytes_written
+            journal.append_many(records)
+            METRICS.count(bytes_written=journal.bytes_written - written)
+            if journal.records > max(self.compact_min, len(data)):
+                self.save(data, filename)
+
+    def transaction(self):
+        """ Nothing to group: changes reach the files through save_record(s). """
+        return contextlib.nullcontext()
+
+    def scan(self, data, filename, criteria=None, order_by=None, descending=False):
+        """ Yield (key, value) for the records matching the criteria, in stored or column order.
+
+        Records in stored order come straight off the dict, so the first one
+        costs the same however many there are. Column order sorts every
+        matching record first.
+        """
+        records = self.find(data, filename, **criteria) if criteria else METRICS.counted(data.items())
+        if order_by is not None:
+            with paused_gc():
+                records = iter(sorted(records, key=TABLES[filename].sort_key(order_by), reverse=descending))
+        return records
+
+    def find(self, data, filename, **criteria):
+        """ Yield (key, value) for the records whose columns equal the criteria. """
+        table = TABLES[filename]
+        keys = data.lookup(criteria) if isinstance(data, IndexedDict) else None
+        # The index bucket is copied: the caller may change the records while iterating
+        records = data.items() if keys is None else ((key, data[key]) for key in list(keys) if key in data)
+        for key, value in METRICS.counted(records):
+            if all(table.field(value, column) == wanted for column, wanted in criteria.items()):
+                yield key, value
+
+    def close(self):
+        """ Sync and close all journals. """
+        for journal in self.journals.values():
+            journal.close()
+
+
+class SQLiteTable(MutableMapping):
+    """ Dict-like view of one table; every read and write goes to the database. """
+
+    def __init__(self, connection, table):
+        self.connection = connection
+        self.table = table
+        columns = ", ".join(table.columns)
+        self._select = f"SELECT {columns} FROM {table.name} WHERE id = ?"
+        self._select_all = f"SELECT id, {columns} FROM {table.name} ORDER BY rowid"
+        updates = ", ".join(f"{column} = excluded.{column}" for column in table.columns)
+        placeholders = ", ".join("?" * (len(table.columns) + 1))
+        self._upsert = (f"INSERT INTO {table.name} (id, {columns}) VALUES ({placeholders}) "
+                        f"ON CONFLICT(id) DO UPDATE SET {updates}")
+
+    def to_row(self, key, value):
+        return (key, *value.stored())
+
+    def to_value(self, row):
+        return self.table.record.from_fields(row)
+
+    def where(self, criteria):
+        """ The WHERE clause and parameters selecting rows whose columns equal the criteria. """
+        where = " AND ".join(f"{column} = ?" for column in criteria)
+        params = tuple(self.table.record.format_field(column, value) for column, value in criteria.items())
+        return where, params
+
+    def __getitem__(self, key):
+        row = self.connection.execute(self._select, (key,)).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return self.to_value(row)
+
+    def __setitem__(self, key, value):
+        row = self.to_row(key, value)
+        self.connection.execute(self._upsert, row)
+        METRICS.count(bytes_written=row_bytes(row))
+
+    def __delitem__(self, key):
+        if self.connection.execute(f"DELETE FROM {self.table.name} WHERE id = ?", (key,)).rowcount == 0:
+            raise KeyError(key)
+
+    def __contains__(self, key):
+        return self.connection.execute(f"SELECT 1 FROM {self.table.name} WHERE id = ?", (key,)).fetchone() is not None
+
+    def __iter__(self):
+        for (key,) in self.connection.execute(f"SELECT id FROM {self.table.name} ORDER BY rowid"):
+            yield key
+
+    def __len__(self):
+        return self.connection.execute(f"SELECT COUNT(*) FROM {self.table.name}").fetchone()[0]
+
+    def items(self):
+        for row in self.connection.execute(self._select_all):
+            yield row[0], self.to_value(row[1:])
+
+    def find(self, **criteria):
+        where, params = self.where(criteria)
+        query = f"SELECT id, {', '.join(self.table.columns)} FROM {self.table.name} WHERE {where} ORDER BY rowid"
+        for row in METRICS.counted(self.connection.execute(query, params)):
+            yield row[0], self.to_value(row[1:])
+
+    def scan(self, criteria=None, order_by=None, descending=False):
+        """ Yield (key, value) for matching rows straight off a cursor, by rowid or a column. """
+        criteria = criteria or {}
+        if order_by is not None and order_by != "id" and order_by not in self.table.column_types:
+            raise ValueError(f"{self.table.name} has no column {order_by!r}")
+        where, params = self.where(criteria)
+        query = (f"SELECT id, {', '.join(self.table.columns)} FROM {self.table.name}"
+                 f"{' WHERE ' + where if where else ''} ORDER BY {order_by or 'rowid'}{' DESC' if descending else ''}")
+        for row in METRICS.counted(self.connection.execute(query, params)):
+            yield row[0], self.to_value(row[1:])
+
+    def insert_many(self, items):
+        written = 0
+
+        def rows():
+            nonlocal written
+            for key, value in items:
+                row = self.to_row(key, value)
+                written += row_bytes(row)
+                yield row
+        self.connection.executemany(self._upsert, rows())
+        METRICS.count(bytes_written=written)
+
+
+def row_bytes(row):
+    """ The size of a row's text as handed to SQLite, for the bytes written of an operation. """
+    return sum(len(str(value)) for value in row if value is not None)
+
+
+class SQLiteStorage:
+    """ All tables in one SQLite database (WAL mode), read and written on demand. """
+
+    def __init__(self, path="hospital.db"):
+        self.path = path
+        # Autocommit; the service layer and the bulk paths open their own transactions
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.create_schema()
+
+    def create_schema(self):
+        for table in TABLES.values():
+            columns = ", ".join(f"{column} {column_type}" for column, column_type in table.column_types.items())
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS {table.name} (id TEXT PRIMARY KEY, {columns})")
+            # Columns added to TABLES after the database was created
+            existing = {row[1] for row in self.connection.execute(f"PRAGMA table_info({table.name})")}
+            for column, column_type in table.column_types.items():
+                if column not in existing:
+                    self.connection.execute(f"ALTER TABLE {table.name} ADD COLUMN {column} {column_type}")
+            for index in table.indexes:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS idx_{table.name}_{'_'.join(index)} "
+                                        f"ON {table.name} ({', '.join(index)})")
+
+    def load(self, filename):
+        return SQLiteTable(self.connection, TABLES[filename])
+
+    @timed
+    def save(self, data, filename):
+        """ Replace the whole table with the contents of data. """
+        table = self.load(filename)
+        if isinstance(data, SQLiteTable) and data.table is table.table:
+            return
+        items = list(data.items())
+        with self.transaction():
+            self.connection.execute(f"DELETE FROM {table.table.name}")
+            table.insert_many(items)
+
+    def save_record(self, data, filename, key):
+        # Writes already went to the database through the SQLiteTable
+        pass
+
+    def save_records(self, data, filename, keys):
+        pass
+
+    def find(self, data, filename, **criteria):
+        return data.find(**criteria)
+
+    def scan(self, data, filename, criteria=None, order_by=None, descending=False):
+        return data.scan(criteria, order_by, descending)
+
+    def transaction(self):
+        return Transaction(self.connection)
+
+    def close(self):
+        self.connection.close()
+
+
+class Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        self.connection.execute("BEGIN")
+        return self.connection
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.connection.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
+
+
+def migrate(database="hospital.db", directory="."):
+    """ Copy every entity file (and its journal) into the database; returns {filename: (rows, skipped)}.
+
+    Lines that do not parse into records are skipped; the database only
+    holds typed rows.
+    """
+    text_storage = TextFileStorage()
+    sqlite_storage = SQLiteStorage(database)
+    counts = {}
+    cwd = os.getcwd()
+    os.chdir(directory)
+    try:
+        for filename in TABLES:
+            data = text_storage.load(filename)
+            sqlite_storage.save(data, filename)
+            counts[filename] = (len(data), len(text_storage.unparsed[filename]))
+    finally:
+        os.chdir(cwd)
+        sqlite_storage.close()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the hospital .txt files into a SQLite database")
+    parser.add_argument('command', choices=['migrate'])
+    parser.add_argument('--db', default="hospital.db")
+    parser.add_argument('--dir', default=".", help="directory holding patients.txt, doctors.txt, ...")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = migrate(args.db, args.dir)
+    for filename, (count, skipped) in counts.items():
+        print(f"{filename}: {count} records" + (f", {skipped} lines skipped as they do not parse" if skipped else ""))
+    print(f"Migrated into {args.db} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
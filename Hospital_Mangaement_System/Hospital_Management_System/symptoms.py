@@ -0,0 +1,181 @@
+import re
+import sys
+from collections import deque
+
+# Words, and every other non-space character on its own, so punctuation breaks phrases; a
+# hyphen joins words like a space does ("sore-throat")
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[^\sa-z0-9-]")
+
+# Endings taken off words before they are compared, longest first
+SUFFIXES = ("ing", "ed", "es", "s", "e")
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def stem(word):
+    """ A word without its plural or verb ending, so "headaches" and "headache", or "coughing"
+    and "cough", compare equal. Only one ending goes, and at least three letters stay.
+    """
+    for suffix in SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= 3 and not word.endswith("ss"):
+            return word[:-len(suffix)]
+    return word
+
+
+def load_knowledge_base(path):
+    """ Read a symptom knowledge base: one "disease,symptom,symptom,..." line per disease. """
+    diseases = {}
+    with open(path, "r") as file:
+        for line in file:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            disease, *symptoms = [field.strip() for field in line.split(",")]
+            diseases.setdefault(disease, []).extend(symptom for symptom in symptoms if symptom)
+    return diseases
+
+
+class SymptomMatcher:
+    """ Aho-Corasick automaton over the words of every symptom in a knowledge base.
+
+    A report is matched in one pass over its words. Where symptoms overlap,
+    the leftmost and then longest one wins, so "high fever" counts as that
+    symptom and not also as "fever". Symptoms only match whole words, which
+    are compared by their stems: "fevers" and "coughing" match "fever" and
+    "cough". Symptoms with the same stems are one symptom, reported with the
+    spelling of the disease it is listed under.
+    Diseases are ranked by how many of their symptoms matched, then by the
+    share of their symptoms that matched.
+    """
+
+    def __init__(self, disease_symptoms):
+        self.diseases = list(disease_symptoms)
+        self.symptoms = []             # symptom id -> text, as first listed
+        self.symptom_diseases = []     # symptom id -> disease ids
+        self.disease_symptoms = []     # disease id -> {symptom id: text, as that disease lists it}
+        self.disease_sizes = []        # disease id -> number of distinct symptoms
+        self.words = {}                # word -> word id
+        self.goto = [{}]               # state -> {word id: state}
+        self.fail = [0]
+        self.depth = [0]
+        self.output = [-1]             # state -> symptom id ending here, or -1
+        self.output_link = [0]         # state -> nearest shorter state with an output, 0 if none
+
+        symptom_ids = {}
+        for disease_id, symptoms in enumerate(disease_symptoms.values()):
+            names = {}
+            for symptom in symptoms:
+                words = tokenize(symptom)
+                if not words:
+                    continue
+                stems = [stem(word) for word in words]
+                key = " ".join(stems)
+                symptom_id = symptom_ids.get(key)
+                if symptom_id is None:
+                    symptom_id = symptom_ids[key] = len(self.symptoms)
+                    self.symptoms.append(" ".join(words))
+                    self.symptom_diseases.append([])
+                    self._insert(stems, symptom_id)
+                if symptom_id not in names:
+                    names[symptom_id] = " ".join(words)
+                    self.symptom_diseases[symptom_id].append(disease_id)
+            self.disease_symptoms.append(names)
+            self.disease_sizes.append(len(names))
+        self._link()
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(load_knowledge_base(path))
+
+    def _insert(self, words, symptom_id):
+        state = 0
+        for word in words:
+            word_id = self.words.setdefault(word, len(self.words))
+            next_state = self.goto[state].get(word_id)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto.append({})
+                self.fail.append(0)
+                self.depth.append(self.depth[state] + 1)
+                self.output.append(-1)
+                self.output_link.append(0)
+                self.goto[state][word_id] = next_state
+            state = next_state
+        self.output[state] = symptom_id
+
+    def _link(self):
+        """ Set the failure and output links, breadth first. """
+        goto, fail, output, output_link = self.goto, self.fail, self.output, self.output_link
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word_id, child in goto[state].items():
+                queue.append(child)
+                fallback = fail[state]
+                while fallback and word_id not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[child] = goto[fallback].get(word_id, 0)
+                output_link[child] = fail[child] if output[fail[child]] >= 0 else output_link[fail[child]]
+
+    def match(self, report):
+        """ Symptom ids found in a report, leftmost-longest and without overlaps, in report order. """
+        goto, fail, depth, output, output_link = self.goto, self.fail, self.depth, self.output, self.output_link
+        words = self.words
+        # Every symptom ending at each word, as (start, end, symptom id)
+        found = []
+        state = 0
+        for position, word in enumerate(tokenize(report)):
+            word_id = words.get(stem(word))
+            if word_id is None:
+                state = 0
+                continue
+            while state and word_id not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(word_id, 0)
+            hit = state if output[state] >= 0 else output_link[state]
+            while hit:
+                found.append((position + 1 - depth[hit], position + 1, output[hit]))
+                hit = output_link[hit]
+
+        # Leftmost-longest: earlier starts win, then longer symptoms
+        found.sort(key=lambda item: (item[0], -item[1]))
+        matched = []
+        covered = 0
+        for start, end, symptom_id in found:
+            if start >= covered:
+                matched.append(symptom_id)
+                covered = end
+        return matched
+
+    def rank(self, report, limit=None):
+        """ [(disease, [matched symptoms])] for a report, best match first. """
+        hits = {}
+        for symptom_id in set(self.match(report)):
+            for disease_id in self.symptom_diseases[symptom_id]:
+                hits.setdefault(disease_id, []).append(symptom_id)
+        sizes = self.disease_sizes
+        ranked = sorted(hits.items(), key=lambda item: (-len(item[1]), -len(item[1]) / sizes[item[0]],
+                                                        self.diseases[item[0]]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.diseases[disease_id], sorted(self.disease_symptoms[disease_id][symptom_id]
+                                                   for symptom_id in symptom_ids))
+                for disease_id, symptom_ids in ranked]
+
+    def rank_many(self, reports, limit=None):
+        """ Rank an iterable of reports; yields one ranking per report, in order. """
+        for report in reports:
+            yield self.rank(report, limit)
+
+
+def main():
+    """ python symptoms.py [knowledge base] < reports, one per line """
+    matcher = SymptomMatcher.from_file(sys.argv[1] if len(sys.argv) > 1 else "symptoms.txt")
+    for ranking in matcher.rank_many(sys.stdin, limit=3):
+        print("; ".join(f"{disease} ({len(symptoms)})" for disease, symptoms in ranking) or "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import pytest
+
+from dispatch import LONGEST_IDLE, NEAREST, AmbulanceDispatcher
+from records import Ambulance, AmbulanceStatus
+
+
+class Clock:
+    """ A clock that only moves when told to. """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def fleet(*zones):
+    """ Available ambulances "A0", "A1", ... in the given zones. """
+    return {f"A{i}": Ambulance(f"Driver {i}", AmbulanceStatus.AVAILABLE, zone) for i, zone in enumerate(zones)}
+
+
+def make_dispatcher(ambulances, policy):
+    clock = Clock()
+    dispatcher = AmbulanceDispatcher(ambulances, policy, clock)
+    dispatcher.build()
+    return dispatcher, clock
+
+
+def assert_heaps_in_step(dispatcher):
+    """ Every available ambulance has one live entry, in the heap of its zone; booked ones have none. """
+    available = {ambulance_id for ambulance_id, info in dispatcher.ambulances.items()
+                 if info.status == AmbulanceStatus.AVAILABLE}
+    assert set(dispatcher.entries) == available
+    for ambulance_id, entry in dispatcher.entries.items():
+        key = dispatcher._heap_key(dispatcher.ambulances[ambulance_id])
+        assert any(item is entry for item in dispatcher.free[key])
+    assert dispatcher.zones == sorted(key for key in dispatcher.free if key is not None)
+
+
+def test_longest_idle_takes_the_ambulance_free_longest():
+    ambulances = fleet(1, 5, 9)
+    dispatcher, clock = make_dispatcher(ambulances, LONGEST_IDLE)
+    clock.now = 10
+    first = dispatcher.request(9).ambulance_id
+    clock.now = 20
+    dispatcher.release(first)
+
+    # The zone of the call plays no part; the two never dispatched go first
+    assert [dispatcher.request(9).ambulance_id for _ in range(3)] == ["A1", "A2", first]
+    assert_heaps_in_step(dispatcher)
+
+
+def test_nearest_takes_the_closest_zone():
+    ambulances = fleet(1, 5, 9, None)
+    dispatcher, clock = make_dispatcher(ambulances, NEAREST)
+    assert dispatcher.request(6).ambulance_id == "A1"
+    assert dispatcher.request(8).ambulance_id == "A2"
+    # A call without a zone is served from any zone
+    assert dispatcher.request(None).ambulance_id == "A0"
+    # Ambulances without a zone come after every zone
+    assert dispatcher.request(1).ambulance_id == "A3"
+    assert dispatcher.request(1).ambulance_id is None
+
+
+def test_nearest_prefers_the_longest_idle_of_equally_near_zones():
+    ambulances = fleet(3, 7)
+    dispatcher, clock = make_dispatcher(ambulances, NEAREST)
+    clock.now = 10
+    dispatcher.request(3)
+    dispatcher.release("A0")
+    # Zones 3 and 7 are both 2 away from 5, and A1 has been free longer
+    assert dispatcher.request(5).ambulance_id == "A1"
+
+
+def test_waiting_calls_are_served_first_in_first_out_on_return():
+    ambulances = fleet(1, 2)
+    dispatcher, clock = make_dispatcher(ambulances, NEAREST)
+    booked = [dispatcher.request(1).ambulance_id, dispatcher.request(2).ambulance_id]
+    waiting = [dispatcher.request(zone) for zone in (2, 1, 2)]
+    assert [call.ambulance_id for call in waiting] == [None, None, None]
+    assert [dispatcher.position(call.call_id) for call in waiting] == [1, 2, 3]
+
+    clock.now = 5
+    assert dispatcher.release(booked[0]) is waiting[0]
+    assert waiting[0].ambulance_id == booked[0] and waiting[0].wait == 5
+    # A new call queues behind the ones already waiting
+    late = dispatcher.request(1)
+    assert late.ambulance_id is None and dispatcher.position(late.call_id) == 3
+    assert dispatcher.release(booked[1]) is waiting[1]
+    assert dispatcher.release(booked[0]) is waiting[2]
+    assert dispatcher.release(booked[1]) is late
+    assert not dispatcher.pending
+    assert dispatcher.stats["served_from_queue"] == 4
+    assert all(info.status == AmbulanceStatus.BOOKED for info in ambulances.values())
+
+    assert dispatcher.release(booked[0]) is None
+    assert ambulances[booked[0]].status == AmbulanceStatus.AVAILABLE
+    assert_heaps_in_step(dispatcher)
+
+
+@pytest.mark.parametrize("policy", [LONGEST_IDLE, NEAREST])
+def test_heaps_stay_in_step_through_dispatch_return_and_edits(policy):
+    ambulances = fleet(1, 1, 4, None, 8)
+    dispatcher, clock = make_dispatcher(ambulances, policy)
+    assert_heaps_in_step(dispatcher)
+
+    calls = [dispatcher.request(zone) for zone in (1, 4, 8)]
+    assert_heaps_in_step(dispatcher)
+    for call in calls[:2]:
+        clock.now += 1
+        dispatcher.release(call.ambulance_id)
+        assert_heaps_in_step(dispatcher)
+
+    # Edits made outside the dispatcher: a move to a new zone, a deletion and a new ambulance
+    ambulances["A0"] = Ambulance("Driver 0", AmbulanceStatus.AVAILABLE, 6)
+    dispatcher.refresh("A0")
+    del ambulances["A3"]
+    dispatcher.refresh("A3")
+    ambulances["A5"] = Ambulance("Driver 5", AmbulanceStatus.AVAILABLE, 2)
+    dispatcher.refresh("A5")
+    assert_heaps_in_step(dispatcher)
+
+    # Everything available is handed out exactly once
+    dispatched = [dispatcher.request(zone).ambulance_id for zone in (2, 2, 2, 2, 2)]
+    assert None not in dispatched[:4] and dispatched[4] is None
+    assert len(set(dispatched[:4])) == 4
+    assert_heaps_in_step(dispatcher)
@@ -0,0 +1,82 @@
+import os
+from datetime import date, time
+
+import pytest
+
+from journal import Journal
+from records import Appointment
+from storage import TextFileStorage
+
+APPOINTMENTS = "appointments.txt"
+UNPARSED = "P1D1_2005-03-16_23:60,P1,D1,2005-03-16,23:60"
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    # Entity files are named relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    storage = TextFileStorage(fsync_every=0, use_cache=False)
+    yield storage
+    for journal in storage.journals.values():
+        journal.close()
+
+
+def appointment(day):
+    return Appointment("P1", "D1", date(2005, 3, day), time(10), 30)
+
+
+def test_torn_last_line_is_dropped_and_cut_off(tmp_path):
+    path = str(tmp_path / "patients.txt.journal")
+    journal = Journal(path)
+    journal.append("U", "1,Ann,40,Flu")
+    journal.append("D", "2")
+    journal.close()
+    with open(path, "a") as file:
+        file.write("U,3,Bo")
+
+    assert list(Journal(path).read()) == [("U", "1,Ann,40,Flu"), ("D", "2")]
+    # The next append starts on a line of its own
+    journal = Journal(path)
+    journal.append("U", "4,Cy,30,Cold")
+    journal.close()
+    assert list(Journal(path).read()) == [("U", "1,Ann,40,Flu"), ("D", "2"), ("U", "4,Cy,30,Cold")]
+
+
+def test_load_recovers_the_records_before_a_torn_line(storage):
+    data = storage.load(APPOINTMENTS)
+    for day in (1, 2, 3):
+        data[f"A{day}"] = appointment(day)
+        storage.save_record(data, APPOINTMENTS, f"A{day}")
+    del data["A1"]
+    storage.save_record(data, APPOINTMENTS, "A1")
+    storage.journal(APPOINTMENTS).close()
+    # A crash part way through the next record
+    with open(APPOINTMENTS + ".journal", "rb+") as file:
+        file.seek(0, os.SEEK_END)
+        file.write(b"U,A4,P1,D1,2005-0")
+
+    reloaded = TextFileStorage(use_cache=False).load(APPOINTMENTS)
+    assert dict(reloaded) == {"A2": appointment(2), "A3": appointment(3)}
+
+
+def test_compaction_keeps_unparsed_lines(storage):
+    storage.compact_min = 2
+    with open(APPOINTMENTS, "w") as file:
+        file.write(f"A1,{','.join(appointment(1).to_fields())}\n{UNPARSED}\n")
+    data = storage.load(APPOINTMENTS)
+    assert list(data) == ["A1"]
+
+    # The third update outgrows max(compact_min, len(data)) and compacts
+    for day in (2, 3):
+        data["A1"] = appointment(day)
+        storage.save_record(data, APPOINTMENTS, "A1")
+    assert os.path.exists(APPOINTMENTS + ".journal")
+    data["A1"] = appointment(4)
+    storage.save_record(data, APPOINTMENTS, "A1")
+    assert not os.path.exists(APPOINTMENTS + ".journal")
+    with open(APPOINTMENTS) as file:
+        assert file.read().splitlines() == [f"A1,{','.join(appointment(4).to_fields())}", UNPARSED]
+
+    reloaded = TextFileStorage(use_cache=False)
+    assert dict(reloaded.load(APPOINTMENTS)) == {"A1": appointment(4)}
+    assert list(reloaded.unparsed[APPOINTMENTS].values()) == [UNPARSED]
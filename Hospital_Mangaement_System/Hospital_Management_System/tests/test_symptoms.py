@@ -0,0 +1,58 @@
+import os
+
+import pytest
+
+from symptoms import SymptomMatcher, stem
+
+KNOWLEDGE_BASE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "symptoms.txt")
+
+
+@pytest.fixture(scope="module")
+def matcher():
+    return SymptomMatcher.from_file(KNOWLEDGE_BASE)
+
+
+def diseases(matcher, report):
+    return {disease for disease, _ in matcher.rank(report)}
+
+
+@pytest.mark.parametrize("report, expected", [
+    ("headaches and fevers", {"Hypertension", "Flu", "Chickenpox"}),
+    ("coughing", {"Flu", "Cold", "Asthma"}),
+    ("sore-throat", {"Flu", "Cold"}),
+    ("Sneezes, runny nose", {"Cold", "Flu"}),
+    ("vomited twice", {"Food Poisoning"}),
+])
+def test_plurals_hyphens_and_verb_endings_match(matcher, report, expected):
+    assert diseases(matcher, report) == expected
+
+
+def test_longest_symptom_wins(matcher):
+    assert matcher.rank("high fever") == [("Dengue", ["high fever"])]
+
+
+def test_symptoms_match_whole_words_only(matcher):
+    assert matcher.rank("feverish and coughless") == []
+
+
+def test_punctuation_breaks_phrases(matcher):
+    assert diseases(matcher, "sore, throat") == set()
+
+
+def test_shared_symptoms_keep_each_diseases_spelling(matcher):
+    ranking = dict(matcher.rank("coughs"))
+    assert ranking["Asthma"] == ["coughing"]
+    assert ranking["Flu"] == ranking["Cold"] == ["cough"]
+
+
+def test_best_match_first(matcher):
+    ranking = matcher.rank("fever, cough, sore throat and muscle aches")
+    assert ranking[0] == ("Flu", ["cough", "fever", "muscle aches", "sore throat"])
+
+
+@pytest.mark.parametrize("word, expected", [
+    ("headaches", "headach"), ("headache", "headach"), ("coughing", "cough"), ("fevers", "fever"),
+    ("dizziness", "dizziness"), ("rash", "rash"), ("eyes", "eye"),
+])
+def test_stem(word, expected):
+    assert stem(word) == expected